@@ -8,10 +8,8 @@ from twisted.plugin import IPlugin
 from comet.icomet import IHandler, IHasOptions
 import comet.log as log
 
-from fourpisky.taskqueue.tasks import (
-    process_voevent_celerytask,
-    ingest_voevent_celerytask
-)
+from fourpisky.taskqueue.tasks import receive_voevent_celerytask
+from fourpisky.taskqueue.routing import receive_queue_for
 
 @implementer(IPlugin, IHandler)
 class CeleryQueuer(object):
@@ -25,11 +23,13 @@ class CeleryQueuer(object):
         """
         log.debug("Passing to celery...")
         try:
-            process_voevent_celerytask.delay(event.raw_bytes)
-            ingest_voevent_celerytask.delay(event.raw_bytes)
+            # One task per packet, parsed once for both processing and
+            # ingest. Packets we may act upon jump the queue:
+            receive_voevent_celerytask.apply_async(
+                (event.raw_bytes,), queue=receive_queue_for(event.element))
         except Exception as e:
             self.deferred.errback(e)
 
-        log.debug("Celery jobs sent OK.")
+        log.debug("Celery job sent OK.")
 # This instance of the handler is what actually constitutes our plugin.
 queue_event = CeleryQueuer()
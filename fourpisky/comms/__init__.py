@@ -1,2 +1,3 @@
 import fourpisky.comms.email
 import fourpisky.comms.comet
+import fourpisky.comms.bulk
@@ -0,0 +1,93 @@
+"""
+Routines for sending many packets / messages at once.
+"""
+from __future__ import absolute_import
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SendResult = namedtuple('SendResult', 'item response error')
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token-bucket rate limiter.
+
+    Tokens accrue at `rate` per second, up to a maximum of `burst`.
+    Each call to :meth:`acquire` takes a token, blocking until one is
+    available. A `rate` of None means no limit.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _wait_time(self):
+        now = self._clock()
+        self._tokens = min(self.burst,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                wait = self._wait_time()
+            if not wait:
+                return
+            self._sleep(wait)
+
+
+def send_pipelined(items, send_function, max_in_flight=1, rate_limit=None,
+                   key=None):
+    """
+    Apply `send_function` to each item, keeping several sends in flight.
+
+    Up to `max_in_flight` sends run concurrently, with new sends started
+    no faster than `rate_limit` per second (on average, allowing bursts of
+    up to `max_in_flight`). Errors are caught and reported per-item, rather
+    than aborting the batch.
+
+    If `key` is given, items with the same ``key(item)`` (e.g. repeats of
+    a VOEvent IVORN) are sent one after another, in input order, by a single
+    worker - so only items with different keys are sent concurrently.
+
+    Returns:
+        list: A :class:`.SendResult` for each item, in input order.
+    """
+    bucket = TokenBucket(rate_limit, burst=max_in_flight)
+    results = [None] * len(items)
+
+    groups = OrderedDict()
+    for idx, item in enumerate(items):
+        group_key = key(item) if key is not None else idx
+        groups.setdefault(group_key, []).append(idx)
+
+    def send_group(indices):
+        for idx in indices:
+            item = items[idx]
+            try:
+                bucket.acquire()
+                results[idx] = SendResult(item, send_function(item), None)
+            except Exception as e:
+                results[idx] = SendResult(item, None, e)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        for future in [pool.submit(send_group, indices)
+                       for indices in groups.values()]:
+            future.result()
+    return results
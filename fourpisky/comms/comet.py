@@ -1,14 +1,206 @@
 from __future__ import absolute_import
 import logging
+import select
+import socket
+import struct
 import subprocess
+import threading
 import voeventparse
 import tempfile
 import textwrap
+from lxml import etree
 
 logger = logging.getLogger(__name__)
 
 
+class VOEventSendError(subprocess.CalledProcessError):
+    """
+    Raised if the broker refuses (NAKs) a VOEvent.
+
+    Subclasses CalledProcessError, so code handling failures of the
+    ``comet-sendvo`` subprocess also handles these.
+    """
+
+    def __init__(self, ivorn, reason):
+        super(VOEventSendError, self).__init__(
+            returncode=1, cmd='VTP send', output=reason)
+        self.ivorn = ivorn
+        self.reason = reason
+
+    def __str__(self):
+        return "Broker refused VOEvent {}: {}".format(self.ivorn, self.reason)
+
+
+class VtpSender(object):
+    """
+    Sends VOEvents to a broker over the VOEvent Transport Protocol.
+
+    Implements the 'author' side of VTP directly: each packet is sent as a
+    length-prefixed message and we wait for the broker's ack / nak.
+    The TCP connection is kept open between sends where the broker allows
+    it. Comet closes receiver connections after each event: once we see
+    that, we close our end after each ack too, rather than racing the
+    broker's close with our next send. Sends are serialised, so an instance
+    may be shared between threads.
+    """
+
+    def __init__(self, host='localhost', port=8098, timeout=20.):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+        self._n_received = 0
+        #: Set once we find the broker closes the connection after each ack.
+        self.closes_after_ack = False
+
+    def _connect(self):
+        self.close()
+        logger.debug("Opening VTP connection to {}:{}".format(
+            self.host, self.port))
+        self._sock = socket.create_connection((self.host, self.port),
+                                              timeout=self.timeout)
+
+    def _connection_usable(self):
+        if self._sock is None:
+            return False
+        # A readable socket with nothing to read has been closed by the peer.
+        readable, _, _ = select.select([self._sock], [], [], 0)
+        if readable:
+            try:
+                if not self._sock.recv(1, socket.MSG_PEEK):
+                    self.closes_after_ack = True
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def _recv_exactly(self, nbytes):
+        chunks = []
+        while nbytes:
+            chunk = self._sock.recv(nbytes)
+            if not chunk:
+                raise ConnectionError("VTP connection closed by broker")
+            chunks.append(chunk)
+            nbytes -= len(chunk)
+            self._n_received += len(chunk)
+        return b''.join(chunks)
+
+    def _send_message(self, payload):
+        self._sock.sendall(struct.pack('!I', len(payload)) + payload)
+
+    def _await_response(self):
+        length = struct.unpack('!I', self._recv_exactly(4))[0]
+        return self._recv_exactly(length)
+
+    def send(self, voevent):
+        """
+        Send a VOEvent, and wait for acknowledgement.
+
+        Reconnects and retries once if the connection has gone away before
+        or during the send - or if an idle, reused connection turns out to
+        have been closed by the broker before our packet arrived (it is
+        reset with no reply at all). Otherwise, once the packet is sent we
+        never resend it, as the broker may already have accepted it.
+
+        Returns:
+            bytes: The broker's 'ack' Transport message.
+        Raises:
+            VOEventSendError: If the broker replies with a 'nak' or an
+                unreadable response, or if no reply is received after
+                sending.
+            OSError: If we cannot connect to the broker, or the send fails.
+        """
+        ivorn = voevent.attrib['ivorn']
+        payload = voeventparse.dumps(voevent)
+        with self._lock:
+            reused = self._connection_usable()
+            for attempt in (1, 2):
+                try:
+                    if not reused:
+                        self._connect()
+                    self._send_message(payload)
+                except OSError:
+                    self.close()
+                    if attempt == 2:
+                        raise
+                    logger.debug("VTP connection lost, reconnecting")
+                    reused = False
+                    continue
+                self._n_received = 0
+                try:
+                    response = self._await_response()
+                except OSError as e:
+                    self.close()
+                    if (attempt == 1 and reused and not self._n_received
+                            and isinstance(e, ConnectionError)):
+                        logger.debug("Idle VTP connection was closed by the "
+                                     "broker, reconnecting")
+                        self.closes_after_ack = True
+                        reused = False
+                        continue
+                    raise VOEventSendError(
+                        ivorn, "no acknowledgement received ({})".format(e))
+                break
+            if self.closes_after_ack:
+                self.close()
+        try:
+            transport = etree.fromstring(response)
+        except etree.XMLSyntaxError as e:
+            raise VOEventSendError(
+                ivorn, "unreadable response from broker ({})".format(e))
+        role = transport.attrib.get('role')
+        if role != 'ack':
+            reason = transport.findtext('Meta/Result',
+                                        default='no reason given')
+            raise VOEventSendError(ivorn, "{} ({})".format(role, reason))
+        logger.debug("VTP ack received for {}".format(ivorn))
+        return response
+
+
+_vtp_senders = threading.local()
+
+
+def get_vtp_sender(host='localhost', port=8098):
+    """
+    Get the :class:`.VtpSender` for a given broker.
+
+    Senders are cached per-thread, so concurrent sends from different
+    threads use separate connections.
+    """
+    senders = getattr(_vtp_senders, 'by_address', None)
+    if senders is None:
+        senders = _vtp_senders.by_address = {}
+    if (host, port) not in senders:
+        senders[(host, port)] = VtpSender(host, port)
+    return senders[(host, port)]
+
+
 def send_voevent(voevent, host='localhost', port=8098):
+    """
+    Send a VOEvent to a broker, via VTP.
+
+    Falls back to the ``comet-sendvo`` subprocess if we cannot talk to the
+    broker directly.
+    """
+    logger.debug("VTP send voevent: {}".format(voevent.attrib['ivorn']))
+    try:
+        return get_vtp_sender(host, port).send(voevent)
+    except OSError:
+        logger.warning(
+            "Direct VTP send to {}:{} failed, falling back to "
+            "comet-sendvo".format(host, port), exc_info=True)
+    return send_voevent_via_subprocess(voevent, host, port)
+
+
+def send_voevent_via_subprocess(voevent, host='localhost', port=8098):
     logger.debug("comet-sendvo voevent: {}".format(voevent.attrib['ivorn']))
     tf = tempfile.TemporaryFile()
     voeventparse.dump(voevent, tf)
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 import smtplib
+import threading
 # import sendgrid
 from sendgrid import SendGridAPIClient
 import fourpisky.utils as utils
@@ -20,6 +21,131 @@ class EmailConfigKeys():
 keys = EmailConfigKeys()
 
 
+class SmtpMailer(object):
+    """
+    Sends email via an SMTP login, keeping the session open between sends.
+
+    We connect (and STARTTLS / log in) on first use, then re-use the
+    authenticated session for subsequent messages. If the server has dropped
+    the connection in the meantime (or closes it now, replying '421' - as
+    servers do with idle sessions), we reconnect and retry once - but only
+    up to the MAIL / RCPT commands. Once the message has been sent (DATA),
+    any failure is final, since the server may already have accepted it.
+    Sends are serialised, so an instance may be shared between threads.
+    """
+
+    def __init__(self, account, use_starttls=True, timeout=60):
+        self.account = account
+        self.use_starttls = use_starttls
+        self.timeout = timeout
+        self.n_logins = 0
+        self._smtp = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self.close()
+        logger.debug("Starting SMTP session with {}:{}".format(
+            self.account.smtp_server, self.account.smtp_port))
+        smtpserver = smtplib.SMTP(self.account.smtp_server,
+                                  self.account.smtp_port,
+                                  timeout=self.timeout)
+        smtpserver.ehlo()
+        if self.use_starttls:
+            smtpserver.starttls()
+            smtpserver.ehlo()
+        smtpserver.login(self.account.username,
+                         self.account.password)
+        self.n_logins += 1
+        self._smtp = smtpserver
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                # (Includes SMTPException) Already disconnected, most likely.
+                pass
+            finally:
+                self._smtp = None
+
+    def _send_envelope(self, sender, recipient_addresses):
+        # MAIL / RCPT, as for the first part of ``SMTP.sendmail``.
+        # Nothing is delivered before DATA, so these are safe to retry.
+        smtp = self._smtp
+        smtp.ehlo_or_helo_if_needed()
+        code, resp = smtp.mail(sender)
+        if code != 250:
+            if code != 421:
+                smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, sender)
+        refused = {}
+        for address in recipient_addresses:
+            code, resp = smtp.rcpt(address)
+            if code == 421:
+                raise smtplib.SMTPResponseException(code, resp)
+            if code not in (250, 251):
+                refused[address] = (code, resp)
+        if len(refused) == len(recipient_addresses):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+    def send(self, recipient_addresses, subject, body_text):
+        recipient_addresses = utils.listify(recipient_addresses)
+        sender = self.account.username
+        recipients_str = ",".join(recipient_addresses)
+        header = "".join(['To: ', recipients_str, '\n',
+                          'From: ', sender, '\n',
+                          'Subject: ', subject, '\n'])
+
+        msg = "".join([header, '\n',
+                       body_text, '\n\n'])
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._smtp is None:
+                        self._connect()
+                    logger.debug("Logged in, emailing " + recipients_str)
+                    self._send_envelope(sender, recipient_addresses)
+                    break
+                except (smtplib.SMTPServerDisconnected,
+                        smtplib.SMTPResponseException, ConnectionError,
+                        TimeoutError) as e:
+                    if (isinstance(e, smtplib.SMTPResponseException)
+                            and e.smtp_code != 421):
+                        raise
+                    self.close()
+                    if attempt == 2:
+                        raise
+                    logger.debug("SMTP session dropped, reconnecting")
+            try:
+                code, resp = self._smtp.data(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError,
+                    TimeoutError):
+                self.close()
+                raise
+            if code != 250:
+                if code == 421:
+                    self.close()
+                else:
+                    self._smtp.rset()
+                raise smtplib.SMTPDataError(code, resp)
+        logger.debug('Message sent')
+
+
+_smtp_mailers = {}
+_smtp_mailers_lock = threading.Lock()
+
+
+def get_smtp_mailer(account):
+    """
+    Get the shared :class:`.SmtpMailer` for a given login.
+    """
+    with _smtp_mailers_lock:
+        if account not in _smtp_mailers:
+            _smtp_mailers[account] = SmtpMailer(account)
+        return _smtp_mailers[account]
+
+
 def send_email_by_smtp(recipient_addresses,
                        subject,
                        body_text,
@@ -27,33 +153,10 @@ def send_email_by_smtp(recipient_addresses,
                        ):
     """
     Send email using a Gmail SMTP login.
-    """
 
-    logger.debug("Loaded account, starting SMTP session")
-    recipient_addresses = utils.listify(recipient_addresses)
-
-    smtpserver = smtplib.SMTP(account.smtp_server,
-                              account.smtp_port)
-    smtpserver.ehlo()
-    smtpserver.starttls()
-    smtpserver.ehlo
-    smtpserver.login(account.username,
-                     account.password)
-
-    sender = account.username
-
-    recipients_str = ",".join(recipient_addresses)
-
-    logger.debug("Logged in, emailing " + recipients_str)
-    header = "".join(['To: ', recipients_str, '\n',
-                      'From: ', sender, '\n',
-                      'Subject: ', subject, '\n'])
-
-    msg = "".join([header, '\n',
-                   body_text, '\n\n'])
-    smtpserver.sendmail(sender, recipient_addresses, msg)
-    logger.debug('Message sent')
-    smtpserver.close()
+    Re-uses a persistent, authenticated session for the account.
+    """
+    get_smtp_mailer(account).send(recipient_addresses, subject, body_text)
 
 
 def send_email_by_sendgrid(
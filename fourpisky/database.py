@@ -1,4 +1,6 @@
+from sqlalchemy import or_
 from sqlalchemy.engine.url import URL
+from voeventdb.server.database.models import Voevent
 
 import getpass
 
@@ -15,3 +17,47 @@ voevent_broker_db_params = dict(drivername=drivername,
                                 database=dbname)
 voevent_broker_db_url = URL(**voevent_broker_db_params)
 
+
+# Max number of IVORNs / prefixes bundled into a single SQL statement:
+DEDUP_QUERY_CHUNKSIZE = 500
+
+
+def _chunks(seq, chunksize):
+    for idx in range(0, len(seq), chunksize):
+        yield seq[idx:idx + chunksize]
+
+
+def _escape_like(s):
+    return s.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def ivorns_present(session, ivorns):
+    """
+    Bulk predicate, returns the subset of ``ivorns`` found in the database.
+
+    Equivalent to calling ``convenience.ivorn_present`` for each IVORN, but
+    makes one ``IN`` query per chunk of IVORNs.
+    """
+    ivorns = sorted(set(ivorns))
+    present = set()
+    for chunk in _chunks(ivorns, DEDUP_QUERY_CHUNKSIZE):
+        q = session.query(Voevent.ivorn).filter(Voevent.ivorn.in_(chunk))
+        present.update(row.ivorn for row in q)
+    return present
+
+
+def ivorns_matching_prefixes(session, ivorn_prefixes):
+    """
+    Returns the set of IVORNs in the database matching any of
+    ``ivorn_prefixes``.
+
+    Makes one query per chunk of prefixes.
+    """
+    prefixes = sorted(set(ivorn_prefixes))
+    matching_ivorns = set()
+    for chunk in _chunks(prefixes, DEDUP_QUERY_CHUNKSIZE):
+        q = session.query(Voevent.ivorn).filter(or_(
+            *[Voevent.ivorn.like(_escape_like(p) + '%', escape='\\')
+              for p in chunk]))
+        matching_ivorns.update(row.ivorn for row in q)
+    return matching_ivorns
@@ -2,4 +2,6 @@
 
 celery_config_module = "FPS_CELERY_CONFIG"
 use_dummy_mode = "FPS_DUMMY_MODE"
-voeventdb_dbname = "FPS_VOEVENTDB_DBNAME"
\ No newline at end of file
+voeventdb_dbname = "FPS_VOEVENTDB_DBNAME"
+sync_delivery = "FPS_SYNC_DELIVERY"
+template_cache_dir = "FPS_TEMPLATE_CACHE_DIR"
@@ -1,4 +1,5 @@
 import lxml
+import lxml.etree
 import lxml.html
 from collections import defaultdict
 import voeventparse as vp
@@ -41,10 +42,51 @@ class AsassnFeed(FeedBase):
     text_params_groupname = 'asassn_params'
     url_params_groupname = 'asassn_urls'
 
-    def __init__(self, hash_cache_path=None):
+    def __init__(self, hash_cache_path=None, incremental=False,
+                 known_run_length=20, cutoff=None, keep_raw=False):
+        """
+        Args:
+            hash_cache_path: See :class:`.FeedBase`.
+            incremental (bool): If True, stop parsing the (newest-first)
+                table once we hit a run of rows which are already known,
+                rather than parsing the whole page.
+                Rows are 'known' if listed in the feed's
+                :attr:`.FeedBase.ivorn_index`, or older than `cutoff`.
+            known_run_length (int): Number of consecutive known rows
+                required to stop an incremental parse.
+            cutoff (datetime): Rows with earlier timestamps are treated as
+                known during an incremental parse. (Timezone-aware, UTC.)
+            keep_raw (bool): Retain the table-cell elements for each row,
+                under the 'raw' key of the row dict.
+        """
+        self.incremental = incremental
+        self.known_run_length = known_run_length
+        self.cutoff = cutoff
+        self.keep_raw = keep_raw
         super(AsassnFeed, self).__init__(hash_cache_path)
 
     def generate_voevent(self, feed_id):
+        return self.generate_voevents([feed_id])[0]
+
+    def generate_voevents(self, feed_ids):
+        """
+        Generate VOEvents for a batch of feed IDs.
+
+        Positions for the whole batch are parsed in a single array-valued
+        SkyCoord, which is much cheaper than converting them one at a time.
+        """
+        if not feed_ids:
+            return []
+        params_list = [self.event_id_data_map[feed_id]['param']
+                       for feed_id in feed_ids]
+        posn_sc = SkyCoord([params['ra'] for params in params_list],
+                           [params['dec'] for params in params_list],
+                           unit=(u.hourangle, u.deg))
+        return [self._build_voevent(feed_id, ra_deg, dec_deg)
+                for feed_id, ra_deg, dec_deg in zip(
+                    feed_ids, posn_sc.ra.deg, posn_sc.dec.deg)]
+
+    def _build_voevent(self, feed_id, ra_deg, dec_deg):
         rowdict = self.event_id_data_map[feed_id]
         params = rowdict['param']
         urls = rowdict['url']
@@ -61,16 +103,13 @@ class AsassnFeed(FeedBase):
         timestamp_dt = asassn_timestamp_str_to_datetime(
             params[AsassnKeys.detection_timestamp])
 
-        posn_sc = SkyCoord(params['ra'], params['dec'],
-                           unit=(u.hourangle, u.deg))
-
         # Couldn't find a formal analysis of positional accuracy, but
         # http://dx.doi.org/10.1088/0004-637X/788/1/48
         # states the angular resolution as 16 arcseconds, so we'll go with that.
         err_radius_estimate = 16 * u.arcsec
 
-        posn_simple = vp.Position2D(ra=posn_sc.ra.deg,
-                                    dec=posn_sc.dec.deg,
+        posn_simple = vp.Position2D(ra=ra_deg,
+                                    dec=dec_deg,
                                     err=err_radius_estimate.to(u.deg).value,
                                     units=vp.definitions.units.degrees,
                                     system=vp.definitions.sky_coord_system.utc_icrs_geo,
@@ -170,9 +209,48 @@ class AsassnFeed(FeedBase):
         ]
 
     def parse_content_to_event_data_list(self):
-        tree = lxml.html.fromstring(self.content)
-        events = transform_pagetree(tree)
-        return events
+        events = iter_streamed_events(self.content, keep_raw=self.keep_raw)
+        if self.incremental:
+            return self._take_until_known_run(events)
+        return list(events)
+
+    def _row_is_known(self, event_data):
+        if self.cutoff is not None:
+            timestamp = asassn_timestamp_str_to_datetime(
+                event_data['param'][AsassnKeys.detection_timestamp])
+            if timestamp < self.cutoff:
+                return True
+        if self.ivorn_index is not None:
+            try:
+                feed_id = self.event_data_to_event_id(event_data)
+            except ValueError:
+                # Leave it to `event_id_data_map` to report the problem.
+                return False
+            return self.feed_id_to_ivorn(feed_id) in self.ivorn_index
+        return False
+
+    def _take_until_known_run(self, events):
+        """
+        Consume events until we find a run of known rows.
+
+        Returns only the unknown rows seen along the way.
+        """
+        unknown_events = []
+        n_seen = 0
+        known_run = 0
+        for event_data in events:
+            n_seen += 1
+            if self._row_is_known(event_data):
+                known_run += 1
+                if known_run >= self.known_run_length:
+                    break
+            else:
+                known_run = 0
+                unknown_events.append(event_data)
+        logger.debug(
+            "Incremental parse: {} rows checked, {} not previously "
+            "known".format(n_seen, len(unknown_events)))
+        return unknown_events
 
 
 # ==========================================================================
@@ -210,11 +288,6 @@ def extract_asassn_id(rowdict):
             first_url_text_href_pair = alt_id_url[0]
             external_id = first_url_text_href_pair[0]
         else:
-            cell = rowdict['raw'][asassn_headers_2018.index('ATEL')]
-            # print cell.text
-            # print [c.text for c in cell.getchildren()]
-            # print '-------------------'
-            # print '-------------------'
             raise ValueError('Could not extract Id for this row, '
                              'no id found')
     return external_id
@@ -311,7 +384,7 @@ def extract_etree_cells(tree):
     return cells
 
 
-def asassn_htmlrow_to_dict(cellrow):
+def asassn_htmlrow_to_dict(cellrow, keep_raw=True):
     param_dict = {}
     url_dict = defaultdict(list)
     for idx, col_hdr in enumerate(asassn_headers_2018):
@@ -334,29 +407,19 @@ def asassn_htmlrow_to_dict(cellrow):
             continue  # Skip this one if it's a  '------' style placeholder
         trimmed_params[k] = v
 
-    return {'param': trimmed_params,
-            'url': url_dict,
-            'raw': cellrow
-            }
+    rowdict = {'param': trimmed_params,
+               'url': url_dict,
+               }
+    if keep_raw:
+        rowdict['raw'] = cellrow
+    return rowdict
 
 
-def transform_pagetree(tree):
+def filter_bad_rows(event_dicts):
     """
-    Restructure an array of cells into a list of dictionaries
-
-    Since parsing to this stage is robust, we also perform bad-row excision here.
+    Excise known-bad rows, and rows older than the reparse date.
     """
-    cells = extract_etree_cells(tree)
-    cellrows = []
-    # Stride through cells at rowlength inferred by ncols
-    for row_idx, _ in enumerate(cells[::asassn_ncols]):
-        # Select all cells in current stride, create list representing row
-        row = [c for c in cells[
-                          asassn_ncols * row_idx:asassn_ncols * row_idx + asassn_ncols]]
-        cellrows.append(row)
-    events = []
-    for cr in cellrows:
-        event_dict = asassn_htmlrow_to_dict(cr)
+    for event_dict in event_dicts:
         row_id = event_dict['param'].get(AsassnKeys.id_asassn)
         if row_id in ASSASN_BAD_IDS:
             logger.warning('Removed bad ASASSN row with ID {}'.format(row_id))
@@ -367,8 +430,95 @@ def transform_pagetree(tree):
             )
             if not row_timestamp > ASASSN_EARLIEST_REPARSE_DATE:
                 continue
-            events.append(event_dict)
         except:
             logger.exception('Error parsing rowdict:' + str(event_dict))
             raise
-    return events
+        yield event_dict
+
+
+def iter_pagetree_events(tree):
+    """
+    Yield a dictionary for each row of the table, in page order.
+
+    Since parsing to this stage is robust, we also perform bad-row excision
+    here.
+    """
+    cells = extract_etree_cells(tree)
+
+    def iter_rows():
+        # Stride through cells at rowlength inferred by ncols
+        for row_idx, _ in enumerate(cells[::asassn_ncols]):
+            # Select all cells in current stride, create list representing row
+            row = cells[asassn_ncols * row_idx:asassn_ncols * (row_idx + 1)]
+            yield asassn_htmlrow_to_dict(row)
+
+    return filter_bad_rows(iter_rows())
+
+
+def transform_pagetree(tree):
+    """
+    Restructure an array of cells into a list of dictionaries
+
+    Since parsing to this stage is robust, we also perform bad-row excision here.
+    """
+    return list(iter_pagetree_events(tree))
+
+
+def _iter_pull_parser_events(content, chunksize):
+    # We only need to see the table structure, not the cell contents:
+    parser = lxml.etree.HTMLPullParser(events=('start', 'end'),
+                                       tag=('table', 'tr', 'td', 'th'))
+    for offset in range(0, len(content), chunksize):
+        parser.feed(content[offset:offset + chunksize])
+        for event in parser.read_events():
+            yield event
+    parser.close()
+    for event in parser.read_events():
+        yield event
+
+
+def _iter_streamed_rows(content, keep_raw, chunksize):
+    table = None
+    n_header_rows = 0
+    row = []
+    for action, elt in _iter_pull_parser_events(content, chunksize):
+        if table is None:
+            if action == 'start' and elt.tag == 'table':
+                table = elt
+            continue
+        if action == 'end' and elt is table:
+            break
+        if action != 'end' or elt.getparent() is not table:
+            continue
+        # expect two header rows, then a malformed data row. Joy.
+        if n_header_rows < 2:
+            assert elt.tag == 'tr'
+            if n_header_rows == 0:
+                # Check headers unchanged
+                headers = tuple([c.text for c in elt.getchildren()])
+                assert headers == asassn_headers_2018
+            n_header_rows += 1
+            continue
+        row.append(elt)
+        if len(row) == asassn_ncols:
+            yield asassn_htmlrow_to_dict(row, keep_raw=keep_raw)
+            if not keep_raw:
+                for cell in row:
+                    cell.clear()
+                    table.remove(cell)
+            row = []
+    # We expect a multiple of assasn_ncols:
+    assert not row
+
+
+def iter_streamed_events(content, keep_raw=False, chunksize=2 ** 16):
+    """
+    Yield a dictionary for each row of the table, parsing the page as we go.
+
+    Equivalent to :func:`iter_pagetree_events`, but feeds the page through
+    an incremental parser and builds each row as soon as its cells are
+    complete. Unless `keep_raw` is set, cell elements are cleared and
+    detached once consumed, so memory use does not grow with the page - and
+    if the consumer stops early, the rest of the page is never parsed.
+    """
+    return filter_bad_rows(_iter_streamed_rows(content, keep_raw, chunksize))
@@ -1,19 +1,80 @@
 from __future__ import absolute_import
 
-from contextlib import closing
+import bisect
+import datetime
 import hashlib
 import logging
 import requests
-import shelve
-import urllib.request, urllib.error, urllib.parse
+import requests.adapters
 
+from fourpisky.feeds.feedstate import (
+    FeedStateKeys,
+    FeedStateStore,
+    get_feed_state_store,
+)
+from fourpisky.feeds.knownivorns import KnownIvornIndex
+from fourpisky.database import ivorns_matching_prefixes, ivorns_present
 from fourpisky.requiredatts import RequiredAttributesMetaclass
 from fourpisky.utils import sanitise_string_for_stream_id
 from voeventdb.server.database import session_registry
-import voeventdb.server.database.convenience as dbconvenience
 
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive connection pool, used for all feed fetches:
+http_session = requests.Session()
+for _prefix in ('http://', 'https://'):
+    http_session.mount(_prefix, requests.adapters.HTTPAdapter(
+        pool_connections=10, pool_maxsize=10))
+
+# Response headers stored with the hash, used to make conditional requests,
+# mapped to the corresponding feed-state fields:
+VALIDATOR_HEADERS = {
+    'ETag': FeedStateKeys.etag,
+    'Last-Modified': FeedStateKeys.last_modified,
+}
+
+
+def extract_validators(response):
+    return {hdr: response.headers[hdr] for hdr in VALIDATOR_HEADERS
+            if hdr in response.headers}
+
+
+def conditional_request_headers(validators):
+    headers = {}
+    if 'ETag' in validators:
+        headers['If-None-Match'] = validators['ETag']
+    if 'Last-Modified' in validators:
+        headers['If-Modified-Since'] = validators['Last-Modified']
+    return headers
+
+
+def ivorn_prefixes_present(session, ivorn_prefixes):
+    """
+    Bulk predicate, returns the subset of ``ivorn_prefixes`` matched by at
+    least one IVORN in the database.
+
+    Equivalent to calling ``convenience.ivorn_prefix_present`` for each
+    prefix, but fetches all matching IVORNs in bulk, then resolves the
+    matches locally.
+    """
+    return match_prefixes(ivorn_prefixes,
+                          ivorns_matching_prefixes(session, ivorn_prefixes))
+
+
+def match_prefixes(prefixes, ivorns):
+    """
+    Returns the subset of ``prefixes`` which prefix one or more of ``ivorns``.
+    """
+    sorted_ivorns = sorted(ivorns)
+    matched = set()
+    for prefix in prefixes:
+        # Any string starting with `prefix` sorts immediately after it:
+        idx = bisect.bisect_left(sorted_ivorns, prefix)
+        if (idx < len(sorted_ivorns)
+                and sorted_ivorns[idx].startswith(prefix)):
+            matched.add(prefix)
+    return matched
+
 
 class FeedBase(object):
     """
@@ -31,53 +92,140 @@ class FeedBase(object):
     ]
 
     def __init__(self, hash_cache_path):
+        """
+        Args:
+            hash_cache_path: Path to the feed-state database used to store
+                'last-seen' hashes, or an already open
+                :class:`.FeedStateStore`. May be None, to always process.
+        """
+        self._state_store = None
+        if isinstance(hash_cache_path, FeedStateStore):
+            self._state_store = hash_cache_path
+            hash_cache_path = getattr(hash_cache_path, 'path', None)
         self.hash_cache_path = hash_cache_path
         self._content = None
+        self._old_state = None
+        self._old_state_loaded = False
         self._old_hash = None
         self._new_hash = None
+        self._new_validators = None
         self._event_id_data_map = None
+        self._ivorn_index = None
 
     @property
     def content(self):
         if self._content is None:
-            r = requests.get(self.url)
+            r = http_session.get(self.url)
             r.raise_for_status()
             self._content = r.content
+            if self._new_validators is None:
+                self._new_validators = extract_validators(r)
         return self._content
 
     @property
-    def old_hash(self):
-        if not self.hash_cache_path:
+    def state_store(self):
+        if self._state_store is None and self.hash_cache_path:
+            self._state_store = get_feed_state_store(self.hash_cache_path)
+        return self._state_store
+
+    def load_old_state(self):
+        """
+        Read the stored ('last-seen') state of this feed.
+
+        The state is read from the store once, then cached - so
+        :attr:`old_hash` and :attr:`old_validators` describe the feed as it
+        was before this run. Call this from the thread which owns the
+        store, before hash-checking the feed on a worker thread.
+
+        Returns a dict of :class:`.FeedStateKeys` fields, or None.
+        """
+        if not self._old_state_loaded:
+            self._old_state = self._load_feed_state()
+            self._old_state_loaded = True
+        return self._old_state
+
+    def _load_feed_state(self):
+        if self.state_store is None:
             logger.debug("No hash-cache path set")
             return None
-        with closing(shelve.open(self.hash_cache_path)) as hash_cache:
-            if self.url in hash_cache:
-                return hash_cache[self.url]
-            else:
-                logger.debug("Feed {} not found in hash-cache at {}".format(
-                    self.url, self.hash_cache_path
-                ))
-        return None
+        state = self.state_store.get(self.url)
+        if state is None:
+            logger.debug("Feed {} not found in hash-cache at {}".format(
+                self.url, self.hash_cache_path
+            ))
+        return state
+
+    @property
+    def old_hash(self):
+        state = self.load_old_state()
+        if state is None:
+            return None
+        return state[FeedStateKeys.md5]
+
+    @property
+    def old_validators(self):
+        """
+        HTTP cache-validators (ETag / Last-Modified) stored with the old hash.
+        """
+        state = self.load_old_state()
+        if state is None:
+            return {}
+        return {hdr: state[key] for hdr, key in VALIDATOR_HEADERS.items()
+                if state[key] is not None}
 
     @property
     def new_hash(self):
         if not self._new_hash:
-            if self.hash_byte_range:
+            old_validators = self.old_validators
+            if old_validators:
+                logger.debug(
+                    "Conditional GET of {} for hash-check".format(self.url))
+                r = http_session.get(
+                    self.url, headers=conditional_request_headers(
+                        old_validators))
+                r.raise_for_status()
+                if r.status_code == 304:
+                    logger.debug("Feed {} not modified".format(self.url))
+                    self._new_validators = old_validators
+                    self._new_hash = self.old_hash
+                    return self._new_hash
+                self._content = r.content
+                self._new_validators = extract_validators(r)
+                data = self._hash_data_from_content()
+            elif self.hash_byte_range:
                 logger.debug(
                     "Fetching bytes {start}-{end} from {url} for hash-check".format(
                         start=self.hash_byte_range[0],
                         end=self.hash_byte_range[1],
                         url=self.url,
                     ))
-                req = urllib.request.Request(self.url)
-                req.headers['Range'] = 'bytes={}-{}'.format(
-                    *self.hash_byte_range)
-                data = urllib.request.urlopen(req).read()
+                r = http_session.get(self.url, headers={
+                    'Range': 'bytes={}-{}'.format(*self.hash_byte_range)})
+                r.raise_for_status()
+                # For a 206 response, validators refer to the full content:
+                self._new_validators = extract_validators(r)
+                if r.status_code == 206:
+                    data = r.content
+                else:
+                    # Server ignored the range request, so we have it all:
+                    self._content = r.content
+                    data = self._hash_data_from_content()
             else:
                 data = self.content
             self._new_hash = hashlib.md5(data).hexdigest()
         return self._new_hash
 
+    def _hash_data_from_content(self):
+        """
+        Select the bytes to hash from the full content.
+
+        (Equivalent to the inclusive HTTP byte-range.)
+        """
+        if self.hash_byte_range:
+            return self.content[
+                   self.hash_byte_range[0]:self.hash_byte_range[1] + 1]
+        return self.content
+
     @property
     def mock_new_hash(self):
         """
@@ -89,13 +237,57 @@ class FeedBase(object):
             self._content[self.hash_byte_range[0]:self.hash_byte_range[1]]
         ).hexdigest()
 
+    @property
+    def ivorn_index(self):
+        """
+        Local index of IVORNs known to be in the database, if any.
+
+        Stored alongside the hash-cache, so disabled if no hash-cache path
+        is set.
+        """
+        if self._ivorn_index is None and self.hash_cache_path:
+            self._ivorn_index = KnownIvornIndex(
+                self.hash_cache_path + '.ivorns')
+        return self._ivorn_index
+
+    def record_known_ivorns(self, ivorns):
+        if self.ivorn_index is not None:
+            self.ivorn_index.add(ivorns)
+
     def save_new_hash(self):
-        with closing(shelve.open(self.hash_cache_path)) as hash_cache:
-            hash_cache[self.url] = self.new_hash
+        fields = {FeedStateKeys.md5: self.new_hash,
+                  FeedStateKeys.last_fetch: datetime.datetime.utcnow()}
+        for hdr, key in VALIDATOR_HEADERS.items():
+            fields[key] = (self._new_validators or {}).get(hdr)
+        self.state_store.update(self.url, **fields)
         logger.debug("Inserted hash for feed {} in cache {}; md5={}".format(
             self.url, self.hash_cache_path, self.new_hash
         ))
 
+    def save_fetch_time(self):
+        """
+        Record that the feed was fetched (e.g. when found unchanged).
+
+        Also stores any new cache-validators - these may change even when
+        the hashed content doesn't, and stale ones would force a full fetch
+        every time.
+        """
+        if self.state_store is not None:
+            fields = {FeedStateKeys.last_fetch: datetime.datetime.utcnow()}
+            if (self._new_validators is not None
+                    and self._new_validators != self.old_validators):
+                for hdr, key in VALIDATOR_HEADERS.items():
+                    fields[key] = self._new_validators.get(hdr)
+            self.state_store.update(self.url, **fields)
+
+    def save_new_entry_time(self):
+        """
+        Record that new entries were found in the feed.
+        """
+        if self.state_store is not None:
+            self.state_store.update(
+                self.url, last_new_entry=datetime.datetime.utcnow())
+
     @property
     def event_id_data_map(self):
         """
@@ -149,30 +341,80 @@ class FeedBase(object):
         as any previously broadcast voevents in the database. Therefore we
         can do an efficient lookup by calculating the relevant IVORN-prefix
         for each event in the `event_id_data_map` of this class.
+
+        The lookups are batched, so the number of database round-trips
+        scales with the number of chunks rather than the number of entries.
+        If an :attr:`ivorn_index` is available it is consulted first, and
+        only IVORNs it has never seen are checked against the database.
         """
-        s = session_registry()
-        new_ids = []
-        logger.debug("Checking database {} for duplicates from feed {}".format(
-            s.bind.engine.url.database, self.name
-        ))
+        index = self.ivorn_index
+        feed_id_ivorn_map = {feed_id: self.feed_id_to_ivorn(feed_id)
+                             for feed_id in self.event_id_data_map}
         logger.debug("Checking {} feed entries".format(
-            len(self.event_id_data_map)
+            len(feed_id_ivorn_map)
         ))
-        for feed_id in self.event_id_data_map:
-            ivo = self.feed_id_to_ivorn(feed_id)
-            if not dbconvenience.ivorn_present(s, ivo):
-                duplicate_prefixes = self.get_ivorn_prefixes_for_duplicate(
-                    feed_id)
-                duplicate_present = False
-                for prefix in duplicate_prefixes:
-                    if dbconvenience.ivorn_prefix_present(s, prefix):
-                        duplicate_present = True
-                        logger.warning(
-                            "Possible duplicate prefix detected: '{}', "
-                            "will not insert '{}'".format(prefix, ivo))
-                if not duplicate_present:
-                    new_ids.append(feed_id)
+        if index is not None:
+            unknown = [ivo for ivo in feed_id_ivorn_map.values()
+                       if ivo not in index]
+            logger.debug("{} entries not found in local IVORN index".format(
+                len(unknown)))
+        else:
+            unknown = list(feed_id_ivorn_map.values())
+
+        present = set(feed_id_ivorn_map.values()).difference(unknown)
+        s = None
+        if unknown:
+            s = session_registry()
+            logger.debug(
+                "Checking database {} for duplicates from feed {}".format(
+                    s.bind.engine.url.database, self.name
+                ))
+            present_in_db = ivorns_present(s, unknown)
+            self.record_known_ivorns(present_in_db)
+            present.update(present_in_db)
+
+        candidate_prefixes = {}
+        for feed_id, ivo in feed_id_ivorn_map.items():
+            if ivo not in present:
+                candidate_prefixes[feed_id] = (
+                    self.get_ivorn_prefixes_for_duplicate(feed_id))
+        all_prefixes = set()
+        for prefixes in candidate_prefixes.values():
+            all_prefixes.update(prefixes)
+        prefixes_present = set()
+        if index is not None:
+            prefixes_present.update(p for p in all_prefixes
+                                    if index.prefix_present(p))
+        unresolved_prefixes = all_prefixes - prefixes_present
+        if unresolved_prefixes:
+            if s is None:
+                s = session_registry()
+            matching_ivorns = ivorns_matching_prefixes(s, unresolved_prefixes)
+            self.record_known_ivorns(matching_ivorns)
+            prefixes_present.update(
+                match_prefixes(unresolved_prefixes, matching_ivorns))
+
+        new_ids = []
+        for feed_id, prefixes in candidate_prefixes.items():
+            duplicate_present = False
+            for prefix in prefixes:
+                if prefix in prefixes_present:
+                    duplicate_present = True
+                    logger.warning(
+                        "Possible duplicate prefix detected: '{}', "
+                        "will not insert '{}'".format(
+                            prefix, feed_id_ivorn_map[feed_id]))
+            if not duplicate_present:
+                new_ids.append(feed_id)
         return new_ids
 
     def generate_voevent(self, feed_id):
         raise NotImplementedError
+
+    def generate_voevents(self, feed_ids):
+        """
+        Generate VOEvents for a batch of feed IDs.
+
+        Derived classes may override this to amortise per-event overheads.
+        """
+        return [self.generate_voevent(feed_id) for feed_id in feed_ids]
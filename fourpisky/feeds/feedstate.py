@@ -0,0 +1,152 @@
+from __future__ import absolute_import
+
+import atexit
+import datetime
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FeedStateKeys():
+    """Fields recorded per feed URL by a :class:`.FeedStateStore`"""
+    md5 = 'md5'
+    etag = 'etag'
+    last_modified = 'last_modified'
+    last_fetch = 'last_fetch'
+    last_new_entry = 'last_new_entry'
+
+
+feed_state_fields = (
+    FeedStateKeys.md5,
+    FeedStateKeys.etag,
+    FeedStateKeys.last_modified,
+    FeedStateKeys.last_fetch,
+    FeedStateKeys.last_new_entry,
+)
+
+
+class FeedStateStore(object):
+    """
+    Interface for persisting the 'last-seen' state of scraped feeds.
+
+    Derived classes store a dict of :class:`.FeedStateKeys` fields for each
+    feed URL.
+    """
+
+    def get(self, url):
+        """
+        Returns a dict of stored fields for the feed, or None if not found.
+        """
+        raise NotImplementedError
+
+    def update(self, url, **fields):
+        """
+        Create or update the state for a feed. Unspecified fields are kept.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteFeedStateStore(FeedStateStore):
+    """
+    Feed-state store backed by an SQLite database.
+
+    The database is opened once and held open, in WAL mode, so overlapping
+    scraper processes can read and write concurrently without corruption
+    (writers wait for up to `timeout` seconds for a lock).
+    The connection may be shared between threads.
+    """
+
+    def __init__(self, path, timeout=30.):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feed_state ("
+                "url TEXT PRIMARY KEY, "
+                "md5 TEXT, "
+                "etag TEXT, "
+                "last_modified TEXT, "
+                "last_fetch TEXT, "
+                "last_new_entry TEXT)"
+            )
+        logger.debug("Opened feed-state store at {}".format(path))
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM feed_state WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return {k: row[k] for k in feed_state_fields}
+
+    def update(self, url, **fields):
+        unknown = set(fields).difference(feed_state_fields)
+        if unknown:
+            raise ValueError("Unknown feed-state fields: {}".format(unknown))
+        if not fields:
+            return
+        keys = sorted(fields)
+        values = [_to_db_value(fields[k]) for k in keys]
+        assignments = ', '.join('{} = ?'.format(k) for k in keys)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO feed_state (url) VALUES (?)", (url,))
+            self._conn.execute(
+                "UPDATE feed_state SET {} WHERE url = ?".format(assignments),
+                values + [url])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _to_db_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+_open_stores = {}
+_open_stores_lock = threading.Lock()
+
+
+def get_feed_state_store(path_or_store):
+    """
+    Get a feed-state store, opening it if necessary.
+
+    Accepts either an existing :class:`.FeedStateStore` instance (returned
+    as-is), or a path. Stores opened from a path are cached, so all feeds
+    configured with the same path share a single open store.
+    """
+    if isinstance(path_or_store, FeedStateStore):
+        return path_or_store
+    with _open_stores_lock:
+        if path_or_store not in _open_stores:
+            _open_stores[path_or_store] = SqliteFeedStateStore(path_or_store)
+        return _open_stores[path_or_store]
+
+
+def close_feed_state_stores():
+    """
+    Close all the stores opened (and cached) by :func:`get_feed_state_store`.
+
+    Registered to run at exit; may also be called directly, e.g. to release
+    the database files between tests.
+    """
+    with _open_stores_lock:
+        stores = list(_open_stores.values())
+        _open_stores.clear()
+    for store in stores:
+        store.close()
+
+
+atexit.register(close_feed_state_stores)
@@ -82,6 +82,38 @@ class GaiaFeed(FeedBase):
                 ]
 
     def generate_voevent(self, feed_id):
+        return self.generate_voevents([feed_id])[0]
+
+    def generate_voevents(self, feed_ids):
+        """
+        Generate VOEvents for a batch of feed IDs.
+
+        Positions and timestamps for the whole batch are converted with
+        single array-valued SkyCoord and Time objects, which is much cheaper
+        than converting them one at a time.
+        """
+        if not feed_ids:
+            return []
+        event_data_list = [self.event_id_data_map[feed_id]
+                           for feed_id in feed_ids]
+        posn_sc = SkyCoord([ed[GaiaKeys.ra] for ed in event_data_list],
+                           [ed[GaiaKeys.dec] for ed in event_data_list],
+                           unit=(u.deg, u.deg))
+        # NB GAIA values are in Barycentric co-ordinate time
+        # (http://en.wikipedia.org/wiki/Barycentric_Coordinate_Time)
+        observation_times_tcb = astropy.time.Time(
+            [ed[GaiaKeys.obs_timestamp] for ed in event_data_list],
+            scale='tcb')
+        # We convert to UTC, in keeping with other feeds:
+        observation_times_utc = observation_times_tcb.utc.datetime
+        return [self._build_voevent(feed_id, ra_deg, dec_deg,
+                                    obs_time_utc.replace(tzinfo=pytz.UTC))
+                for feed_id, ra_deg, dec_deg, obs_time_utc in zip(
+                    feed_ids, posn_sc.ra.deg, posn_sc.dec.deg,
+                    observation_times_utc)]
+
+    def _build_voevent(self, feed_id, ra_deg, dec_deg,
+                       observation_time_utc_dt):
         event_data = self.event_id_data_map[feed_id]
 
         stream_id = self.feed_id_to_stream_id(feed_id)
@@ -98,10 +130,6 @@ class GaiaFeed(FeedBase):
                    )
         v.How.Description = "Parsed from GAIA Science Alerts listings by 4PiSky-Bot."
 
-        posn_sc = SkyCoord(event_data[GaiaKeys.ra],
-                           event_data[GaiaKeys.dec],
-                           unit=(u.deg, u.deg))
-
         # Astrometric accuracy is a guesstimate,
         # http://gsaweb.ast.cam.ac.uk/alerts/tableinfo states that:
         # "The sky position may either refer to a source in Gaia's own
@@ -115,22 +143,13 @@ class GaiaFeed(FeedBase):
         # http://classic.sdss.org/dr7/products/general/astrometry.html
         err_radius_estimate = 0.1 * u.arcsec
 
-        posn_simple = vp.Position2D(ra=posn_sc.ra.deg,
-                                    dec=posn_sc.dec.deg,
+        posn_simple = vp.Position2D(ra=ra_deg,
+                                    dec=dec_deg,
                                     err=err_radius_estimate.to(u.deg).value,
                                     units=vp.definitions.units.degrees,
                                     system=vp.definitions.sky_coord_system.utc_icrs_geo,
                                     )
 
-        # NB GAIA values are in Barycentric co-ordinate time
-        # (http://en.wikipedia.org/wiki/Barycentric_Coordinate_Time)
-        observation_time_tcb = astropy.time.Time(
-            event_data[GaiaKeys.obs_timestamp],
-            scale='tcb')
-        # We convert to UTC, in keeping with other feeds:
-        observation_time_utc_dt = observation_time_tcb.utc.datetime
-        observation_time_utc_dt = observation_time_utc_dt.replace(tzinfo=pytz.UTC)
-
         vp.add_where_when(
             v,
             coords=posn_simple,
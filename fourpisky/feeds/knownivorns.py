@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+
+import bisect
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class KnownIvornIndex(object):
+    """
+    A local record of IVORNs known to be present in the voeventdb database.
+
+    Used by the feed-scrapers to avoid re-querying the database about
+    events they have already seen. Entries are only ever added once they
+    have been confirmed as present (or broadcast by us), so a positive
+    lookup can be trusted; anything not listed must be checked against the
+    database as usual.
+
+    Stored on disk as a plain-text file with one IVORN per line, appended to
+    as new IVORNs are recorded. The file is loaded lazily into a sorted list,
+    which also allows for cheap IVORN-prefix lookups.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._sorted_ivorns = None
+        self._ivorn_set = None
+
+    def _load(self):
+        if self._sorted_ivorns is not None:
+            return
+        ivorns = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                ivorns.update(line.strip() for line in f if line.strip())
+        logger.debug("Loaded {} known IVORNs from {}".format(
+            len(ivorns), self.path))
+        self._ivorn_set = ivorns
+        self._sorted_ivorns = sorted(ivorns)
+
+    def __contains__(self, ivorn):
+        self._load()
+        return ivorn in self._ivorn_set
+
+    def __len__(self):
+        self._load()
+        return len(self._ivorn_set)
+
+    def prefix_present(self, ivorn_prefix):
+        """
+        Returns whether any known IVORN starts with ``ivorn_prefix``.
+        """
+        self._load()
+        idx = bisect.bisect_left(self._sorted_ivorns, ivorn_prefix)
+        return (idx < len(self._sorted_ivorns)
+                and self._sorted_ivorns[idx].startswith(ivorn_prefix))
+
+    def add(self, ivorns):
+        """
+        Record one or more IVORNs as known-present.
+        """
+        self._load()
+        if isinstance(ivorns, str):
+            ivorns = [ivorns]
+        new_ivorns = sorted(set(ivorns) - self._ivorn_set)
+        if not new_ivorns:
+            return
+        with open(self.path, 'a') as f:
+            f.writelines(ivo + '\n' for ivo in new_ivorns)
+        for ivo in new_ivorns:
+            self._ivorn_set.add(ivo)
+            bisect.insort(self._sorted_ivorns, ivo)
+        logger.debug("Recorded {} new IVORNs in {}".format(
+            len(new_ivorns), self.path))
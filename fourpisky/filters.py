@@ -1,12 +1,71 @@
 """Various bits of logic designed to filter out unwanted VOEvent alerts"""
-from fourpisky.visibility import DEG_PER_RADIAN
+import datetime
+import numpy as np
+import pytz
+from fourpisky.planner import ObservingPlan, longest_windows
+from fourpisky.sites import AmiLA
+from fourpisky.vectorvis import compute_visibility
+
 
 class ami:
+    #: Only request observations of targets AMI-LA can observe for at
+    #: least `min_window` within `max_wait`.
+    max_wait = datetime.timedelta(hours=24)
+    min_window = datetime.timedelta(hours=1)
+
     @staticmethod
-    def reject(position):
-        dec_limit = 0.0
-        if position.dec*DEG_PER_RADIAN < dec_limit:
-            return "Target below declination limit of %s degrees" % dec_limit
-        return None
+    def reject(position, plan=None, current_time=None):
+        """
+        Args:
+            position (ephem.Equatorial): Target position.
+            plan (fourpisky.planner.ObservingPlan): Optional, an existing
+                plan for `position` covering (at least) AMI-LA. If not
+                supplied, one is created for `current_time` (default now).
+        """
+        if plan is None or AmiLA not in plan.sites:
+            plan = ObservingPlan(position, [AmiLA], current_time,
+                                 lookahead=ami.max_wait)
+        deadline = plan.current_time + ami.max_wait
+        for window in plan.windows_for(AmiLA):
+            if window.start > deadline:
+                break
+            if min(window.end, deadline) - window.start >= ami.min_window:
+                return None
+        return ("Target not observable from {} for {:.0f} hours within "
+                "the next {:.0f} hours".format(
+                    AmiLA.name,
+                    ami.min_window.total_seconds() / 3600.,
+                    ami.max_wait.total_seconds() / 3600.))
 
+    @staticmethod
+    def reject_many(ra, dec, times):
+        """
+        Vectorised :meth:`reject`, for many targets each at its own time.
 
+        Args:
+            ra, dec: J2000 positions (radians), array-like.
+            times: UTC times of evaluation, array-like of ``datetime64``.
+        Returns:
+            numpy.ndarray: Boolean mask, True where a target is rejected.
+        """
+        ra = np.atleast_1d(np.asarray(ra, dtype=float))
+        dec = np.atleast_1d(np.asarray(dec, dtype=float))
+        times = np.atleast_1d(np.asarray(times, dtype='datetime64[us]'))
+        rejected = np.zeros(ra.shape, dtype=bool)
+        if not len(ra):
+            return rejected
+        # Visibility repeats each sidereal day, so we can solve once per
+        # interval of alert times (c.f. ObservingPlan.refresh_interval):
+        interval = np.timedelta64(ObservingPlan.refresh_interval)
+        bins = (times - times.min()) // interval
+        for time_bin in np.unique(bins):
+            idx = bins == time_bin
+            reference_time = times[idx].min()
+            vis = compute_visibility(
+                ra[idx], dec[idx], [AmiLA],
+                pytz.utc.localize(reference_time.astype(datetime.datetime)))[0]
+            start = (times[idx] - reference_time) / np.timedelta64(1, 's')
+            longest = longest_windows(
+                vis, start, start + ami.max_wait.total_seconds())
+            rejected[idx] = longest < ami.min_window.total_seconds()
+        return rejected
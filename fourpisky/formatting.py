@@ -1,9 +1,11 @@
 """Various code snippets used for formatting and generating messages"""
 from __future__ import absolute_import
+import os
 import urllib.request, urllib.parse, urllib.error
+import fourpisky.env_vars as fps_env_vars
 from fourpisky.visibility import DEG_PER_RADIAN
 
-from jinja2 import Environment, PackageLoader
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader
 
 #----------------------------------------------------
 datetime_format_long = "%Y-%m-%d %H:%M:%S (%A)"
@@ -25,8 +27,30 @@ def urlquote(url):
 
 
 
-fps_template_env = Environment(loader=PackageLoader('fourpisky', 'templates'),
-                               trim_blocks=True, lstrip_blocks=True)
-fps_template_env.filters['datetime'] = format_datetime
-fps_template_env.filters['rad_to_deg'] = rad_to_deg
-fps_template_env.filters['urlquote'] = urlquote
\ No newline at end of file
+def make_bytecode_cache():
+    """
+    On-disk cache of compiled templates, shared between worker processes.
+
+    Stored under ``$FPS_TEMPLATE_CACHE_DIR`` if set, else a per-user
+    temporary directory.
+    """
+    cache_dir = os.environ.get(fps_env_vars.template_cache_dir, None)
+    if cache_dir is not None and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    return FileSystemBytecodeCache(cache_dir)
+
+
+def make_template_env(bytecode_cache=None):
+    # Templates are installed with the package, so we skip the 'has it
+    # changed?' check on every lookup (auto_reload):
+    env = Environment(loader=PackageLoader('fourpisky', 'templates'),
+                      trim_blocks=True, lstrip_blocks=True,
+                      auto_reload=False,
+                      bytecode_cache=bytecode_cache)
+    env.filters['datetime'] = format_datetime
+    env.filters['rad_to_deg'] = rad_to_deg
+    env.filters['urlquote'] = urlquote
+    return env
+
+
+fps_template_env = make_template_env(make_bytecode_cache())
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Plan follow-up: when, and from which sites, can we observe a target?
+"""
+from __future__ import absolute_import
+from collections import namedtuple
+import datetime
+import math
+
+import numpy as np
+
+from fourpisky.utils import utcnow
+from fourpisky.vectorvis import (compute_visibility, ALWAYS, SOMETIMES,
+                                 SECONDS_PER_SIDEREAL_DAY)
+
+ObservingWindow = namedtuple('ObservingWindow', 'site start end')
+
+
+class ObservingPlan(object):
+    """
+    Observing windows for a single target across a network of sites.
+
+    Covers the `lookahead` period following `current_time`. A window is a
+    period when the target is above a site's horizon.
+
+    Rise / set times are computed once (for all sites at once, see
+    :mod:`fourpisky.vectorvis`); thereafter they repeat every sidereal day,
+    so calling :meth:`advance` as time moves on is cheap. (We re-solve
+    after `refresh_interval`, to keep up with precession.)
+
+    Args:
+        position (ephem.Equatorial): Target position.
+        sites (list): :class:`ephem.Observer` instances, in order of
+            preference.
+        current_time (datetime.datetime): Timezone-aware start of the plan,
+            default now.
+        lookahead (datetime.timedelta): Length of the period to plan for.
+    """
+
+    refresh_interval = datetime.timedelta(days=1)
+
+    def __init__(self, position, sites, current_time=None,
+                 lookahead=datetime.timedelta(hours=24)):
+        self.position = position
+        self.sites = list(sites)
+        self.lookahead = lookahead
+        if current_time is None:
+            current_time = utcnow()
+        self._solve(current_time)
+        self.current_time = current_time
+
+    def _solve(self, reference_time):
+        self._reference_time = reference_time
+        self._site_visibility = compute_visibility(
+            [self.position.ra], [self.position.dec], self.sites,
+            reference_time)
+
+    def advance(self, current_time):
+        """
+        Move the start of the plan on to `current_time`.
+        """
+        if current_time - self._reference_time > self.refresh_interval:
+            self._solve(current_time)
+        self.current_time = current_time
+
+    @property
+    def end_time(self):
+        return self.current_time + self.lookahead
+
+    def windows_for(self, site):
+        """
+        List of :class:`.ObservingWindow` for one site, in time order.
+        """
+        site_idx = self.sites.index(site)
+        return self._site_windows(site_idx)
+
+    def _site_windows(self, site_idx):
+        site = self.sites[site_idx]
+        vis = self._site_visibility[site_idx]
+        vis_type = vis.type[0]
+        if vis_type == ALWAYS:
+            return [ObservingWindow(site, self.current_time, self.end_time)]
+        if vis_type != SOMETIMES:
+            return []
+
+        ref = self._reference_time
+        start_secs = (self.current_time - ref).total_seconds()
+        end_secs = (self.end_time - ref).total_seconds()
+        period = SECONDS_PER_SIDEREAL_DAY
+        rise = vis.next_rise[0]
+        up_secs = (vis.next_set[0] - rise) % period
+        # Include the window in progress, if any:
+        first = int(math.floor((start_secs - up_secs - rise) / period))
+        last = int(math.ceil((end_secs - rise) / period))
+        windows = []
+        for cycle in range(first, last + 1):
+            window_start = max(rise + cycle * period, start_secs)
+            window_end = min(rise + cycle * period + up_secs, end_secs)
+            if window_end > window_start:
+                windows.append(ObservingWindow(
+                    site,
+                    ref + datetime.timedelta(seconds=window_start),
+                    ref + datetime.timedelta(seconds=window_end)))
+        return windows
+
+    @property
+    def windows(self):
+        """
+        List of :class:`.ObservingWindow` for all sites, ordered by start
+        time (then by site preference).
+        """
+        windows = []
+        for site_idx in range(len(self.sites)):
+            windows.extend(
+                (w.start, site_idx, w) for w in self._site_windows(site_idx))
+        return [w for _, _, w in sorted(windows, key=lambda x: x[:2])]
+
+    @property
+    def coverage(self):
+        """
+        Periods when at least one site can observe, as a list of
+        ``(start, end)`` tuples.
+        """
+        merged = []
+        for window in self.windows:
+            if merged and window.start <= merged[-1][1]:
+                if window.end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], window.end)
+            else:
+                merged.append((window.start, window.end))
+        return merged
+
+    @property
+    def earliest(self):
+        """
+        The first :class:`.ObservingWindow` (i.e. giving the earliest site
+        able to observe, and when), or None.
+        """
+        windows = self.windows
+        if windows:
+            return windows[0]
+        return None
+
+
+def longest_windows(site_visibility, start, end):
+    """
+    Vectorised counterpart to :meth:`ObservingPlan.windows_for`.
+
+    Args:
+        site_visibility (fourpisky.vectorvis.SiteVisibility): Visibility of
+            an array of targets from one site.
+        start, end: Start / end of the period of interest for each target,
+            in seconds relative to the `current_time` of `site_visibility`.
+    Returns:
+        numpy.ndarray: The length (seconds) of the longest observing window
+        within the period, for each target (zero if there is none).
+    """
+    period = SECONDS_PER_SIDEREAL_DAY
+    start, end, vis_type = np.broadcast_arrays(
+        np.asarray(start, dtype=float), np.asarray(end, dtype=float),
+        site_visibility.type)
+    longest = np.where(vis_type == ALWAYS, end - start, 0.)
+
+    sometimes = vis_type == SOMETIMES
+    if not sometimes.any():
+        return longest
+    rise = site_visibility.next_rise[sometimes]
+    up_secs = (site_visibility.next_set[sometimes] - rise) % period
+    start, end = start[sometimes], end[sometimes]
+    # Include the window in progress, if any:
+    first = np.floor((start - up_secs - rise) / period)
+    n_cycles = int(np.max(np.ceil((end - rise) / period) - first)) + 1
+    best = np.zeros(rise.shape)
+    for cycle in range(n_cycles):
+        window_start = rise + (first + cycle) * period
+        overlap = (np.minimum(window_start + up_secs, end)
+                   - np.maximum(window_start, start))
+        best = np.maximum(best, overlap)
+    longest[sometimes] = best
+    return longest
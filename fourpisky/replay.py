@@ -0,0 +1,214 @@
+"""
+Replay archived VOEvent packets through the trigger logic, to measure
+end-to-end processing latency and throughput offline.
+
+Packets are replayed in order of author-time (``Who/Date``), either paced
+to match the original arrival times (optionally sped up), or as fast as
+possible.
+"""
+from __future__ import absolute_import
+from collections import OrderedDict, namedtuple
+import logging
+import os
+import time
+
+import dateutil.parser
+import numpy as np
+import pytz
+import voeventparse
+from lxml import etree
+
+from fourpisky.utils import pinned_utcnow
+
+logger = logging.getLogger(__name__)
+
+ReplayPacket = namedtuple('ReplayPacket', 'author_datetime bytestring')
+
+
+def sniff_author_datetime(bytestring, chunksize=1024):
+    """
+    Cheaply extract the author-time (``Who/Date``) of a VOEvent packet.
+
+    As for :func:`fourpisky.utils.sniff_voevent_header`, we only parse as
+    far as we need to.
+
+    Returns:
+        datetime.datetime: Timezone-aware (naive times are taken as UTC),
+        or None if the packet has no ``Who/Date``.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag='Date')
+    for offset in range(0, len(bytestring), chunksize):
+        parser.feed(bytestring[offset:offset + chunksize])
+        for _, element in parser.read_events():
+            if element.getparent().tag == 'Who':
+                dtime = dateutil.parser.parse(element.text)
+                if dtime.tzinfo is None:
+                    dtime = pytz.utc.localize(dtime)
+                return dtime
+    return None
+
+
+def iter_archive_packets(rootdir):
+    """
+    Generate :class:`.ReplayPacket` tuples, in author-time order, from a
+    directory tree of packets as written by
+    :func:`fourpisky.utils.archive_voevent_to_file`.
+
+    We index the author-time of every packet first, but only hold one
+    packet in memory at a time. Packets without an author-time are skipped.
+    """
+    index = []
+    for dirpath, _, filenames in os.walk(rootdir):
+        for filename in filenames:
+            if not filename.endswith('.xml'):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                author_datetime = sniff_author_datetime(f.read())
+            if author_datetime is None:
+                logger.warning("No author-time, skipping: " + path)
+                continue
+            index.append((author_datetime, path))
+    index.sort()
+    for author_datetime, path in index:
+        with open(path, 'rb') as f:
+            yield ReplayPacket(author_datetime, f.read())
+
+
+def iter_voeventdb_packets(session, yield_per=100):
+    """
+    Generate :class:`.ReplayPacket` tuples, in author-time order, from a
+    voeventdb database.
+    """
+    from voeventdb.server.database.models import Voevent
+    query = (session.query(Voevent.author_datetime, Voevent.xml)
+             .filter(Voevent.author_datetime.isnot(None))
+             .order_by(Voevent.author_datetime)
+             .yield_per(yield_per))
+    for author_datetime, xml in query:
+        yield ReplayPacket(author_datetime, bytes(xml))
+
+
+class LatencyStats(object):
+    """
+    Collects timings (seconds) for each stage of processing.
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+
+    def record(self, stage, secs):
+        self.timings.setdefault(stage, []).append(secs)
+
+    def percentiles(self, stage, percentiles=(50, 90, 99)):
+        return np.percentile(self.timings[stage], percentiles)
+
+    def summary(self, percentiles=(50, 90, 99)):
+        lines = ["{:<12} {:>8} ".format('stage', 'count') + " ".join(
+            "{:>10}".format('p{}/ms'.format(p)) for p in percentiles)]
+        for stage, timings in self.timings.items():
+            values = self.percentiles(stage, percentiles) * 1e3
+            lines.append("{:<12} {:>8d} ".format(stage, len(timings))
+                         + " ".join("{:>10.2f}".format(v) for v in values))
+        return "\n".join(lines)
+
+
+class Replayer(object):
+    """
+    Feeds packets to the matching trigger handlers, timing each stage.
+
+    Handlers are called directly, rather than via ``voevent_logic`` (which
+    logs and swallows any error), so that failures are counted. While a
+    packet is processed, :func:`fourpisky.utils.utcnow` is pinned to its
+    author-time, so that recency checks and report timestamps are evaluated
+    as at the time the packet was originally received.
+
+    Args:
+        handlers (TriggerRegistry): Handlers to dispatch each loaded VOEvent
+            to, e.g.
+            :data:`fourpisky.scripts.process_voevent.trigger_handlers`.
+        speedup (float): Pace the replay to the packet author-times, sped
+            up by this factor (1 for real-time). If None, replay as fast as
+            possible.
+        clock, sleep: Time functions, replaceable for testing.
+
+    Stages recorded are:
+
+    - ``lag``: Delay between a packet's (scaled) author-time and the start
+      of its processing - i.e. how far we are falling behind. (Paced modes
+      only.)
+    - ``parse``: Loading the packet.
+    - ``process``: Running the matching handlers.
+    - ``end_to_end``: From the packet's (scaled) author-time, or from when
+      it was read if not pacing, to the end of processing.
+    """
+
+    def __init__(self, handlers, speedup=None, clock=time.time,
+                 sleep=time.sleep):
+        if speedup is not None and speedup <= 0:
+            raise ValueError("speedup must be positive")
+        self.handlers = handlers
+        self.speedup = speedup
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = LatencyStats()
+        self.n_processed = 0
+        self.n_failed = 0
+        self.elapsed = 0.
+
+    @property
+    def throughput(self):
+        """Packets processed per second of wall-clock time."""
+        if not self.elapsed:
+            return float('nan')
+        return self.n_processed / self.elapsed
+
+    def run(self, packets):
+        """
+        Replay `packets`, an iterable of :class:`.ReplayPacket`.
+
+        Returns:
+            LatencyStats: The timings recorded.
+        """
+        start = self.clock()
+        first_author_datetime = None
+        for packet in packets:
+            if self.speedup is None:
+                release = self.clock()
+            else:
+                if first_author_datetime is None:
+                    first_author_datetime = packet.author_datetime
+                offset = (packet.author_datetime
+                          - first_author_datetime).total_seconds()
+                release = start + offset / self.speedup
+                wait = release - self.clock()
+                if wait > 0:
+                    self.sleep(wait)
+                self.stats.record('lag', max(self.clock() - release, 0.))
+            self._process(packet, release)
+        self.elapsed = self.clock() - start
+        return self.stats
+
+    def _process(self, packet, release):
+        t0 = self.clock()
+        try:
+            v = voeventparse.loads(packet.bytestring)
+        except Exception:
+            logger.exception("Could not load packet authored {}".format(
+                packet.author_datetime))
+            self.n_failed += 1
+            return
+        t1 = self.clock()
+        try:
+            with pinned_utcnow(packet.author_datetime):
+                for handler in self.handlers.matches(v):
+                    handler(v)
+        except Exception:
+            logger.exception("Error processing {}".format(v.attrib['ivorn']))
+            self.n_failed += 1
+            return
+        t2 = self.clock()
+        self.stats.record('parse', t1 - t0)
+        self.stats.record('process', t2 - t1)
+        self.stats.record('end_to_end', t2 - release)
+        self.n_processed += 1
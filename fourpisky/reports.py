@@ -1,5 +1,9 @@
+import concurrent.futures
 import datetime, pytz
+import ephem
 import socket
+import threading
+import time
 from fourpisky.visibility import get_ephem
 from fourpisky.formatting import fps_template_env, datetime_format_long
 from fourpisky.local import notification_email_prefix
@@ -8,6 +12,14 @@ import logging
 
 from fourpisky import __versiondict__
 
+logger = logging.getLogger(__name__)
+
+#: Max. time (seconds) to wait for a site's visibility calculations, before
+#: reporting visibility as unavailable.
+site_visibility_timeout = 10.
+#: Number of worker threads used for visibility calculations.
+visibility_pool_size = 4
+
 
 def base_context():
     """
@@ -21,28 +33,155 @@ def base_context():
     )
 
 
+class ReportRenderer(object):
+    """
+    Renders the report templates, with everything static prepared up-front.
+
+    All templates (including the 'includes') are loaded and compiled on
+    creation, and :func:`base_context` is evaluated once.
+    """
+
+    def __init__(self, env=fps_template_env):
+        self.env = env
+        self.templates = {name: env.get_template(name)
+                          for name in env.list_templates(extensions=['j2'])}
+        self.static_context = base_context()
+
+    def render(self, template_name, **context):
+        msg_context = dict(self.static_context)
+        msg_context.update(context)
+        return self.templates[template_name].render(msg_context)
+
+
+_report_renderer = None
+
+
+def get_report_renderer():
+    """
+    Get the (per-process) :class:`.ReportRenderer`, creating it if needed.
+    """
+    global _report_renderer
+    if _report_renderer is None:
+        _report_renderer = ReportRenderer()
+    return _report_renderer
+
+
+_observer_attributes = ('name', 'lat', 'lon', 'elevation', 'horizon',
+                        'pressure', 'temp')
+
+
+def _observer_params(site):
+    # get_ephem modifies the observer, and sites are shared module-level
+    # instances - so we pass their settings as plain values, and each
+    # calculation builds its own observer.
+    params = {attr: float(getattr(site, attr))
+              for attr in _observer_attributes if attr != 'name'}
+    params['name'] = site.name
+    return params
+
+
+def _site_ephem_from_params(position_params, observer_params, timestamp):
+    ra, dec, epoch = position_params
+    observer = ephem.Observer()
+    for attr, value in observer_params.items():
+        setattr(observer, attr, value)
+    return get_ephem(ephem.Equatorial(ra, dec, epoch=epoch), observer,
+                     timestamp)
+
+
+_visibility_pool = None
+_visibility_pool_lock = threading.Lock()
+
+
+def _get_visibility_pool():
+    global _visibility_pool
+    with _visibility_pool_lock:
+        if _visibility_pool is None:
+            _visibility_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=visibility_pool_size)
+        return _visibility_pool
+
+
+def _discard_visibility_pool():
+    # Abandon any stalled workers (threads can't be killed); a fresh pool
+    # is created on next use. The ephem-cache is shared, so nothing is lost.
+    global _visibility_pool
+    with _visibility_pool_lock:
+        pool, _visibility_pool = _visibility_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def compute_site_reports(position, sites, timestamp, timeout=None):
+    """
+    Compute visibility of `position` from each site, concurrently.
+
+    Calculations run in a thread pool, rather than processes: so they
+    share the in-process :data:`fourpisky.visibility.ephem_cache` (mostly
+    making them quick lookups), and work inside daemonic Celery worker
+    processes, which can't start children. Any site which raises an error,
+    or takes longer than `timeout` seconds (default
+    :data:`site_visibility_timeout`), has its visibility reported as None
+    - 'unavailable' - rather than holding up the report.
+
+    Returns:
+        list: ``(site, vis)`` tuples, where `vis` is as returned by
+        :func:`.get_ephem`, or None.
+    """
+    if timeout is None:
+        timeout = site_visibility_timeout
+    position_params = (float(position.ra), float(position.dec),
+                       float(position.epoch))
+    pool = _get_visibility_pool()
+
+    futures = []
+    for site in sites:
+        try:
+            args = (position_params, _observer_params(site), timestamp)
+            futures.append(pool.submit(_site_ephem_from_params, *args))
+        except Exception as e:
+            future = concurrent.futures.Future()
+            future.set_exception(e)
+            futures.append(future)
+
+    deadline = time.monotonic() + timeout
+    site_reports = []
+    stalled = False
+    for site, future in zip(sites, futures):
+        site_name = getattr(site, 'name', site)
+        try:
+            vis = future.result(timeout=max(0., deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            logger.warning("Timed out computing visibility for site {}".format(
+                site_name))
+            vis = None
+            stalled = True
+        except Exception:
+            logger.warning("Could not compute visibility for site {}".format(
+                site_name), exc_info=True)
+            vis = None
+        site_reports.append((site, vis))
+    if stalled:
+        _discard_visibility_pool()
+    return site_reports
+
+
 def generate_report_text(alert, sites, actions_taken,
                          report_timestamp=None):
     if report_timestamp is None:
-        report_timestamp = datetime.datetime.now(pytz.utc)
-    site_reports = [(site, get_ephem(alert.position, site, report_timestamp))
-                    for site in sites]
-    notification_template = fps_template_env.get_template('notify.j2')
-    msg_context = dict(alert=alert,
-                       report_timestamp=report_timestamp,
-                       site_reports=site_reports,
-                       actions_taken=actions_taken, )
-    msg_context.update(base_context())
-    msg = notification_template.render(msg_context)
-    return msg
+        report_timestamp = fps.utils.utcnow()
+    site_reports = compute_site_reports(alert.position, sites,
+                                        report_timestamp)
+    return get_report_renderer().render(
+        'notify.j2',
+        alert=alert,
+        report_timestamp=report_timestamp,
+        site_reports=site_reports,
+        actions_taken=actions_taken)
 
 
 def generate_testresponse_text(timestamp):
-    testresponse_template = fps_template_env.get_template('test_response.j2')
-    msg_context = dict(now=timestamp)
-    msg_context.update(base_context())
-    msg = testresponse_template.render(msg_context)
-    return msg
+    return get_report_renderer().render('test_response.j2', now=timestamp)
 
 
 def send_report(subject, text, contacts):
@@ -51,6 +190,9 @@ def send_report(subject, text, contacts):
                                text)
 
 
+error_report_subject = notification_email_prefix + "Error detected"
+
+
 class EmailHandler(logging.Handler):
     """
     We use this as a catch-all for reporting errors via email.
@@ -62,12 +204,10 @@ class EmailHandler(logging.Handler):
         self.recipients = recipients
 
     def emit(self, record):
-        msg_context = dict(error_msg=self.format(record),
-                           now=datetime.datetime.now(pytz.utc),
-                           )
-        msg_context.update(base_context())
-        template = fps_template_env.get_template('error_report.j2')
-        msg = template.render(msg_context)
+        msg = get_report_renderer().render(
+            'error_report.j2',
+            error_msg=self.format(record),
+            now=datetime.datetime.now(pytz.utc))
         fps.comms.email.send_email(self.recipients,
-                                   notification_email_prefix + "Error detected",
+                                   error_report_subject,
                                    body_text=msg)
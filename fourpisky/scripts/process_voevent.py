@@ -2,7 +2,6 @@ import click
 import datetime, pytz
 import logging
 import os
-import subprocess
 import voeventparse
 
 
@@ -11,8 +10,11 @@ from fourpisky.local import amicomms_safe as amicomms
 import fourpisky.log_config
 from fourpisky.reports import (generate_report_text, send_report,
                                generate_testresponse_text)
+from fourpisky.planner import ObservingPlan
 from fourpisky.sites import AmiLA, Pt5m
-from fourpisky.triggers import (is_test_trigger, swift, asassn, gaia)
+from fourpisky.triggers import (swift, asassn, gaia, alert_classes,
+                                 test_trigger_ivorn_prefix)
+from fourpisky.triggers.registry import TriggerRegistry
 import fourpisky as fps
 
 logger = logging.getLogger(__name__)
@@ -41,16 +43,9 @@ def cli():
 
 
 def voevent_logic(v):
-    # SWIFT BAT GRB alert:
     try:
-        if swift.BatGrb.packet_type_matches(v):
-            swift_bat_grb_logic(v)
-        if asassn.AsassnAlert.packet_type_matches(v):
-            asassn_alert_logic(v)
-        if gaia.GaiaAlert.packet_type_matches(v):
-            gaia_alert_logic(v)
-        if is_test_trigger(v):
-            test_logic(v)
+        for handler in trigger_handlers.matches(v):
+            handler(v)
     except:
         logger.exception("Error processing voevent {}".format(v.attrib['ivorn']))
 
@@ -62,18 +57,27 @@ def swift_bat_grb_logic(v):
     alert = swift.BatGrb(v)
     alert_rejection = alert.reject()
     if alert_rejection is None:
-        ami_reject = fps.filters.ami.reject(alert.position)
+        plan = ObservingPlan(alert.position, active_sites,
+                             lookahead=fps.filters.ami.max_wait)
+        earliest = plan.earliest
+        if earliest is not None:
+            logger.info("Earliest observable from {} at {}".format(
+                earliest.site.name, earliest.start))
+        ami_reject = fps.filters.ami.reject(alert.position, plan=plan)
         if ami_reject is None:
             try:
                 trigger_ami_swift_grb_alert(alert)
-                actions_taken.append('Observation requested from AMI.')
+                # Outbound comms may be handed off to delivery tasks (see
+                # fourpisky.taskqueue.tasks), so we can only claim they
+                # were queued - failures are reported by the delivery task.
+                actions_taken.append('Observation request queued for AMI.')
                 try:
                     send_initial_ami_alert_vo_notification(alert)
                     actions_taken.append(
-                        'AMI request notified to VOEvent network.')
-                except subprocess.CalledProcessError as e:
+                        'AMI request notification queued for VOEvent network.')
+                except Exception:
                     emsg = '***Notification to VOEvent network failed.***'
-                    logger.warn(emsg)
+                    logger.warning(emsg, exc_info=True)
                     actions_taken.append(emsg)
             except Exception as e:
                 emsg = 'Observation request failed.'
@@ -158,3 +162,23 @@ def test_logic(v):
     report = generate_testresponse_text(now)
     send_report(subject='Test packet received', text=report,
                 contacts=contacts.test_contacts)
+
+
+# =============================================================================
+# Dispatch table, see `voevent_logic`
+
+#: Handler for each of `fourpisky.triggers.alert_classes`
+alert_handlers = {
+    swift.BatGrb: swift_bat_grb_logic,
+    asassn.AsassnAlert: asassn_alert_logic,
+    gaia.GaiaAlert: gaia_alert_logic,
+}
+
+# Built from `alert_classes`, so the dispatch table can't fall out of step
+# with `fourpisky.triggers.alert_types` (a KeyError here means an
+# alert-type has been added without a handler):
+trigger_handlers = TriggerRegistry()
+for _alert_class in alert_classes:
+    trigger_handlers.register_alert_type(_alert_class,
+                                         alert_handlers[_alert_class])
+trigger_handlers.register(test_trigger_ivorn_prefix, test_logic)
@@ -0,0 +1,66 @@
+"""
+Replay archived VOEvents through the trigger handlers, with outbound comms
+stubbed out, and report processing latency / throughput.
+"""
+import click
+import logging
+
+import fourpisky as fps
+from fourpisky.replay import (Replayer, iter_archive_packets,
+                              iter_voeventdb_packets)
+
+logger = logging.getLogger(__name__)
+
+
+def use_dummy_comms():
+    fps.comms.email.send_email = fps.comms.email.dummy_email_send_function
+    fps.comms.comet.send_voevent = fps.comms.comet.dummy_send_to_comet_stub
+
+
+def voeventdb_session(dbname):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    import voeventdb.server.database.config as dbconfig
+    dburl = dbconfig.make_db_url(dbconfig.default_admin_db_params, dbname)
+    return Session(bind=create_engine(dburl))
+
+
+@click.command()
+@click.option('--archive-dir', type=click.Path(exists=True, file_okay=False),
+              help="Replay from an archive of packet files.")
+@click.option('--voeventdb', 'dbname',
+              help="Replay from the named voeventdb database.")
+@click.option('--speedup', type=float, default=1.,
+              help="Replay at this multiple of real-time (default 1).")
+@click.option('--asap', is_flag=True,
+              help="Replay as fast as possible, ignoring author-times.")
+@click.option('--limit', type=int, default=None,
+              help="Stop after this many packets.")
+def cli(archive_dir, dbname, speedup, asap, limit):
+    """
+    Replay archived VOEvents, in author-time order, through the trigger
+    logic.
+    """
+    logging.basicConfig(level=logging.INFO)
+    if (archive_dir is None) == (dbname is None):
+        raise click.UsageError(
+            "Specify exactly one of --archive-dir or --voeventdb.")
+    use_dummy_comms()
+    # Import after stubbing comms, in case anything binds them at import:
+    from fourpisky.scripts.process_voevent import trigger_handlers
+
+    if archive_dir is not None:
+        packets = iter_archive_packets(archive_dir)
+    else:
+        packets = iter_voeventdb_packets(voeventdb_session(dbname))
+    if limit is not None:
+        packets = (p for _, p in zip(range(limit), packets))
+
+    replayer = Replayer(trigger_handlers, speedup=None if asap else speedup)
+    stats = replayer.run(packets)
+    click.echo(stats.summary())
+    click.echo("{} packets processed ({} failed) in {:.1f}s, "
+               "{:.1f} packets/s".format(
+                   replayer.n_processed, replayer.n_failed,
+                   replayer.elapsed, replayer.throughput))
+    return 0
@@ -1,89 +1,229 @@
 import click
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import logging.handlers
 import os
 import sqlalchemy
 import sqlalchemy.exc
 import subprocess
-import time
 from voeventdb.server.database import session_registry
 from voeventdb.server.database.models import Voevent
 import voeventdb.server.database.config as dbconfig
-from fourpisky.comms import comet
+from fourpisky.comms import bulk, comet
 from fourpisky.feeds import (AsassnFeed, GaiaFeed, create_swift_feeds)
+from fourpisky.feeds.feedstate import get_feed_state_store
 from fourpisky.log_config import setup_logging
 
 logger = logging.getLogger('scraper')
 
 
-def process_feed_content(feed, process_function, voevent_pause_secs):
+def generate_feed_voevents(feed):
+    """
+    Generate VOEvents for any new entries in a feed.
+
+    Returns:
+        tuple: (new_ids, list of ``(feed_id, voevent)`` pairs), in stream-id
+        order.
+    """
     new_ids = feed.determine_new_entries()
-    for feed_id in sorted(new_ids,
-                          key=lambda id: feed.feed_id_to_stream_id(id)):
-        try:
-            v = feed.generate_voevent(feed_id)
-            process_function(v)
+    new_ids = sorted(new_ids, key=lambda id: feed.feed_id_to_stream_id(id))
+    try:
+        voevents = feed.generate_voevents(new_ids)
+        generated = list(zip(new_ids, voevents))
+    except Exception:
+        # Fall back to generating them one at a time, so that a single bad
+        # entry doesn't block the rest:
+        logger.warning(
+            "Batch VOEvent generation failed for feed {}, "
+            "retrying one at a time".format(feed.name), exc_info=True)
+        generated = []
+        for feed_id in new_ids:
+            try:
+                generated.append((feed_id, feed.generate_voevent(feed_id)))
+            except KeyboardInterrupt:
+                raise
+            except:
+                logger.exception(
+                    "Error processing id {} in feed {}".format(feed_id,
+                                                               feed.url))
+    return new_ids, generated
+
+
+def record_feed_results(feed, new_ids, generated, results):
+    """
+    Log the outcome of processing a feed's VOEvents, and update its state.
+    """
+    for (feed_id, v), result in zip(generated, results):
+        if result.error is None:
+            feed.record_known_ivorns(v.attrib['ivorn'])
             logger.info(
                 "Processed new Voevent: {}".format(v.attrib['ivorn']))
-            # Momentary pause to avoid spamming the VOEvent network
-            time.sleep(voevent_pause_secs)
-        except KeyboardInterrupt:
-            raise
-        except subprocess.CalledProcessError:
+        elif isinstance(result.error, subprocess.CalledProcessError):
             logger.warning(
                 "VOEvent insertion failed for {}".format(feed_id))
-        except:
-            logger.exception(
-                "Error processing id {} in feed".format(feed_id,
-                                                        feed.url))
+        else:
+            logger.error(
+                "Error processing id {} in feed {}".format(feed_id, feed.url),
+                exc_info=result.error)
     feed.save_new_hash()
-    if not new_ids:
+    if new_ids:
+        feed.save_new_entry_time()
+    else:
         logger.debug("Feed {} changed but found no new VOEvents".format(
             feed.name
         ))
 
 
+def _voevent_ivorn(voevent):
+    return voevent.attrib['ivorn']
+
+
+def process_feeds(feeds, process_function, voevent_pause_secs,
+                  max_in_flight=1):
+    """
+    Generate VOEvents for any new entries in `feeds`, and process them.
+
+    Up to `max_in_flight` VOEvents are processed concurrently - including
+    those from the same stream, since packets with distinct IVORNs need no
+    particular ordering. (Only repeats of an IVORN are sent one after
+    another, in order.) If `voevent_pause_secs` is set, it limits the mean
+    interval between sends (to avoid spamming the VOEvent network); by
+    default, throughput is limited only by the broker.
+    """
+    batches = []
+    for feed in feeds:
+        try:
+            new_ids, generated = generate_feed_voevents(feed)
+        except Exception:
+            logger.exception("Error processing feed '{}'".format(feed.name))
+            continue
+        batches.append((feed, new_ids, generated))
+
+    rate_limit = None
+    if voevent_pause_secs:
+        rate_limit = 1. / voevent_pause_secs
+    voevents = [v for _, _, generated in batches for _, v in generated]
+    results = bulk.send_pipelined(voevents, process_function,
+                                  max_in_flight=max_in_flight,
+                                  rate_limit=rate_limit,
+                                  key=_voevent_ivorn)
+    offset = 0
+    for feed, new_ids, generated in batches:
+        feed_results = results[offset:offset + len(generated)]
+        offset += len(generated)
+        try:
+            record_feed_results(feed, new_ids, generated, feed_results)
+        except Exception:
+            logger.exception("Error processing feed '{}'".format(feed.name))
+
+
+def process_feed_content(feed, process_function, voevent_pause_secs,
+                         max_in_flight=1):
+    """
+    Generate VOEvents for any new entries in a feed, and process them.
+
+    (See :func:`process_feeds`.)
+    """
+    process_feeds([feed], process_function, voevent_pause_secs,
+                  max_in_flight)
+
+
+def check_feed_for_changes(feed, old_hash):
+    """
+    Fetch a feed's hash-check data, and its full content if changed.
+
+    This is the network-bound part of scraping a feed, and touches no shared
+    state, so is safe to run concurrently across feeds.
+
+    Returns:
+        bool: True if the feed has changed and needs processing.
+    """
+    if (old_hash is not None) and (feed.new_hash == old_hash):
+        return False
+    # Prefetch content (and cache it on the feed) ready for processing:
+    feed.content
+    return True
+
+
 def main(hashdb_path, logfile, voevent_pause_secs,
-         process_function=comet.send_voevent):
+         process_function=comet.send_voevent,
+         fetch_concurrency=1, max_in_flight=1):
     """
     Checks feeds against their 'last-seen' hash, processes if changed.
 
     Identifies any 'new' events (not found in local db), generates VOEvents
     and sends them to the local broker.
 
+    Feeds are fetched and hash-checked concurrently (up to
+    `fetch_concurrency` at once). VOEvents are then generated for each
+    changed feed in turn, and sent concurrently.
+
     Args:
-        hashdb_path: path to use for the 'last-seen' hash-database
+        hashdb_path: path to use for the 'last-seen' feed-state database
         logfile: path to use for logfile.
+        fetch_concurrency: Max number of feeds to fetch in parallel.
+        max_in_flight: Max number of VOEvents to process concurrently.
 
     Returns:
 
     """
     setup_logging(logfile)
+    # Open the feed-state database once, shared by all feeds for this run:
+    state_store = get_feed_state_store(hashdb_path)
     # feed_list = []
     feed_list = [
-        AsassnFeed(hashdb_path),
-        # GaiaFeed(hashdb_path),
+        AsassnFeed(state_store, incremental=True),
+        # GaiaFeed(state_store),
     ]
-    # feed_list.extend(create_swift_feeds(hashdb_path, look_back_ndays=7))
+    # feed_list.extend(create_swift_feeds(state_store, look_back_ndays=7))
+    scrape_feeds(feed_list, process_function, voevent_pause_secs,
+                 fetch_concurrency=fetch_concurrency,
+                 max_in_flight=max_in_flight)
+
+
+def scrape_feeds(feed_list, process_function, voevent_pause_secs,
+                 fetch_concurrency=1, max_in_flight=1):
+    """
+    Fetch and hash-check `feed_list` concurrently, then process any changed
+    feeds (see :func:`process_feeds`).
 
+    An error fetching or processing one feed is logged, and does not stop
+    the others.
+    """
+    # Hash-cache reads (old hashes and cache-validators) stay in this
+    # thread, only the fetches are parallel:
     for feed in feed_list:
-        if ((feed.old_hash is None) or (feed.new_hash != feed.old_hash)):
-            try:
-                process_feed_content(feed, process_function, voevent_pause_secs)
-            except Exception as e:
-                logger.exception("Error processing feed '{}'".format(feed.name))
+        feed.load_old_state()
+    old_hashes = [feed.old_hash for feed in feed_list]
+    with ThreadPoolExecutor(max_workers=max(1, fetch_concurrency)) as pool:
+        fetches = [pool.submit(check_feed_for_changes, feed, old_hash)
+                   for feed, old_hash in zip(feed_list, old_hashes)]
+
+    changed_feeds = []
+    for feed, fetch in zip(feed_list, fetches):
+        try:
+            feed_changed = fetch.result()
+        except Exception as e:
+            logger.exception("Error fetching feed '{}'".format(feed.name))
+            continue
+        if feed_changed:
+            changed_feeds.append(feed)
         else:
+            feed.save_fetch_time()
             logger.debug(
-                "Hash in {} matches for feed: '{}'; moving on.".format(
-                    hashdb_path,
-                    feed.name,
-                ))
-
+                "Hash matches for feed: '{}'; moving on.".format(feed.name))
+    process_feeds(changed_feeds, process_function, voevent_pause_secs,
+                  max_in_flight)
 
 default_dbname = os.environ.get('VOEVENTDB_DBNAME',
                                 dbconfig.testdb_corpus_url.database)
+# No rate-limit by default, just the max-in-flight:
 default_sleeptime = os.environ.get('FPS_FEED_SLEEPTIME',
-                                   '0.5')
+                                   '0')
+default_concurrency = os.environ.get('FPS_FEED_CONCURRENCY',
+                                     '4')
+default_max_in_flight = os.environ.get('FPS_FEED_MAX_IN_FLIGHT',
+                                       '4')
 
 
 def direct_store_voevent(voevent):
@@ -106,15 +246,25 @@ def direct_store_voevent(voevent):
               help='Store the VOEvents directly in the local database'
                    '(Default is to send/insert via the local broker.)')
 @click.option('--hashdb_path', type=click.Path(),
-              default='/tmp/fps_feeds_hashdb')
+              default='/tmp/fps_feeds_state.sqlite')
 @click.option('--logfile', type=click.Path(),
               default='scrape_feeds')
 @click.option('--sleeptime', type=click.FLOAT,
               default=default_sleeptime,
-              help="Delay between VOEvent Comet-sends, default='{}'".format(
+              help="Min. mean delay between VOEvent Comet-sends (0 for no "
+                   "rate-limit), default='{}'".format(
                   default_sleeptime
               ))
-def cli(dbname, direct_store, hashdb_path, logfile, sleeptime):
+@click.option('--concurrency', type=click.INT,
+              default=default_concurrency,
+              help="Max number of feeds to fetch in parallel, "
+                   "default='{}'".format(default_concurrency))
+@click.option('--max-in-flight', type=click.INT,
+              default=default_max_in_flight,
+              help="Max number of VOEvent Comet-sends in progress at once, "
+                   "default='{}'".format(default_max_in_flight))
+def cli(dbname, direct_store, hashdb_path, logfile, sleeptime, concurrency,
+        max_in_flight):
     """
      Trivial wrapper about main to create a command line interface entry-point.
 
@@ -127,6 +277,9 @@ def cli(dbname, direct_store, hashdb_path, logfile, sleeptime):
     )
     if direct_store:
         main(hashdb_path, logfile, voevent_pause_secs=0.0,
-             process_function=direct_store_voevent)
+             process_function=direct_store_voevent,
+             fetch_concurrency=concurrency)
     else:
-        main(hashdb_path, logfile, sleeptime)
+        main(hashdb_path, logfile, sleeptime,
+             fetch_concurrency=concurrency,
+             max_in_flight=max_in_flight)
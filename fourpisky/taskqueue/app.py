@@ -1,6 +1,7 @@
 import os
 import fourpisky.env_vars as fps_env_vars
 import fourpisky.log_config as log_config
+from fourpisky.taskqueue import default_config, routing
 from celery import Celery
 
 from celery.signals import after_setup_task_logger
@@ -21,6 +22,18 @@ if fps_env_vars.celery_config_module in os.environ:
 else:
     fps_app.config_from_object('fourpisky.taskqueue.default_config')
 
+routing.declare_queues(fps_app)
+
+
+def get_fps_setting(key):
+    """
+    Read one of our own (``FPS_*``) settings.
+
+    Falls back to the value in `default_config`, so a custom config module
+    needn't define them all.
+    """
+    return fps_app.conf.get(key, getattr(default_config, key))
+
 
 class NoTaskQueueFilter(logging.Filter):
     def filter(self, record):
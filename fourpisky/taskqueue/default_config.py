@@ -1,4 +1,3 @@
-
 CELERYD_CONCURRENCY = 2
 CELERYD_TASK_TIME_LIMIT = 120
 
@@ -10,4 +9,23 @@ CELERY_TASK_LOG_PATHSTEM = './fps_celery_tasks'
 
 CELERY_TASK_SERIALIZER = 'msgpack'
 CELERY_RESULT_SERIALIZER = 'msgpack'
-CELERY_ACCEPT_CONTENT = ['msgpack',]
\ No newline at end of file
+CELERY_ACCEPT_CONTENT = ['msgpack',]
+
+# Packets for voeventdb may be buffered per-worker-process, and inserted
+# in batches of up to this many, or after this delay. Off by default (each
+# packet is inserted immediately): buffered packets are already acked, so
+# are lost if a worker process is killed before they are flushed (at most
+# one batch each). Set e.g. 50 to opt in, for higher ingest throughput.
+FPS_INGEST_BATCH_SIZE = 1
+FPS_INGEST_BATCH_DELAY_MS = 250
+
+# Outbound notifications (emails, VOEvents) are sent by separate delivery
+# tasks, retried with exponential backoff:
+FPS_DELIVERY_MAX_RETRIES = 5
+FPS_DELIVERY_RETRY_BACKOFF_SECS = 2
+# Records completed deliveries, for idempotency and latency-tracking:
+FPS_DELIVERY_LOG_PATH = './fps_delivery_log.sqlite'
+
+# Queues and routes for the priority lanes are declared on the app itself,
+# see `fourpisky.taskqueue.routing`. Any CELERY_QUEUES / CELERY_ROUTES set
+# here are added to ours.
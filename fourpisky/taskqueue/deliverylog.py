@@ -0,0 +1,80 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryLog(object):
+    """
+    Records completed outbound deliveries (emails, VOEvents).
+
+    Each delivery job carries a unique ID, so a job which is re-run (e.g.
+    retried after the message actually went out) can check here and skip
+    the duplicate send. We also record when the job was enqueued and
+    delivered, so delivery latency can be tracked separately from the
+    trigger-processing time.
+
+    Backed by an SQLite database in WAL mode, so may be shared between
+    worker processes.
+    """
+
+    def __init__(self, path, timeout=30.):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout,
+                                     check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS delivery ("
+                "delivery_id TEXT PRIMARY KEY, "
+                "kind TEXT, "
+                "enqueued_at REAL, "
+                "delivered_at REAL)"
+            )
+
+    def is_delivered(self, delivery_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM delivery WHERE delivery_id = ?",
+                (delivery_id,)).fetchone()
+        return row is not None
+
+    def record_delivery(self, delivery_id, kind, enqueued_at,
+                        delivered_at=None):
+        """
+        Record a successful delivery.
+
+        Args:
+            enqueued_at (float): Unix timestamp at which the job was queued.
+            delivered_at (float): Unix timestamp of delivery, default now.
+        Returns:
+            float: The delivery latency in seconds.
+        """
+        if delivered_at is None:
+            delivered_at = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO delivery "
+                "(delivery_id, kind, enqueued_at, delivered_at) "
+                "VALUES (?, ?, ?, ?)",
+                (delivery_id, kind, enqueued_at, delivered_at))
+        return delivered_at - enqueued_at
+
+    def latencies(self, kind=None):
+        """
+        Returns a list of recorded delivery latencies (seconds).
+        """
+        query = "SELECT delivered_at - enqueued_at FROM delivery"
+        params = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
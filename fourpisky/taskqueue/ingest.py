@@ -0,0 +1,146 @@
+"""
+Batched insertion of VOEvents into voeventdb.
+"""
+from __future__ import absolute_import
+
+import logging
+import threading
+
+import voeventdb.server.database.convenience as dbconv
+from voeventdb.server.database.models import Cite, Coord, Voevent
+
+from fourpisky.database import ivorns_present
+
+logger = logging.getLogger(__name__)
+
+
+class Batcher(object):
+    """
+    Accumulates items, passing them on to `flush_function` in batches.
+
+    A batch is flushed once it reaches `max_items`, or `max_delay` seconds
+    after its first item arrived, whichever is sooner. (Delayed flushes
+    run in a timer thread.) Thread-safe.
+    """
+
+    def __init__(self, flush_function, max_items, max_delay):
+        self.flush_function = flush_function
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._items = []
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) >= self.max_items:
+                batch = self._take_batch()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(self.max_delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self.flush_function(batch)
+
+    def flush(self):
+        """
+        Flush any pending items now.
+        """
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self.flush_function(batch)
+
+    def _take_batch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._items = self._items, []
+        return batch
+
+
+def _column_values(obj, exclude=('id',)):
+    return {col.key: getattr(obj, col.key)
+            for col in obj.__table__.columns if col.key not in exclude}
+
+
+def bulk_insert_voevent_rows(session, rows):
+    """
+    Insert new (unsaved) ``Voevent`` rows, with their cites and coords.
+
+    Uses a single multi-row ``INSERT`` for the voevents, and an executemany
+    for each child table, rather than the ORM's row-at-a-time unit of work.
+    Does not commit.
+    """
+    voevent_table = Voevent.__table__
+    result = session.execute(
+        voevent_table.insert()
+        .values([_column_values(row) for row in rows])
+        .returning(voevent_table.c.id, voevent_table.c.ivorn))
+    voevent_ids = {ivorn: voevent_id for voevent_id, ivorn in result}
+    for relation, child_class in (('cites', Cite), ('coords', Coord)):
+        child_values = []
+        for row in rows:
+            for child in getattr(row, relation):
+                values = _column_values(child, exclude=('id', 'voevent_id'))
+                values['voevent_id'] = voevent_ids[row.ivorn]
+                child_values.append(values)
+        if child_values:
+            session.execute(child_class.__table__.insert(), child_values)
+
+
+def insert_voevent_batch(session, voevents):
+    """
+    Insert many VOEvents, committing new packets in a single transaction.
+
+    Packets whose IVORN is already present (in the database or earlier in
+    the batch) are handled one-by-one by ``safe_insert_voevent``, which
+    checks that the XML matches. If the batch-transaction fails, we fall
+    back to inserting each packet in its own transaction, so one bad packet
+    doesn't cost us the rest.
+
+    Returns:
+        list: For each packet, None on success or the exception raised.
+    """
+    errors = [None] * len(voevents)
+    rows = {}
+    for idx, v in enumerate(voevents):
+        try:
+            rows[idx] = Voevent.from_etree(v)
+        except Exception as e:
+            errors[idx] = e
+
+    present = ivorns_present(session, [row.ivorn for row in rows.values()])
+    new, seen, one_by_one = [], set(), []
+    for idx, row in sorted(rows.items()):
+        if row.ivorn in present or row.ivorn in seen:
+            one_by_one.append(idx)
+        else:
+            seen.add(row.ivorn)
+            new.append(idx)
+
+    if new:
+        try:
+            bulk_insert_voevent_rows(session, [rows[idx] for idx in new])
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.warning("Batch insert of {} packets failed, "
+                           "falling back to row-by-row".format(len(new)),
+                           exc_info=True)
+            one_by_one = sorted(new + one_by_one)
+
+    for idx in one_by_one:
+        try:
+            dbconv.safe_insert_voevent(session, voevents[idx])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            errors[idx] = e
+    return errors
@@ -0,0 +1,112 @@
+"""
+Assignment of tasks to Celery queues ('lanes').
+
+Packets which some trigger will act upon go to a high-priority queue, so
+they are not held up behind routine packets or bulk database-ingest during
+a burst of activity. Run dedicated workers for the priority queue, e.g.::
+
+    celery -A fourpisky.taskqueue.tasks worker -Q fps_priority
+
+(A worker started without ``-Q`` consumes from all the queues.)
+"""
+from kombu import Queue
+from lxml import etree
+from fourpisky.triggers import alert_types, is_test_trigger
+from fourpisky.utils import sniff_voevent_header
+
+priority_queue = 'fps_priority'
+default_queue = 'celery'
+ingest_queue = 'fps_ingest'
+
+all_queues = (priority_queue, default_queue, ingest_queue)
+
+# (The queue for `receive_voevent_celerytask` and
+# `process_voevent_celerytask` is selected per-packet, see `route_packet`.)
+task_routes = {
+    'fourpisky.taskqueue.tasks.ingest_voevent_celerytask': {
+        'queue': ingest_queue},
+    'fourpisky.taskqueue.tasks.deliver_email_celerytask': {
+        'queue': priority_queue},
+    'fourpisky.taskqueue.tasks.deliver_voevent_celerytask': {
+        'queue': priority_queue},
+}
+
+
+def declare_queues(app):
+    """
+    Declare our queues and task-routes on a Celery `app`.
+
+    Applied on top of the loaded config, so that a custom config module
+    can't drop the lanes - queues and routes it defines are added to ours.
+    """
+    conf = app.conf
+    # (New-style setting names work whichever style the config uses.)
+    extra_queues = [q for q in (conf.task_queues or [])
+                    if q.name not in all_queues]
+    extra_routes = conf.task_routes or []
+    if not isinstance(extra_routes, (list, tuple)):
+        extra_routes = [extra_routes]
+    conf.update(
+        task_queues=[Queue(name, routing_key=name) for name in all_queues]
+                    + extra_queues,
+        task_default_queue=default_queue,
+        task_routes=[task_routes, route_packet] + list(extra_routes),
+    )
+
+
+def is_actionable(voevent):
+    """
+    Cheap check (IVORN-only) of whether any trigger will act on a packet.
+
+    Args:
+        voevent: Anything with an ``attrib['ivorn']``, e.g. a parsed
+            VOEvent or plain lxml element.
+    """
+    return bool(is_test_trigger(voevent) or alert_types.matches(voevent))
+
+
+def process_queue_for(voevent):
+    """
+    Select the queue for a packet's `process_voevent_celerytask`.
+    """
+    if is_actionable(voevent):
+        return priority_queue
+    return default_queue
+
+
+def receive_queue_for(voevent):
+    """
+    Select the queue for a packet's `receive_voevent_celerytask`.
+
+    Packets which only need ingesting go to the low-priority lane.
+    """
+    if is_actionable(voevent):
+        return priority_queue
+    return ingest_queue
+
+
+_packet_queue_selectors = {
+    'fourpisky.taskqueue.tasks.process_voevent_celerytask': process_queue_for,
+    'fourpisky.taskqueue.tasks.receive_voevent_celerytask': receive_queue_for,
+}
+
+
+def route_packet(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router for the per-packet tasks.
+
+    Classifies the packet (the task's bytestring argument) from its header
+    alone. Returns None - i.e. no opinion - for other tasks, or packets we
+    can't classify; an explicit ``queue`` passed to ``apply_async`` takes
+    precedence in any case.
+    """
+    queue_for = _packet_queue_selectors.get(name)
+    if queue_for is None or not args:
+        return None
+    try:
+        header = sniff_voevent_header(args[0])
+    except (etree.XMLSyntaxError, TypeError):
+        return None
+    if header is None or 'ivorn' not in header.attrib:
+        return None
+    return {'queue': queue_for(header)}
@@ -1,7 +1,14 @@
-from fourpisky.taskqueue.app import fps_app
+from fourpisky.taskqueue.app import fps_app, get_fps_setting
+from fourpisky.taskqueue.deliverylog import DeliveryLog
+from fourpisky.taskqueue.ingest import Batcher, insert_voevent_batch
+from fourpisky.taskqueue.routing import is_actionable
 import voeventparse
+from celery.signals import worker_process_init, worker_process_shutdown
 from celery.utils.log import get_task_logger
+import hashlib
 import os
+import time
+from fourpisky.reports import error_report_subject, get_report_renderer
 from fourpisky.scripts.process_voevent import voevent_logic
 import fourpisky.env_vars as fps_env_vars
 
@@ -21,6 +28,11 @@ if dummy_email_mode is not None:
     fps.comms.comet.send_voevent = fps.comms.comet.dummy_send_to_comet_stub
     logger.warning("Dummy stub-functions engaged!")
 
+# Keep hold of the functions which actually send things, for use by the
+# delivery tasks:
+deliver_email = fps.comms.email.send_email
+deliver_voevent = fps.comms.comet.send_voevent
+
 voeventdb_dbname = os.environ.get(fps_env_vars.voeventdb_dbname,
                                   dbconfig.testdb_corpus_url.database)
 
@@ -38,33 +50,233 @@ def process_voevent_celerytask(bytestring):
 
     i.e. the function defined in
     `fourpisky.scripts.process_voevent`.
+
+    Most packets match no trigger, so we first check the IVORN alone and
+    discard unclaimed packets without loading the full tree.
     """
+    try:
+        header = fps.utils.sniff_voevent_header(bytestring)
+    except Exception:
+        # Leave it to the full parse to raise a more informative error.
+        header = None
+    if header is not None and 'ivorn' in header.attrib:
+        if not is_actionable(header):
+            logger.debug("Discarding (no trigger matches): "
+                         + header.attrib['ivorn'])
+            return
     v = voeventparse.loads(bytestring)
     logger.debug("Load for processing: " + v.attrib['ivorn'])
     voevent_logic(v)
     logger.info("Processed:" + v.attrib['ivorn'])
 
 
-@fps_app.task()
+# Acked late, so that with batching disabled an ingest interrupted by a
+# worker crash is redelivered (re-inserting a packet is harmless).
+@fps_app.task(acks_late=True)
 def ingest_voevent_celerytask(bytestring):
     """
     Ingest the voevent into a local instance of voeventdb.
+
+    If batching is enabled (``FPS_INGEST_BATCH_SIZE > 1``; off by default),
+    packets are added to a worker-local buffer, and inserted in batches.
+
+    NB with batching, the task completes (and so is acked) once the packet
+    is buffered. The buffer is flushed on a timer and at worker shutdown,
+    but if a worker process dies outright, any packets buffered in it (up
+    to ``FPS_INGEST_BATCH_DELAY_MS`` worth, at most
+    ``FPS_INGEST_BATCH_SIZE``) are lost from voeventdb - trigger
+    processing is unaffected.
     """
     v = voeventparse.loads(bytestring)
     logger.debug("Load for ingest: " + v.attrib['ivorn'])
+    ingest_voevent(v)
+
+
+@fps_app.task()
+def receive_voevent_celerytask(bytestring):
+    """
+    Process and ingest the voevent, parsing it only once.
+
+    Combines `process_voevent_celerytask` and `ingest_voevent_celerytask`;
+    trigger-logic runs first, since that's the latency-critical part.
+    """
+    v = voeventparse.loads(bytestring)
+    logger.debug("Received: " + v.attrib['ivorn'])
+    if is_actionable(v):
+        voevent_logic(v)
+        logger.info("Processed:" + v.attrib['ivorn'])
+    ingest_voevent(v)
+
+
+def ingest_voevent(v):
+    if get_fps_setting('FPS_INGEST_BATCH_SIZE') > 1:
+        get_ingest_batcher().add(v)
+    else:
+        ingest_voevent_batch([v])
+
+
+def ingest_voevent_batch(voevents):
     session = Session(bind=dbengine)
     try:
-        dbconv.safe_insert_voevent(session, v)
-        session.commit()
-    except:
-        if (v.attrib['role'] == voeventparse.definitions.roles.test and
+        errors = insert_voevent_batch(session, voevents)
+    finally:
+        session.close()
+    for v, error in zip(voevents, errors):
+        if error is None:
+            logger.info("Ingested:" + v.attrib['ivorn'])
+        elif (v.attrib['role'] == voeventparse.definitions.roles.test and
                 v.attrib['ivorn'].startswith('ivo://nasa.gsfc.gcn/INTEGRAL')):
             logger.warning(
                 "Ignoring mismatched duplicate-ivorn test events from "
                 "NASA-INTEGRAL stream")
         else:
-            logger.exception(
+            logger.error(
                 "Could not insert packet with ivorn {} into {}".format(
-                    v.attrib['ivorn'], voeventdb_dbname))
+                    v.attrib['ivorn'], voeventdb_dbname), exc_info=error)
+
+
+_ingest_batcher = None
+
+
+def get_ingest_batcher():
+    global _ingest_batcher
+    if _ingest_batcher is None:
+        _ingest_batcher = Batcher(
+            ingest_voevent_batch,
+            max_items=get_fps_setting('FPS_INGEST_BATCH_SIZE'),
+            max_delay=get_fps_setting('FPS_INGEST_BATCH_DELAY_MS') / 1000.)
+    return _ingest_batcher
+
+
+@worker_process_init.connect
+def preload_report_templates(**kwargs):
+    get_report_renderer()
+
+
+@worker_process_shutdown.connect
+def flush_ingest_batcher(**kwargs):
+    if _ingest_batcher is not None:
+        _ingest_batcher.flush()
+
+
+_delivery_log = None
+
+
+def get_delivery_log():
+    global _delivery_log
+    if _delivery_log is None:
+        _delivery_log = DeliveryLog(get_fps_setting('FPS_DELIVERY_LOG_PATH'))
+    return _delivery_log
+
+
+def _delivery_id(kind, *parts):
+    """
+    Derive a delivery-job ID from the content being delivered.
+
+    A job that is redelivered (or re-queued) then gets the same ID, so is
+    recognised as a duplicate by the :class:`.DeliveryLog`.
+    """
+    digest = hashlib.sha1(kind.encode('utf-8'))
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode('utf-8')
+        digest.update(b'\0' + part)
+    return digest.hexdigest()
+
+
+def _attempt_delivery(task, delivery_id, kind, enqueued_at,
+                      send_function, *args, **kwargs):
+    """
+    Run a delivery job, retrying with exponential backoff on failure.
+
+    Jobs already recorded as delivered are skipped, so retries are
+    idempotent. Failed attempts are logged as warnings; if we give up,
+    we log an error (and so send an error report) unless
+    ``report_failure=False`` - the error-report emails are themselves sent
+    by delivery jobs, so we must not trigger another one each time one of
+    those fails.
+    """
+    report_failure = kwargs.pop('report_failure', True)
+    delivery_log = get_delivery_log()
+    if delivery_log.is_delivered(delivery_id):
+        logger.info("Skipping {} {}, already delivered".format(
+            kind, delivery_id))
+        return
+    try:
+        send_function(*args)
+    except fps.comms.comet.VOEventSendError:
+        # Broker refused the packet; retrying won't help.
+        logger.warning("Delivery of {} {} refused".format(kind, delivery_id),
+                       exc_info=True)
+        return
+    except Exception as e:
+        if task.request.retries < task.max_retries:
+            countdown = (get_fps_setting('FPS_DELIVERY_RETRY_BACKOFF_SECS')
+                         * 2 ** task.request.retries)
+            logger.warning(
+                "Delivery of {} {} failed, retrying in {}s: {}".format(
+                    kind, delivery_id, countdown, e))
+            raise task.retry(exc=e, countdown=countdown)
+        log = logger.error if report_failure else logger.warning
+        log("Giving up on delivery of {} {} after {} attempts".format(
+            kind, delivery_id, task.request.retries + 1), exc_info=True)
+        return
+    latency = delivery_log.record_delivery(delivery_id, kind, enqueued_at)
+    logger.info("Delivered {} {}, latency {:.2f}s".format(
+        kind, delivery_id, latency))
+
+
+# Delivery tasks are acked only once complete, so one interrupted by a
+# worker crash is redelivered - and the delivery-log check above stops a
+# completed one being sent twice.
+@fps_app.task(bind=True, acks_late=True,
+              max_retries=get_fps_setting('FPS_DELIVERY_MAX_RETRIES'))
+def deliver_email_celerytask(self, delivery_id, enqueued_at,
+                             recipient_addresses, subject, body_text):
+    """
+    Send an email queued by :func:`enqueue_email`.
+    """
+    _attempt_delivery(self, delivery_id, 'email', enqueued_at,
+                      deliver_email, recipient_addresses, subject, body_text,
+                      report_failure=(subject != error_report_subject))
+
+
+@fps_app.task(bind=True, acks_late=True,
+              max_retries=get_fps_setting('FPS_DELIVERY_MAX_RETRIES'))
+def deliver_voevent_celerytask(self, delivery_id, enqueued_at,
+                               bytestring, host, port):
+    """
+    Send a VOEvent queued by :func:`enqueue_voevent`.
+    """
+    v = voeventparse.loads(bytestring)
+    _attempt_delivery(self, delivery_id, 'voevent', enqueued_at,
+                      deliver_voevent, v, host, port)
+
+
+def enqueue_email(recipient_addresses, subject, body_text):
+    """
+    Drop-in replacement for `send_email` which queues a delivery task.
+    """
+    recipient_addresses = fps.utils.listify(recipient_addresses)
+    delivery_id = _delivery_id('email', subject, body_text,
+                               *sorted(recipient_addresses))
+    deliver_email_celerytask.delay(
+        delivery_id, time.time(), recipient_addresses, subject, body_text)
+
+
+def enqueue_voevent(voevent, host='localhost', port=8098):
+    """
+    Drop-in replacement for `send_voevent` which queues a delivery task.
+    """
+    delivery_id = _delivery_id('voevent', voevent.attrib['ivorn'],
+                               host, port)
+    deliver_voevent_celerytask.delay(
+        delivery_id, time.time(), voeventparse.dumps(voevent), host, port)
+
 
-    logger.info("Ingested:" + v.attrib['ivorn'])
+# Unless configured otherwise, send all notifications via delivery tasks,
+# so that `voevent_logic` doesn't wait on slow mail-servers etc:
+if os.environ.get(fps_env_vars.sync_delivery, None) is None:
+    fps.comms.email.send_email = enqueue_email
+    fps.comms.comet.send_voevent = enqueue_voevent
+    logger.info("Outbound notifications will be queued for delivery")
@@ -1,6 +1,7 @@
 import tempfile
 import pytest
 import os
+from fourpisky.feeds.feedstate import close_feed_state_stores
 from voeventdb.server.tests.fixtures.connection import (
     empty_db_connection,
     fixture_db_session,
@@ -14,5 +15,9 @@ def uncreated_temporary_file_path():
     tf.close()
     os.unlink(tf.name)
     yield tf.name
-    if os.path.exists(tf.name):
-        os.unlink(tf.name)
+    # Release any feed-state stores opened on this path, and clean up their
+    # SQLite journal files (and any IVORN index) too:
+    close_feed_state_stores()
+    for suffix in ('', '-wal', '-shm', '.ivorns'):
+        if os.path.exists(tf.name + suffix):
+            os.unlink(tf.name + suffix)
@@ -18,4 +18,13 @@ asassn_alert_AT2016D =  os.path.join(data_dir, '2016-01-2.12_AT_2016D.xml')
 
 gaia_feed_csv_2016_04_04 = os.path.join(data_dir, 'gaia_alerts.csv')
 
-gaia_alert_16ajo = os.path.join(data_dir, 'Gaia16ajo.xml')
\ No newline at end of file
+gaia_alert_16ajo = os.path.join(data_dir, 'Gaia16ajo.xml')
+
+# Packets generated from the first rows of the ASASSN 2018-09-23 page and the
+# Gaia CSV, by the original one-at-a-time conversion code:
+feed_voevents_dir = os.path.join(data_dir, 'feed_voevents')
+
+
+def feed_voevent(feed_name, idx):
+    return os.path.join(feed_voevents_dir,
+                        '{}_{:02d}.xml'.format(feed_name, idx))
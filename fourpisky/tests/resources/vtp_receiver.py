@@ -0,0 +1,85 @@
+"""
+A minimal stand-in for a VOEvent broker's receiver, for unit-testing.
+
+Accepts length-prefixed VOEvent packets and replies with a Transport 'ack'
+(or 'nak', for IVORNs listed in `nak_ivorns`; no reply at all for those in
+`silent_ivorns`; a non-XML reply for those in `garbled_ivorns`).
+"""
+import socketserver
+import struct
+import threading
+
+from lxml import etree
+
+transport_template = (
+    b"<?xml version='1.0' encoding='UTF-8'?>\n"
+    b'<trn:Transport xmlns:trn="http://www.telescope-networks.org/xml/'
+    b'Transport/v1.1" version="1.0" role="%s">'
+    b'<Origin>%s</Origin><Response>ivo://fps.test/receiver</Response>'
+    b'%s</trn:Transport>'
+)
+
+
+class VtpReceiverHandler(socketserver.BaseRequestHandler):
+    def recv_exactly(self, nbytes):
+        data = b''
+        while len(data) < nbytes:
+            chunk = self.request.recv(nbytes - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        server = self.server
+        while True:
+            prefix = self.recv_exactly(4)
+            if prefix is None:
+                return
+            payload = self.recv_exactly(struct.unpack('!I', prefix)[0])
+            ivorn = etree.fromstring(payload).attrib['ivorn']
+            server.received.append(ivorn)
+            if ivorn in server.silent_ivorns:
+                # Never reply; wait for the sender to hang up.
+                self.recv_exactly(1)
+                return
+            if ivorn in server.garbled_ivorns:
+                response = b'not a Transport message <<'
+            elif ivorn in server.nak_ivorns:
+                response = transport_template % (
+                    b'nak', ivorn.encode(),
+                    b'<Meta><Result>Rejected</Result></Meta>')
+            else:
+                response = transport_template % (b'ack', ivorn.encode(), b'')
+            self.request.sendall(struct.pack('!I', len(response)) + response)
+            if server.one_shot:
+                # Like Comet, close the connection after each event.
+                return
+
+
+class VtpReceiver(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, one_shot=False):
+        socketserver.ThreadingTCPServer.__init__(
+            self, ('127.0.0.1', 0), VtpReceiverHandler)
+        self.one_shot = one_shot
+        self.received = []
+        self.nak_ivorns = set()
+        self.silent_ivorns = set()
+        self.garbled_ivorns = set()
+        self.n_connections = 0
+
+    def verify_request(self, request, client_address):
+        self.n_connections += 1
+        return True
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
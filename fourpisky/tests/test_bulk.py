@@ -0,0 +1,92 @@
+import threading
+import time
+
+from fourpisky.comms.bulk import TokenBucket, send_pipelined
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2., burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == 0.
+    for _ in range(4):
+        bucket.acquire()
+    # After the initial burst, we should be limited to 2 per second:
+    assert abs(clock.now - 2.) < 1e-9
+
+
+def test_unlimited_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=None, clock=clock, sleep=clock.sleep)
+    for _ in range(100):
+        bucket.acquire()
+    assert not clock.sleeps
+
+
+def test_send_pipelined():
+    lock = threading.Lock()
+    in_flight = [0]
+    max_seen = [0]
+
+    def send(item):
+        with lock:
+            in_flight[0] += 1
+            max_seen[0] = max(max_seen[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        if item == 3:
+            raise ValueError("Bad item")
+        return item * 10
+
+    items = list(range(20))
+    results = send_pipelined(items, send, max_in_flight=4)
+    assert [r.item for r in results] == items
+    assert results[3].response is None
+    assert isinstance(results[3].error, ValueError)
+    assert [r.response for r in results if r.error is None] == [
+        i * 10 for i in items if i != 3]
+    assert 1 < max_seen[0] <= 4
+
+
+def test_send_pipelined_keeps_order_per_key():
+    lock = threading.Lock()
+    sent = []
+    in_flight = {}
+    max_seen = [0]
+
+    def send(item):
+        stream, seq = item
+        with lock:
+            assert not in_flight.get(stream)
+            in_flight[stream] = True
+            max_seen[0] = max(max_seen[0], sum(in_flight.values()))
+        # Later items are quicker, so would overtake if sent concurrently:
+        time.sleep(0.002 * (10 - seq))
+        with lock:
+            in_flight[stream] = False
+            sent.append(item)
+        return item
+
+    items = [(stream, seq) for seq in range(10) for stream in 'abc']
+    results = send_pipelined(items, send, max_in_flight=4,
+                             key=lambda item: item[0])
+    assert [r.item for r in results] == items
+    for stream in 'abc':
+        assert [i for i in sent if i[0] == stream] == [
+            (stream, seq) for seq in range(10)]
+    assert max_seen[0] > 1
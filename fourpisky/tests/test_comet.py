@@ -0,0 +1,103 @@
+import subprocess
+
+import pytest
+
+import fourpisky.voevent
+from fourpisky.comms import comet
+from fourpisky.comms.comet import VtpSender, VOEventSendError
+from fourpisky.tests.resources.vtp_receiver import VtpReceiver
+
+
+@pytest.fixture(params=[False, True], ids=['persistent', 'one_shot'])
+def vtp_receiver(request):
+    receiver = VtpReceiver(one_shot=request.param).start()
+    yield receiver
+    receiver.stop()
+
+
+def test_send_acked(vtp_receiver):
+    sender = VtpSender('127.0.0.1', vtp_receiver.server_address[1])
+    packets = [fourpisky.voevent.create_4pisky_test_trigger_voevent()
+               for _ in range(3)]
+    for v in packets:
+        response = sender.send(v)
+        assert b'role="ack"' in response
+    sender.close()
+    assert vtp_receiver.received == [v.attrib['ivorn'] for v in packets]
+    if vtp_receiver.one_shot:
+        assert vtp_receiver.n_connections == 3
+    else:
+        assert vtp_receiver.n_connections == 1
+
+
+def test_send_nakked(vtp_receiver):
+    sender = VtpSender('127.0.0.1', vtp_receiver.server_address[1])
+    v = fourpisky.voevent.create_4pisky_test_trigger_voevent()
+    vtp_receiver.nak_ivorns.add(v.attrib['ivorn'])
+    with pytest.raises(VOEventSendError):
+        sender.send(v)
+    # Should be caught by existing handlers for comet-sendvo failures:
+    with pytest.raises(subprocess.CalledProcessError):
+        sender.send(v)
+    sender.close()
+
+
+def test_connection_refused():
+    receiver = VtpReceiver()
+    port = receiver.server_address[1]
+    receiver.server_close()
+    sender = VtpSender('127.0.0.1', port)
+    with pytest.raises(OSError):
+        sender.send(fourpisky.voevent.create_4pisky_test_trigger_voevent())
+
+
+def test_no_resend_after_ack_timeout(vtp_receiver, monkeypatch):
+    port = vtp_receiver.server_address[1]
+    v = fourpisky.voevent.create_4pisky_test_trigger_voevent()
+    vtp_receiver.silent_ivorns.add(v.attrib['ivorn'])
+    sender = VtpSender('127.0.0.1', port, timeout=0.5)
+    with pytest.raises(VOEventSendError):
+        sender.send(v)
+    sender.close()
+
+    # Nor should we fall back to the subprocess:
+    def fail_subprocess_send(*args, **kwargs):
+        raise AssertionError("Packet resent via comet-sendvo")
+    monkeypatch.setattr(comet, 'send_voevent_via_subprocess',
+                        fail_subprocess_send)
+    monkeypatch.setattr(comet, 'get_vtp_sender',
+                        lambda host, port: VtpSender(host, port, timeout=0.5))
+    with pytest.raises(subprocess.CalledProcessError):
+        comet.send_voevent(v, '127.0.0.1', port)
+    assert vtp_receiver.received == [v.attrib['ivorn']] * 2
+
+
+def test_unreadable_response(vtp_receiver):
+    sender = VtpSender('127.0.0.1', vtp_receiver.server_address[1])
+    v = fourpisky.voevent.create_4pisky_test_trigger_voevent()
+    vtp_receiver.garbled_ivorns.add(v.attrib['ivorn'])
+    with pytest.raises(VOEventSendError):
+        sender.send(v)
+    sender.close()
+    assert vtp_receiver.received == [v.attrib['ivorn']]
+
+
+def test_broker_closes_after_ack():
+    # Like Comet - and suppose we don't notice the close before sending
+    # again, so the next packet lands on a half-closed connection:
+    receiver = VtpReceiver(one_shot=True).start()
+    try:
+        sender = VtpSender('127.0.0.1', receiver.server_address[1])
+        sender._connection_usable = lambda: sender._sock is not None
+        packets = [fourpisky.voevent.create_4pisky_test_trigger_voevent()
+                   for _ in range(3)]
+        for v in packets:
+            assert b'role="ack"' in sender.send(v)
+        sender.close()
+        # Each packet was received once, and after the first reset we stop
+        # reusing connections:
+        assert receiver.received == [v.attrib['ivorn'] for v in packets]
+        assert sender.closes_after_ack
+        assert receiver.n_connections == 3
+    finally:
+        receiver.stop()
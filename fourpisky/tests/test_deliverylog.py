@@ -0,0 +1,19 @@
+from fourpisky.taskqueue.deliverylog import DeliveryLog
+
+
+def test_delivery_log(uncreated_temporary_file_path):
+    log = DeliveryLog(uncreated_temporary_file_path)
+    assert not log.is_delivered('abc')
+    latency = log.record_delivery('abc', 'email', enqueued_at=100.,
+                                  delivered_at=102.5)
+    assert latency == 2.5
+    log.record_delivery('def', 'voevent', enqueued_at=100.,
+                        delivered_at=100.5)
+    assert log.is_delivered('abc')
+    assert log.latencies('email') == [2.5]
+    assert sorted(log.latencies()) == [0.5, 2.5]
+    log.close()
+
+    reopened = DeliveryLog(uncreated_temporary_file_path)
+    assert reopened.is_delivered('def')
+    reopened.close()
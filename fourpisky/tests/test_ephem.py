@@ -1,9 +1,14 @@
 from __future__ import absolute_import
+import datetime
 import unittest
+import ephem
+import numpy as np
 from fourpisky.tests.resources import greenwich
 import fourpisky.visibility as vis
 from fourpisky.visibility import TargetStatusKeys as tkeys
 from fourpisky.visibility import DEG_PER_RADIAN
+from fourpisky import vectorvis
+from fourpisky.sites import AmiLA, Pt5m
 
 
 class TestPyEphemSiteVisibilityCalcs(unittest.TestCase):
@@ -55,4 +60,100 @@ class TestPyEphemSiteVisibilityCalcs(unittest.TestCase):
         print(later[tkeys.next_transit_pos])
 
 
+class TestEphemCache(unittest.TestCase):
+    def setUp(self):
+        self.site = greenwich.greenwich_site
+        self.targets = [greenwich.circumpolar_north_transit_at_ve,
+                        greenwich.equatorial_transiting_at_ve_m6hr,
+                        greenwich.equatorial_transiting_at_ve_p13hr]
+
+    def test_cached_matches_uncached(self):
+        cache = vis.EphemCache()
+        for target in self.targets:
+            for hours in (0, 0.5, 5.2, 11.9):
+                time = (greenwich.vernal_equinox_2012
+                        + datetime.timedelta(hours=hours))
+                direct = vis.get_ephem(target, self.site, time, cache=None)
+                cached = vis.get_ephem(target, self.site, time, cache=cache)
+                self.assertEqual(direct[tkeys.type], cached[tkeys.type])
+                self.assertEqual(list(direct[tkeys.timeline].values()),
+                                 list(cached[tkeys.timeline].values()))
+                for t_direct, t_cached in zip(direct[tkeys.timeline],
+                                              cached[tkeys.timeline]):
+                    self.assertLess(abs(t_direct - t_cached),
+                                    datetime.timedelta(seconds=2))
+        self.assertGreater(cache.hits, 0)
+
+    def test_lru_eviction(self):
+        cache = vis.EphemCache(maxsize=2)
+        time = greenwich.vernal_equinox_2012
+        for target in self.targets:
+            vis.get_ephem(target, self.site, time, cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.misses, 3)
+        # First target was evicted, last is still cached:
+        vis.get_ephem(self.targets[-1], self.site, time, cache=cache)
+        self.assertEqual(cache.hits, 1)
+        vis.get_ephem(self.targets[0], self.site, time, cache=cache)
+        self.assertEqual(cache.misses, 4)
+
+
+class TestVectorisedVisibility(unittest.TestCase):
+    def setUp(self):
+        self.time = greenwich.vernal_equinox_2012
+        self.sites = [greenwich.greenwich_site, greenwich.anti_site]
+
+    def test_known_targets(self):
+        targets = [greenwich.circumpolar_north_transit_at_ve,
+                   greenwich.never_visible_source,
+                   greenwich.equatorial_transiting_at_ve,
+                   greenwich.equatorial_transiting_at_ve_p12hr]
+        vis_greenwich = vectorvis.compute_visibility(
+            [t.ra for t in targets], [t.dec for t in targets],
+            self.sites[:1], self.time)[0]
+        self.assertEqual(
+            [vectorvis.type_labels[t] for t in vis_greenwich.type],
+            ['always', 'never', 'sometimes', 'sometimes'])
+        self.assertEqual(list(vis_greenwich.visible_now),
+                         [True, False, True, False])
+        # Transiting now, give or take precession:
+        self.assertLess(abs(vis_greenwich.alt[2] - (90 - 51.5)), 0.5)
 
+    def test_matches_pyephem(self):
+        rng = np.random.RandomState(42)
+        n_targets = 100
+        ra = rng.uniform(0, 2 * np.pi, n_targets)
+        dec = np.arcsin(rng.uniform(-0.95, 0.95, n_targets))
+        sites = self.sites + [AmiLA, Pt5m]
+        results = vectorvis.compute_visibility(ra, dec, sites, self.time)
+        period = vectorvis.SECONDS_PER_SIDEREAL_DAY
+        for site, site_vis in zip(sites, results):
+            for idx in range(n_targets):
+                target = ephem.Equatorial(ra[idx], dec[idx], epoch=ephem.J2000)
+                e = vis.get_ephem(target, site, self.time, cache=None)
+                alt = e[tkeys.current_pos][0]
+                if alt > 1:
+                    self.assertAlmostEqual(site_vis.alt[idx], alt, delta=0.05)
+                vis_type = vectorvis.type_labels[site_vis.type[idx]]
+                # pyephem's circumpolar flag is approximate (see vectorvis):
+                lower_culmination = (abs(site.lat + dec[idx])
+                                     - np.pi / 2 - site.horizon)
+                if abs(lower_culmination) * DEG_PER_RADIAN > 1:
+                    self.assertEqual(vis_type, e[tkeys.type])
+                if vis_type != e[tkeys.type] or vis_type == 'never':
+                    continue
+                next_transit = (e[tkeys.next_transit_time]
+                                - self.time).total_seconds()
+                self.assertAlmostEqual(site_vis.next_transit[idx],
+                                       next_transit, delta=30)
+                if vis_type == 'sometimes':
+                    events = {label: dtime for dtime, label
+                              in e[tkeys.timeline].items()}
+                    for label, secs in (('Next rising', site_vis.next_rise),
+                                        ('Next setting', site_vis.next_set)):
+                        offset = (secs[idx] - (events[label] - self.time)
+                                  .total_seconds())
+                        # Events right now may be 'next' for one but not
+                        # the other:
+                        offset = (offset + period / 2) % period - period / 2
+                        self.assertLess(abs(offset), 60)
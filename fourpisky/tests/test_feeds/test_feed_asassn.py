@@ -1,10 +1,12 @@
 import iso8601
+import lxml.html
 from six import string_types
 from fourpisky.tests.resources import datapaths
 import fourpisky.feeds.asassn as asassn
 import voeventparse as vp
 from voeventdb.server.database.models import Voevent
 import os
+import re
 import pytest
 
 
@@ -125,3 +127,79 @@ def test_localdb_deduplication(fixture_db_session):
     feed3 = asassn.AsassnFeed()
     feed3._content = modified_content
     assert [] == feed3.determine_new_entries()
+
+
+def test_ivorn_index_short_circuits_db(uncreated_temporary_file_path):
+    hash_cache_path = uncreated_temporary_file_path
+    feed1 = asassn.AsassnFeed(hash_cache_path)
+    feed1._content = asassn_content_2018
+    feed1.record_known_ivorns(
+        [feed1.feed_id_to_ivorn(id) for id in feed1.event_id_data_map])
+
+    # No database configured, so this will fail if we try to query it:
+    feed2 = asassn.AsassnFeed(hash_cache_path)
+    feed2._content = asassn_content_2018
+    assert len(feed2.ivorn_index) == len(feed2.event_id_data_map)
+    assert feed2.determine_new_entries() == []
+    os.unlink(feed2.ivorn_index.path)
+
+
+def test_incremental_parse(uncreated_temporary_file_path):
+    hash_cache_path = uncreated_temporary_file_path
+    full_feed = asassn.AsassnFeed()
+    full_feed._content = asassn_content_2018
+    all_events = full_feed.parse_content_to_event_data_list()
+    all_ids = [full_feed.event_data_to_event_id(e) for e in all_events]
+
+    # Pretend we've seen everything except the three newest rows:
+    feed = asassn.AsassnFeed(hash_cache_path, incremental=True)
+    feed._content = asassn_content_2018
+    feed.record_known_ivorns([feed.feed_id_to_ivorn(id) for id in all_ids[3:]])
+    assert sorted(feed.event_id_data_map.keys()) == sorted(all_ids[:3])
+    os.unlink(feed.ivorn_index.path)
+
+    # With nothing known, an incremental parse should find everything:
+    feed = asassn.AsassnFeed(incremental=True)
+    feed._content = asassn_content_2018
+    assert len(feed.parse_content_to_event_data_list()) == len(all_events)
+
+    # Everything older than the cutoff counts as known:
+    feed = asassn.AsassnFeed(incremental=True, cutoff=iso8601.parse_date(
+        "2018-09-01"))
+    feed._content = asassn_content_2018
+    recent = feed.parse_content_to_event_data_list()
+    assert 0 < len(recent) < 100
+
+
+def test_streamed_parse_matches_tree_parse():
+    tree_events = asassn.transform_pagetree(
+        lxml.html.fromstring(asassn_content_2018))
+    streamed_events = list(asassn.iter_streamed_events(asassn_content_2018,
+                                                       chunksize=1000))
+    assert len(streamed_events) == len(tree_events)
+    for tree_event, streamed_event in zip(tree_events, streamed_events):
+        assert 'raw' not in streamed_event
+        assert tree_event['param'] == streamed_event['param']
+        assert tree_event['url'] == streamed_event['url']
+
+    with_raw = next(asassn.iter_streamed_events(asassn_content_2018,
+                                                keep_raw=True))
+    assert len(with_raw['raw']) == asassn.asassn_ncols
+
+
+def test_batch_voevent_generation():
+    feed = asassn.AsassnFeed()
+    feed._content = asassn_content_2018
+    feed_ids = list(feed.event_id_data_map.keys())[:10]
+    batch = feed.generate_voevents(feed_ids)
+    assert len(batch) == len(feed_ids)
+    # Compare against golden packets, from the original one-at-a-time
+    # conversion. (The Who section differs - timestamp, package version.)
+    for idx, v in enumerate(batch):
+        with open(datapaths.feed_voevent('asassn', idx), 'rb') as f:
+            expected = f.read()
+        assert _strip_who(vp.dumps(v)) == _strip_who(expected)
+
+
+def _strip_who(packet):
+    return re.sub(br'<Who>.*?</Who>', b'', packet, flags=re.S)
@@ -4,6 +4,7 @@ import fourpisky.feeds.gaia as gaia
 import voeventparse as vp
 from voeventdb.server.database.models import Voevent
 import os
+import re
 import pytest
 
 
@@ -44,3 +45,21 @@ def test_voevent_generation():
         outpath = os.path.join(tmpdir,'{}.xml'.format(stream_id))
         with open(outpath, 'wb') as f:
             vp.dump(v, f)
+
+
+def test_batch_voevent_generation():
+    feed = gaia.GaiaFeed()
+    feed._content = gaia_content
+    feed_ids = list(feed.event_id_data_map.keys())[:10]
+    batch = feed.generate_voevents(feed_ids)
+    assert len(batch) == len(feed_ids)
+    # Compare against golden packets, from the original one-at-a-time
+    # conversion. (The Who section differs - timestamp, package version.)
+    for idx, v in enumerate(batch):
+        with open(datapaths.feed_voevent('gaia', idx), 'rb') as f:
+            expected = f.read()
+        assert _strip_who(vp.dumps(v)) == _strip_who(expected)
+
+
+def _strip_who(packet):
+    return re.sub(br'<Who>.*?</Who>', b'', packet, flags=re.S)
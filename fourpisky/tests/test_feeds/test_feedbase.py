@@ -0,0 +1,129 @@
+import hashlib
+import http.server
+import threading
+
+import pytest
+
+from fourpisky.feeds.feedbase import FeedBase, match_prefixes
+from fourpisky.feeds.feedstate import FeedStateStore, get_feed_state_store
+from fourpisky.feeds.knownivorns import KnownIvornIndex
+
+
+def test_match_prefixes():
+    ivorns = [
+        'ivo://voevent.4pisky.org/ASASSN#2016-01-09.28_ASASSN-16ad',
+        'ivo://gaia.cam.uk/alerts#Gaia16ajo',
+    ]
+    prefixes = [
+        'ivo://voevent.4pisky.org/ASASSN#2016-01-09.28',
+        'ivo://voevent.4pisky.org/ASASSN#2016-01-09.29',
+        'ivo://gaia.cam.uk/alerts#Gaia16ajo',
+        'ivo://gaia.cam.uk/alerts#Gaia16ajp',
+    ]
+    assert match_prefixes(prefixes, ivorns) == {
+        'ivo://voevent.4pisky.org/ASASSN#2016-01-09.28',
+        'ivo://gaia.cam.uk/alerts#Gaia16ajo',
+    }
+    assert match_prefixes(prefixes, []) == set()
+
+
+def test_known_ivorn_index(uncreated_temporary_file_path):
+    index = KnownIvornIndex(uncreated_temporary_file_path)
+    assert 'ivo://gaia.cam.uk/alerts#Gaia16ajo' not in index
+    index.add(['ivo://gaia.cam.uk/alerts#Gaia16ajo',
+               'ivo://voevent.4pisky.org/ASASSN#2016-01-09.28_ASASSN-16ad'])
+    index.add('ivo://gaia.cam.uk/alerts#Gaia16ajo')
+
+    reloaded = KnownIvornIndex(uncreated_temporary_file_path)
+    assert len(reloaded) == 2
+    assert 'ivo://gaia.cam.uk/alerts#Gaia16ajo' in reloaded
+    assert reloaded.prefix_present('ivo://voevent.4pisky.org/ASASSN#2016-01')
+    assert not reloaded.prefix_present('ivo://voevent.4pisky.org/ASASSN#2017')
+
+
+class ConditionalGetHandler(http.server.BaseHTTPRequestHandler):
+    content = b'x' * 200
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.content)))
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def conditional_get_server():
+    server = http.server.HTTPServer(('127.0.0.1', 0), ConditionalGetHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}/feed.csv'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+class DummyFeed(FeedBase):
+    name = 'dummy feed'
+    substream = 'DUMMY'
+    hash_byte_range = (0, 99)
+
+    def __init__(self, url, hash_cache_path):
+        self.url = url
+        super(DummyFeed, self).__init__(hash_cache_path)
+
+
+def test_conditional_get(conditional_get_server, uncreated_temporary_file_path):
+    ConditionalGetHandler.requests_seen[:] = []
+    feed1 = DummyFeed(conditional_get_server, uncreated_temporary_file_path)
+    assert feed1.old_hash is None
+    # Server ignores range requests; hash should still cover the byte-range:
+    assert feed1.new_hash == hashlib.md5(
+        ConditionalGetHandler.content[:100]).hexdigest()
+    feed1.save_new_hash()
+
+    feed2 = DummyFeed(conditional_get_server, uncreated_temporary_file_path)
+    assert feed2.old_validators == {'ETag': '"v1"'}
+    assert feed2.new_hash == feed2.old_hash
+    assert ConditionalGetHandler.requests_seen[-1]['If-None-Match'] == '"v1"'
+    assert feed2._content is None
+
+
+class UnusableStore(FeedStateStore):
+    def get(self, url):
+        raise AssertionError("Store read after state was loaded")
+
+
+def test_validators_saved_when_changed(conditional_get_server,
+                                       uncreated_temporary_file_path):
+    feed1 = DummyFeed(conditional_get_server, uncreated_temporary_file_path)
+    feed1.new_hash
+    feed1.save_new_hash()
+    try:
+        # Same content, new ETag:
+        ConditionalGetHandler.etag = '"v2"'
+        feed2 = DummyFeed(conditional_get_server,
+                          uncreated_temporary_file_path)
+        feed2.load_old_state()
+        feed2._state_store = UnusableStore()
+        assert feed2.new_hash == feed2.old_hash
+        feed2._state_store = get_feed_state_store(
+            uncreated_temporary_file_path)
+        feed2.save_fetch_time()
+
+        feed3 = DummyFeed(conditional_get_server,
+                          uncreated_temporary_file_path)
+        assert feed3.old_validators == {'ETag': '"v2"'}
+        assert feed3.new_hash == feed3.old_hash
+        assert feed3._content is None
+    finally:
+        ConditionalGetHandler.etag = '"v1"'
@@ -0,0 +1,56 @@
+import datetime
+import threading
+
+from fourpisky.feeds.feedstate import (
+    FeedStateKeys,
+    SqliteFeedStateStore,
+    close_feed_state_stores,
+    get_feed_state_store,
+)
+
+
+def test_store_roundtrip(uncreated_temporary_file_path):
+    store = SqliteFeedStateStore(uncreated_temporary_file_path)
+    url = 'http://example.com/feed.csv'
+    assert store.get(url) is None
+    store.update(url, md5='abc', etag='"v1"')
+    fetch_time = datetime.datetime(2018, 9, 23, 12, 0)
+    store.update(url, last_fetch=fetch_time)
+    state = store.get(url)
+    assert state[FeedStateKeys.md5] == 'abc'
+    assert state[FeedStateKeys.etag] == '"v1"'
+    assert state[FeedStateKeys.last_modified] is None
+    assert state[FeedStateKeys.last_fetch] == fetch_time.isoformat()
+    store.close()
+
+
+def test_store_shared_by_path(uncreated_temporary_file_path):
+    store = get_feed_state_store(uncreated_temporary_file_path)
+    assert get_feed_state_store(uncreated_temporary_file_path) is store
+    assert get_feed_state_store(store) is store
+    close_feed_state_stores()
+    reopened = get_feed_state_store(uncreated_temporary_file_path)
+    assert reopened is not store
+    close_feed_state_stores()
+
+
+def test_concurrent_writers(uncreated_temporary_file_path):
+    # Separate connections, as if from overlapping scraper processes:
+    stores = [SqliteFeedStateStore(uncreated_temporary_file_path)
+              for _ in range(4)]
+
+    def write_many(store, worker_idx):
+        for i in range(50):
+            store.update('http://example.com/{}'.format(i % 5),
+                         md5='{}-{}'.format(worker_idx, i))
+
+    threads = [threading.Thread(target=write_many, args=(store, idx))
+               for idx, store in enumerate(stores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(5):
+        assert stores[0].get('http://example.com/{}'.format(i)) is not None
+    for store in stores:
+        store.close()
@@ -1,4 +1,8 @@
+import datetime
 from unittest import TestCase
+import ephem
+import numpy as np
+import pytz
 import voeventparse
 from fourpisky.utils import convert_voe_coords_to_eqposn
 import fourpisky.filters as filters
@@ -17,3 +21,23 @@ class TestAmiTargetFilters(TestCase):
                                      voeventparse.get_event_position(bad_src))
         self.assertIsNone(filters.ami.reject(good_fk5))
         self.assertIsNotNone(filters.ami.reject(bad_fk5))
+
+    def test_reject_many(self):
+        rng = np.random.RandomState(1)
+        n_targets = 40
+        ra = rng.uniform(0, 2 * np.pi, n_targets)
+        dec = np.arcsin(rng.uniform(-0.9, 0.9, n_targets))
+        start = np.datetime64('2016-01-01T00:00:00', 'us')
+        times = start + (rng.uniform(0, 5 * 86400, n_targets)
+                         * 1e6).astype('timedelta64[us]')
+        rejected = filters.ami.reject_many(ra, dec, times)
+        for idx in range(n_targets):
+            posn = ephem.Equatorial(ra[idx], dec[idx], epoch=ephem.J2000)
+            current_time = pytz.utc.localize(
+                times[idx].astype(datetime.datetime))
+            self.assertEqual(
+                rejected[idx],
+                filters.ami.reject(posn, current_time=current_time)
+                is not None)
+        self.assertTrue(rejected.any())
+        self.assertFalse(rejected.all())
@@ -0,0 +1,55 @@
+import threading
+
+import voeventparse
+from voeventdb.server.database.models import Coord, Voevent
+
+from fourpisky.taskqueue.ingest import Batcher, insert_voevent_batch
+from fourpisky.tests.resources import datapaths
+
+
+def test_batcher_flushes_when_full():
+    batches = []
+    batcher = Batcher(batches.append, max_items=3, max_delay=60.)
+    for i in range(7):
+        batcher.add(i)
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert len(batcher) == 1
+    batcher.flush()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    batcher.flush()
+    assert len(batches) == 3
+
+
+def test_batcher_flushes_after_delay():
+    flushed = threading.Event()
+    batches = []
+
+    def flush_function(batch):
+        batches.append(batch)
+        flushed.set()
+
+    batcher = Batcher(flush_function, max_items=100, max_delay=0.05)
+    batcher.add('a')
+    batcher.add('b')
+    assert flushed.wait(timeout=5)
+    assert batches == [['a', 'b']]
+    assert len(batcher) == 0
+
+
+def test_insert_voevent_batch(fixture_db_session):
+    s = fixture_db_session
+    voevents = []
+    for path in (datapaths.swift_bat_grb_pos_v2,
+                 datapaths.swift_bat_grb_low_dec,
+                 datapaths.swift_bat_grb_pos_v2):
+        with open(path, 'rb') as f:
+            voevents.append(voeventparse.load(f))
+    errors = insert_voevent_batch(s, voevents)
+    # (The repeated packet is identical, so is accepted.)
+    assert errors == [None, None, None]
+    assert s.query(Voevent).count() == 2
+    assert s.query(Coord).count() == 2
+    for v in voevents:
+        row = s.query(Voevent).filter(
+            Voevent.ivorn == v.attrib['ivorn']).one()
+        assert [c.voevent_id for c in row.coords] == [row.id]
@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+import datetime
+import timeit
+import unittest
+
+import ephem
+
+import fourpisky.visibility as vis
+from fourpisky.planner import ObservingPlan
+from fourpisky.sites import AmiLA, Pt5m
+from fourpisky.tests.resources import greenwich
+from fourpisky.visibility import TargetStatusKeys as tkeys
+
+
+class TestObservingPlan(unittest.TestCase):
+    def setUp(self):
+        self.time = greenwich.vernal_equinox_2012
+        self.site = greenwich.greenwich_site
+        self.anti_site = greenwich.anti_site
+
+    def test_always_and_never(self):
+        plan = ObservingPlan(greenwich.circumpolar_north_transit_at_ve,
+                             [self.site, self.anti_site], self.time)
+        self.assertEqual(plan.coverage, [(self.time, plan.end_time)])
+        self.assertEqual(plan.windows_for(self.anti_site), [])
+        self.assertEqual(plan.earliest.site, self.site)
+
+    def test_windows_match_pyephem(self):
+        target = greenwich.equatorial_transiting_at_ve_p12hr
+        plan = ObservingPlan(target, [self.site], self.time,
+                             lookahead=datetime.timedelta(hours=48))
+        e = vis.get_ephem(target, self.site, self.time, cache=None)
+        events = {label: dtime for dtime, label in e[tkeys.timeline].items()}
+        windows = plan.windows
+        self.assertEqual(len(windows), 2)
+        self.assertLess(abs(windows[0].start - events['Next rising']),
+                        datetime.timedelta(minutes=1))
+        self.assertLess(abs(windows[0].end - events['Next setting']),
+                        datetime.timedelta(minutes=1))
+
+    def test_window_in_progress(self):
+        plan = ObservingPlan(greenwich.equatorial_transiting_at_ve,
+                             [self.site], self.time)
+        first = plan.windows[0]
+        self.assertEqual(first.start, self.time)
+        # Transiting now, so sets around 6 hours later:
+        self.assertAlmostEqual(
+            (first.end - self.time).total_seconds() / 3600., 6, delta=0.5)
+
+    def test_merged_coverage_and_advance(self):
+        target = greenwich.equatorial_transiting_at_ve_p12hr
+        # Same longitude, so the windows overlap:
+        plan = ObservingPlan(target, [self.site, self.anti_site], self.time)
+        self.assertEqual(len(plan.windows), 2)
+        self.assertEqual(len(plan.coverage), 1)
+        start, end = plan.coverage[0]
+        self.assertEqual(start, min(w.start for w in plan.windows))
+        self.assertEqual(end, max(w.end for w in plan.windows))
+
+        plan.advance(start + datetime.timedelta(hours=1))
+        self.assertEqual(plan.coverage[0], (plan.current_time, end))
+        plan.advance(self.time + datetime.timedelta(days=3))
+        self.assertGreater(plan.earliest.start, plan.current_time)
+
+    def test_fast_enough_for_trigger_path(self):
+        position = ephem.Equatorial('5:0:0', '+25:00:00', epoch=ephem.J2000)
+
+        def make_plan():
+            plan = ObservingPlan(position, [AmiLA, Pt5m], self.time)
+            return plan.earliest, plan.coverage
+
+        n_runs = 100
+        secs_per_plan = timeit.timeit(make_plan, number=n_runs) / n_runs
+        self.assertLess(secs_per_plan, 0.01)
@@ -0,0 +1,135 @@
+import datetime
+import glob
+import os
+import re
+
+import pytz
+import voeventparse
+
+from fourpisky import replay
+from fourpisky.tests.resources import datapaths
+from fourpisky.triggers.registry import TriggerRegistry
+from fourpisky.utils import archive_voevent_to_file, utcnow
+
+
+class FakeClock(object):
+    def __init__(self, step=0.):
+        self.now = 100.
+        self.step = step
+        self.sleeps = []
+
+    def __call__(self):
+        # Each reading of the clock advances it a little, like real work:
+        self.now += self.step
+        return self.now
+
+    def sleep(self, secs):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+def handle_all(handler):
+    handlers = TriggerRegistry()
+    handlers.register('ivo://', handler)
+    return handlers
+
+
+def make_packets(offsets):
+    with open(datapaths.swift_bat_grb_pos_v2, 'rb') as f:
+        bytestring = f.read()
+    t0 = datetime.datetime(2016, 1, 1, tzinfo=pytz.utc)
+    return [replay.ReplayPacket(t0 + datetime.timedelta(seconds=s),
+                                bytestring) for s in offsets]
+
+
+def test_archive_order(tmpdir):
+    for path in glob.glob(os.path.join(datapaths.data_dir, '*.xml')):
+        with open(path, 'rb') as f:
+            archive_voevent_to_file(voeventparse.load(f), str(tmpdir))
+    packets = list(replay.iter_archive_packets(str(tmpdir)))
+    assert len(packets) == len(glob.glob(
+        os.path.join(datapaths.data_dir, '*.xml')))
+    times = [p.author_datetime for p in packets]
+    assert times == sorted(times)
+    for p in packets:
+        v = voeventparse.loads(p.bytestring)
+        assert p.author_datetime == replay.sniff_author_datetime(
+            voeventparse.dumps(v))
+
+
+def test_paced_replay():
+    clock = FakeClock()
+    processed = []
+    replayer = replay.Replayer(handle_all(processed.append), speedup=10.,
+                               clock=clock, sleep=clock.sleep)
+    stats = replayer.run(make_packets([0, 50, 100]))
+    assert len(processed) == 3
+    assert replayer.n_processed == 3
+    # 100 seconds of author-time, replayed at 10x:
+    assert abs(sum(clock.sleeps) - 10.) < 1e-9
+    assert list(stats.timings) == ['lag', 'parse', 'process', 'end_to_end']
+    assert max(stats.timings['lag']) < 1e-9
+
+
+def test_asap_replay():
+    clock = FakeClock(step=0.5)
+    replayer = replay.Replayer(handle_all(lambda v: None), speedup=None,
+                               clock=clock, sleep=clock.sleep)
+    stats = replayer.run(make_packets([0, 3600, 7200]))
+    assert clock.sleeps == []
+    assert 'lag' not in stats.timings
+    assert list(stats.percentiles('parse', (50,))) == [0.5]
+    assert replayer.throughput > 0
+    assert 'end_to_end' in stats.summary()
+
+
+def test_failures_counted():
+    def fail(v):
+        raise RuntimeError
+    replayer = replay.Replayer(handle_all(fail))
+    bad_packet = replay.ReplayPacket(make_packets([0])[0].author_datetime,
+                                     b'not xml')
+    replayer.run(make_packets([0]) + [bad_packet])
+    assert replayer.n_failed == 2
+    assert replayer.n_processed == 0
+
+
+def test_replay_reaches_reports(monkeypatch):
+    from fourpisky.scripts import process_voevent
+    sent = []
+    monkeypatch.setattr(process_voevent, 'send_report',
+                        lambda subject, text, contacts: sent.append(subject))
+
+    def load_packet(path, author_date=None):
+        with open(path, 'rb') as f:
+            bytestring = f.read()
+        if author_date is not None:
+            bytestring = re.sub(b'<Date>[^<]*</Date>',
+                                b'<Date>' + author_date + b'</Date>',
+                                bytestring, count=1)
+        return replay.ReplayPacket(replay.sniff_author_datetime(bytestring),
+                                   bytestring)
+
+    packets = [
+        # Bulk-scraped two weeks after detection, so genuinely stale:
+        load_packet(datapaths.asassn_alert_16ab),
+        # As authored by the live scraper, the day after detection:
+        load_packet(datapaths.asassn_alert_16ab, b'2016-01-04T17:11:46'),
+        load_packet(datapaths.gaia_alert_16ajo),
+    ]
+    packets.sort()
+    replayer = replay.Replayer(process_voevent.trigger_handlers)
+    replayer.run(packets)
+    assert replayer.n_failed == 0
+    assert replayer.n_processed == 3
+    assert [s.split()[0] for s in sent] == ['ASASSN-16ab', 'Gaia16ajo']
+
+
+def test_replay_pins_utcnow():
+    seen = []
+    replayer = replay.Replayer(handle_all(lambda v: seen.append(utcnow())))
+    packets = make_packets([0, 60])
+    replayer.run(packets)
+    assert seen == [p.author_datetime for p in packets]
+    assert utcnow() > packets[-1].author_datetime + datetime.timedelta(
+        days=365)
@@ -0,0 +1,83 @@
+from __future__ import absolute_import
+import multiprocessing
+import time
+
+import fourpisky.reports as reports
+
+from fourpisky.reports import compute_site_reports, get_report_renderer
+from fourpisky.tests.resources import greenwich
+from fourpisky.visibility import (ephem_cache, get_ephem,
+                                  TargetStatusKeys as tkeys)
+
+
+class MisconfiguredSite(object):
+    name = 'Nowhere'
+    lat = 'not-a-latitude'
+
+
+def test_parallel_site_reports_match_serial():
+    target = greenwich.equatorial_transiting_at_ve
+    time = greenwich.vernal_equinox_2012
+    sites = [greenwich.greenwich_site, greenwich.anti_site]
+    site_reports = compute_site_reports(target, sites, time)
+    assert [site for site, _ in site_reports] == sites
+    for site, vis in site_reports:
+        expected = get_ephem(target, site, time)
+        assert vis[tkeys.type] == expected[tkeys.type]
+        assert vis[tkeys.timeline] == expected[tkeys.timeline]
+
+
+def test_unavailable_site():
+    target = greenwich.equatorial_transiting_at_ve
+    time = greenwich.vernal_equinox_2012
+    sites = [greenwich.greenwich_site, MisconfiguredSite()]
+    site_reports = compute_site_reports(target, sites, time)
+    assert site_reports[0][1] is not None
+    assert site_reports[1][1] is None
+
+    text = get_report_renderer().render(
+        'includes/visibility_report.j2', site=sites[1], vis=None)
+    assert 'Visibility unavailable' in text
+
+
+def test_site_reports_in_daemon_process(monkeypatch):
+    # Daemonic processes (e.g. Celery workers) can't start a process-pool,
+    # but should still compute concurrently, with a timeout:
+    monkeypatch.setattr(multiprocessing.current_process(), 'daemon', True)
+    target = greenwich.equatorial_transiting_at_ve
+    time = greenwich.vernal_equinox_2012
+    sites = [greenwich.greenwich_site, greenwich.anti_site]
+    site_reports = compute_site_reports(target, sites, time)
+    for site, vis in site_reports:
+        assert vis == get_ephem(target, site, time)
+
+
+def test_site_reports_use_ephem_cache():
+    ephem_cache.clear()
+    target = greenwich.equatorial_transiting_at_ve
+    time = greenwich.vernal_equinox_2012
+    sites = [greenwich.greenwich_site, greenwich.anti_site]
+    compute_site_reports(target, sites, time)
+    hits = ephem_cache.hits
+    assert len(ephem_cache) == len(sites)
+    compute_site_reports(target, sites, time)
+    assert ephem_cache.hits == hits + len(sites)
+
+
+def _stalled_site_ephem(*args):
+    time.sleep(2)
+
+
+def test_timeout(monkeypatch):
+    monkeypatch.setattr(multiprocessing.current_process(), 'daemon', True)
+    monkeypatch.setattr(reports, '_site_ephem_from_params',
+                        _stalled_site_ephem)
+    start = time.monotonic()
+    site_reports = reports.compute_site_reports(
+        greenwich.equatorial_transiting_at_ve, [greenwich.greenwich_site],
+        greenwich.vernal_equinox_2012, timeout=0.2)
+    assert time.monotonic() - start < 1.5
+    assert site_reports == [(greenwich.greenwich_site, None)]
+    # The stalled pool is replaced:
+    assert reports._visibility_pool is None
+
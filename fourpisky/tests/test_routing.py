@@ -0,0 +1,83 @@
+from celery import Celery
+from kombu import Queue
+from lxml import etree
+import voeventparse
+
+from fourpisky.taskqueue import routing
+from fourpisky.tests.resources import datapaths
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return voeventparse.load(f)
+
+
+def test_process_queue_for():
+    for path in (datapaths.swift_bat_grb_pos_v2,
+                 datapaths.swift_bat_grb_low_dec,
+                 datapaths.asassn_alert_16ab,
+                 datapaths.gaia_alert_16ajo):
+        assert routing.process_queue_for(load(path)) == routing.priority_queue
+
+    other = voeventparse.Voevent(stream='nasa.gsfc.gcn/SWIFT',
+                                 stream_id='558756_XRT_Pos',
+                                 role=voeventparse.definitions.roles.observation)
+    assert routing.process_queue_for(other) == routing.default_queue
+
+
+def test_classify_plain_element():
+    # The comet plugin passes a bare lxml element, not a voeventparse object:
+    with open(datapaths.swift_bat_grb_pos_v2, 'rb') as f:
+        element = etree.fromstring(f.read())
+    assert routing.is_actionable(element)
+
+
+def test_receive_queue_for():
+    assert (routing.receive_queue_for(load(datapaths.swift_bat_grb_pos_v2))
+            == routing.priority_queue)
+    other = voeventparse.Voevent(stream='nasa.gsfc.gcn/SWIFT',
+                                 stream_id='558756_XRT_Pos',
+                                 role=voeventparse.definitions.roles.observation)
+    assert routing.receive_queue_for(other) == routing.ingest_queue
+
+
+class CustomConfig(object):
+    CELERYD_CONCURRENCY = 3
+    CELERY_QUEUES = [Queue('extra', routing_key='extra')]
+    CELERY_ROUTES = {'some.other.task': {'queue': 'extra'}}
+
+
+def test_declare_queues_with_custom_config():
+    app = Celery('test_routing', set_as_current=False)
+    app.config_from_object(CustomConfig)
+    routing.declare_queues(app)
+    assert set(app.amqp.queues) == set(routing.all_queues + ('extra',))
+    assert app.conf.task_default_queue == routing.default_queue
+    assert routing.task_routes in app.conf.task_routes
+    assert CustomConfig.CELERY_ROUTES in app.conf.task_routes
+    assert app.conf.CELERYD_CONCURRENCY == 3
+    deliver = 'fourpisky.taskqueue.tasks.deliver_email_celerytask'
+    assert (app.amqp.router.route({}, deliver)['queue'].name
+            == routing.priority_queue)
+
+
+def test_route_packet():
+    app = Celery('test_routing', set_as_current=False)
+    routing.declare_queues(app)
+    router = app.amqp.router
+    process = 'fourpisky.taskqueue.tasks.process_voevent_celerytask'
+    receive = 'fourpisky.taskqueue.tasks.receive_voevent_celerytask'
+    with open(datapaths.swift_bat_grb_pos_v2, 'rb') as f:
+        grb = f.read()
+    other = voeventparse.dumps(voeventparse.Voevent(
+        stream='nasa.gsfc.gcn/SWIFT', stream_id='558756_XRT_Pos',
+        role=voeventparse.definitions.roles.observation))
+    assert (router.route({}, process, args=(grb,))['queue'].name
+            == routing.priority_queue)
+    assert (router.route({}, process, args=(other,))['queue'].name
+            == routing.default_queue)
+    assert (router.route({}, receive, args=(other,))['queue'].name
+            == routing.ingest_queue)
+    # Unparseable packets just go to the default queue:
+    assert (router.route({}, process, args=(b'not xml <<',))['queue'].name
+            == routing.default_queue)
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import voeventparse
+
+from fourpisky.scripts.scrape_feeds import scrape_feeds
+
+
+class StubFeed(object):
+    """
+    Stands in for a :class:`.FeedBase`, recording what the scraper does.
+    """
+
+    def __init__(self, name, entry_ids, old_hash=None, new_hash='new',
+                 fetch_error=None, fetch_delay=0.):
+        self.name = name
+        self.url = 'http://example.com/' + name
+        self.entry_ids = entry_ids
+        self.old_hash = old_hash
+        self._new_hash = new_hash
+        self.fetch_error = fetch_error
+        self.fetch_delay = fetch_delay
+        self.fetch_threads = set()
+        self.state_threads = set()
+        self.known_ivorns = []
+        self.saved_hash = False
+        self.saved_fetch_time = False
+
+    def load_old_state(self):
+        self.state_threads.add(threading.current_thread().name)
+        return {'md5': self.old_hash}
+
+    def _fetch(self):
+        self.fetch_threads.add(threading.current_thread().name)
+        time.sleep(self.fetch_delay)
+        if self.fetch_error is not None:
+            raise self.fetch_error
+
+    @property
+    def new_hash(self):
+        self._fetch()
+        return self._new_hash
+
+    @property
+    def content(self):
+        self._fetch()
+        return b''
+
+    def determine_new_entries(self):
+        return list(self.entry_ids)
+
+    def feed_id_to_stream_id(self, feed_id):
+        return feed_id
+
+    def generate_voevents(self, feed_ids):
+        return [voeventparse.Voevent(stream='example.com/' + self.name,
+                                     stream_id=feed_id,
+                                     role=voeventparse.definitions.roles.test)
+                for feed_id in feed_ids]
+
+    def record_known_ivorns(self, ivorns):
+        self.known_ivorns.append(ivorns)
+
+    def save_new_hash(self):
+        self.saved_hash = True
+
+    def save_new_entry_time(self):
+        pass
+
+    def save_fetch_time(self):
+        self.saved_fetch_time = True
+
+
+def test_concurrent_fetch():
+    feeds = [StubFeed('feed{}'.format(i), ['a', 'b'], fetch_delay=0.3)
+             for i in range(4)]
+    sent = []
+    start = time.time()
+    scrape_feeds(feeds, sent.append, voevent_pause_secs=0,
+                 fetch_concurrency=4)
+    # Fetches overlap, so take about as long as one:
+    assert time.time() - start < 0.9
+    fetch_threads = set()
+    for feed in feeds:
+        fetch_threads.update(feed.fetch_threads)
+        assert feed.saved_hash
+        assert feed.state_threads == {threading.current_thread().name}
+    assert threading.current_thread().name not in fetch_threads
+    assert len(fetch_threads) > 1
+    assert len(sent) == 8
+
+
+def test_failed_fetch_does_not_block_others():
+    good = StubFeed('good', ['a'])
+    bad = StubFeed('bad', ['b'], fetch_error=IOError("Connection refused"))
+    unchanged = StubFeed('unchanged', ['c'], old_hash='same',
+                         new_hash='same')
+    sent = []
+    scrape_feeds([bad, good, unchanged], sent.append, voevent_pause_secs=0,
+                 fetch_concurrency=3)
+    assert [v.attrib['ivorn'] for v in sent] == [
+        'ivo://example.com/good#a']
+    assert good.saved_hash and good.known_ivorns
+    assert not bad.saved_hash and not bad.known_ivorns
+    assert not unchanged.saved_hash and unchanged.saved_fetch_time
+
+
+def test_failed_send_does_not_block_others():
+    feeds = [StubFeed('feed1', ['a', 'b']), StubFeed('feed2', ['c'])]
+    sent = []
+
+    def send(v):
+        if v.attrib['ivorn'].endswith('#a'):
+            raise RuntimeError("Send failed")
+        sent.append(v.attrib['ivorn'])
+
+    scrape_feeds(feeds, send, voevent_pause_secs=0, fetch_concurrency=2)
+    assert sorted(sent) == ['ivo://example.com/feed1#b',
+                            'ivo://example.com/feed2#c']
+    assert feeds[0].known_ivorns == ['ivo://example.com/feed1#b']
+
+
+def test_sends_pipelined_within_stream():
+    # e.g. an ASASSN backfill - many packets, all from one stream:
+    feed = StubFeed('feed', ['{:02d}'.format(n) for n in range(10)])
+    lock = threading.Lock()
+    in_flight = [0]
+    max_seen = [0]
+    sent = []
+
+    def send(v):
+        with lock:
+            in_flight[0] += 1
+            max_seen[0] = max(max_seen[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+            sent.append(v.attrib['ivorn'])
+
+    start = time.time()
+    scrape_feeds([feed], send, voevent_pause_secs=0, max_in_flight=4)
+    # Serially, this would take 0.5s:
+    assert time.time() - start < 0.4
+    assert max_seen[0] > 1
+    assert len(sent) == 10
+    assert sorted(feed.known_ivorns) == sorted(sent)
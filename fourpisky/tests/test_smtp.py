@@ -0,0 +1,122 @@
+from contextlib import closing
+import smtplib
+import socket
+
+import pytest
+
+from fourpisky.comms.email import SmtpMailer
+from fourpisky.local import contacts
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+from aiosmtpd.smtp import AuthResult
+
+
+class MessageCollector(object):
+    def __init__(self):
+        self.messages = []
+        self.n_timeouts = 0
+        self.n_data_drops = 0
+
+    async def handle_MAIL(self, server, session, envelope, address,
+                          mail_options):
+        if self.n_timeouts:
+            # As for a server closing an idle session:
+            self.n_timeouts -= 1
+            return '421 4.4.2 Timeout - closing connection'
+        envelope.mail_from = address
+        envelope.mail_options.extend(mail_options)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        if self.n_data_drops:
+            # Message received, but the session fails before we confirm it:
+            self.n_data_drops -= 1
+            return '421 4.4.2 Closing connection'
+        return '250 Message accepted for delivery'
+
+
+def accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def get_free_port():
+    with closing(socket.socket()) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_server():
+    handler = MessageCollector()
+    controller = aiosmtpd_controller.Controller(
+        handler, hostname='127.0.0.1', port=get_free_port(),
+        authenticator=accept_any_login, auth_require_tls=False)
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def test_persistent_session(smtp_server):
+    controller, handler = smtp_server
+    account = contacts.gmail_login._replace(
+        smtp_server=controller.hostname,
+        smtp_port=controller.port)
+    mailer = SmtpMailer(account, use_starttls=False)
+    for idx in range(3):
+        mailer.send([c.email for c in contacts.test_contacts],
+                    subject="Test {}".format(idx), body_text="Hello")
+    assert len(handler.messages) == 3
+    assert mailer.n_logins == 1
+
+    # Simulate the server dropping the session:
+    mailer._smtp.close()
+    mailer.send(contacts.error_contacts[0].email,
+                subject="After reconnect", body_text="Hello again")
+    assert len(handler.messages) == 4
+    assert mailer.n_logins == 2
+    assert b'Subject: After reconnect' in handler.messages[-1].content
+    mailer.close()
+
+
+def test_reconnect_after_idle_timeout(smtp_server):
+    controller, handler = smtp_server
+    account = contacts.gmail_login._replace(
+        smtp_server=controller.hostname,
+        smtp_port=controller.port)
+    mailer = SmtpMailer(account, use_starttls=False)
+    mailer.send(contacts.test_contacts[0].email,
+                subject="First", body_text="Hello")
+    handler.n_timeouts = 1
+    mailer.send(contacts.test_contacts[0].email,
+                subject="After timeout", body_text="Hello again")
+    assert len(handler.messages) == 2
+    assert mailer.n_logins == 2
+
+    # We only retry once:
+    handler.n_timeouts = 2
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        mailer.send(contacts.test_contacts[0].email,
+                    subject="Timeout twice", body_text="Hello")
+    assert len(handler.messages) == 2
+    mailer.close()
+
+
+def test_no_resend_after_data(smtp_server):
+    controller, handler = smtp_server
+    account = contacts.gmail_login._replace(
+        smtp_server=controller.hostname,
+        smtp_port=controller.port)
+    mailer = SmtpMailer(account, use_starttls=False)
+    handler.n_data_drops = 1
+    with pytest.raises(smtplib.SMTPDataError):
+        mailer.send(contacts.test_contacts[0].email,
+                    subject="Dropped after DATA", body_text="Hello")
+    # The server may have delivered it, so we mustn't send it again:
+    assert len(handler.messages) == 1
+    # But the next send gets a fresh session:
+    mailer.send(contacts.test_contacts[0].email,
+                subject="Next", body_text="Hello again")
+    assert len(handler.messages) == 2
+    assert mailer.n_logins == 2
+    mailer.close()
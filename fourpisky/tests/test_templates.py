@@ -1,7 +1,7 @@
 import datetime
 import unittest
 
-from fourpisky.reports import generate_testresponse_text
+from fourpisky.reports import ReportRenderer, generate_testresponse_text
 from fourpisky.tests.resources import greenwich
 from fourpisky.visibility import get_ephem
 from fourpisky.formatting import datetime_format_long, format_datetime
@@ -46,4 +46,13 @@ class TestSiteVisReport(unittest.TestCase):
 
 
 def test_testresponse_compose():
-    generate_testresponse_text(datetime.datetime.now())
\ No newline at end of file
+    generate_testresponse_text(datetime.datetime.now())
+
+def test_report_renderer_preloads_templates():
+    renderer = ReportRenderer()
+    assert 'notify.j2' in renderer.templates
+    assert 'includes/signoff.j2' in renderer.templates
+    now = datetime.datetime.now()
+    text = renderer.render('test_response.j2', now=now)
+    assert renderer.static_context['hostname'] in text
+    assert text == generate_testresponse_text(now)
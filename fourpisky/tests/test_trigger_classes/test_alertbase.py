@@ -0,0 +1,62 @@
+from unittest import TestCase
+import voeventparse
+from fourpisky.triggers import asassn, gaia, swift
+from fourpisky.triggers.alertbase import get_param_value
+from fourpisky.utils import convert_voe_coords_to_eqposn
+from fourpisky.tests.resources import datapaths
+
+
+def load_alert(path, alert_class):
+    with open(path, 'rb') as f:
+        return alert_class(voeventparse.load(f))
+
+
+class TestLazyAlertAttributes(TestCase):
+    def test_reject_only_reads_flag(self):
+        alert = load_alert(datapaths.swift_bat_grb_lost_lock, swift.BatGrb)
+        self.assertIsNotNone(alert.reject())
+        self.assertTrue(alert.is_recent())
+        for slot in ('_group_params', '_isotime', '_position', '_ids'):
+            self.assertFalse(hasattr(alert, slot))
+
+    def test_memoised(self):
+        alert = load_alert(datapaths.swift_bat_grb_pos_v2, swift.BatGrb)
+        self.assertIs(alert.group_params, alert.group_params)
+        self.assertIs(alert.isotime, alert.isotime)
+        self.assertEqual(alert.id_long, 'SWIFT_' + alert._pull_swift_bat_id()[0])
+        with self.assertRaises(AttributeError):
+            alert.some_new_attribute = True
+
+    def test_values_match_grouped_params(self):
+        cases = [
+            (datapaths.swift_bat_grb_pos_v2, swift.BatGrb),
+            (datapaths.asassn_alert_16ab, asassn.AsassnAlert),
+            (datapaths.gaia_alert_16ajo, gaia.GaiaAlert),
+        ]
+        for path, alert_class in cases:
+            alert = load_alert(path, alert_class)
+            v = alert.voevent
+            self.assertEqual(alert.isotime,
+                             voeventparse.get_event_time_as_utc(v))
+            posn = convert_voe_coords_to_eqposn(
+                voeventparse.get_event_position(v))
+            self.assertEqual(alert.position.ra, posn.ra)
+            self.assertEqual(alert.position.dec, posn.dec)
+            self.assertTrue(alert.id)
+            self.assertTrue(alert.full_name)
+            group_params = voeventparse.get_grouped_params(v)
+            for group_name, params in group_params.items():
+                for param_name, param in params.items():
+                    self.assertEqual(
+                        get_param_value(v, group_name, param_name),
+                        param['value'])
+        self.assertIsNone(get_param_value(v, 'NoSuchGroup', 'Name'))
+
+    def test_text_params(self):
+        alert = load_alert(datapaths.asassn_alert_16ab, asassn.AsassnAlert)
+        self.assertTrue(alert.inferred_name.startswith('ASASSN @ '))
+        self.assertIn(alert.id, alert.text_params.values())
+        self.assertTrue(alert.url_params)
+        alert = load_alert(datapaths.gaia_alert_16ajo, gaia.GaiaAlert)
+        self.assertEqual(alert.text_params['Name'], alert.id)
+        self.assertTrue(alert.url_params['GSA'].endswith(alert.id))
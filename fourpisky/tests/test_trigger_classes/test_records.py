@@ -0,0 +1,85 @@
+import datetime
+from unittest import TestCase
+import numpy as np
+import pytz
+import voeventparse
+from fourpisky import filters
+from fourpisky.triggers import alert_types, records
+from fourpisky.tests.resources import datapaths
+
+packet_paths = [
+    datapaths.swift_bat_grb_pos_v2,
+    datapaths.swift_bat_grb_low_dec,
+    datapaths.swift_bat_grb_lost_lock,
+    datapaths.asassn_alert_16ab,
+    datapaths.gaia_alert_16ajo,
+]
+
+
+class TestAlertRecords(TestCase):
+    def setUp(self):
+        self.packets = []
+        for path in packet_paths:
+            with open(path, 'rb') as f:
+                self.packets.append(f.read())
+        self.alerts = [_load_alert(p) for p in self.packets]
+
+    def test_load(self):
+        not_an_alert = b'<?xml version="1.0"?><foo ivorn="ivo://x/y#z"/>'
+        recs = records.load_alert_records(
+            self.packets[:2] + [not_an_alert] + self.packets[2:],
+            chunksize=2)
+        self.assertEqual(recs.dtype, records.record_dtype)
+        self.assertEqual(len(recs), len(self.packets))
+        for rec, alert in zip(recs, self.alerts):
+            self.assertEqual(rec['ivorn'], alert.ivorn)
+            self.assertEqual(rec['id'], alert.id)
+            self.assertEqual(
+                pytz.utc.localize(rec['isotime'].astype(datetime.datetime)),
+                alert.isotime)
+            self.assertAlmostEqual(np.radians(rec['ra']), alert.position.ra)
+            self.assertAlmostEqual(np.radians(rec['dec']),
+                                   alert.position.dec)
+
+    def test_bad_packets_skipped(self):
+        swift_ivorn = self.alerts[0].ivorn.encode('utf-8')
+        truncated = self.packets[0][:len(self.packets[0]) // 2]
+        long_ivorn = self.packets[0].replace(
+            swift_ivorn, swift_ivorn + b'x' * 200)
+        recs = records.load_alert_records(
+            [b'not xml at all <<', truncated, long_ivorn]
+            + self.packets[1:])
+        self.assertEqual(list(recs['ivorn']),
+                         [alert.ivorn for alert in self.alerts[1:]])
+
+    def test_vectorised_checks(self):
+        recs = records.load_alert_records(self.packets)
+        alerts = self.alerts
+        self.assertEqual(list(records.reject(recs)),
+                         [alert.reject() is not None
+                          if hasattr(alert, 'reject') else False
+                          for alert in alerts])
+        for current_time in (datetime.datetime(2016, 1, 5, tzinfo=pytz.utc),
+                             datetime.datetime(2016, 4, 1, tzinfo=pytz.utc),
+                             None):
+            self.assertEqual(
+                list(records.is_recent(recs, current_time)),
+                [alert.is_recent() if current_time is None
+                 else _is_recent_at(alert, current_time)
+                 for alert in alerts])
+        self.assertEqual(
+            list(records.ami_reject(recs)),
+            [filters.ami.reject(alert.position,
+                                current_time=alert.isotime) is not None
+             for alert in alerts])
+
+
+def _load_alert(packet):
+    v = voeventparse.loads(packet)
+    return alert_types.matches(v)[0](v)
+
+
+def _is_recent_at(alert, current_time):
+    if not alert.alert_notification_period:
+        return True
+    return current_time - alert.isotime < alert.alert_notification_period
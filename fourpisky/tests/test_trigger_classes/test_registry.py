@@ -0,0 +1,54 @@
+from unittest import TestCase
+import voeventparse
+from fourpisky.triggers import (alert_classes, alert_types, asassn, gaia,
+                                swift, is_test_trigger)
+from fourpisky.triggers.registry import PrefixTrie, TriggerRegistry
+from fourpisky.tests.resources import datapaths
+
+
+class TestPrefixTrie(TestCase):
+    def test_values_matching(self):
+        trie = PrefixTrie()
+        trie.insert('ivo://a/b#', 1)
+        trie.insert('ivo://a/b#c', 2)
+        trie.insert('ivo://a/x#', 3)
+        self.assertEqual(trie.values_matching('ivo://a/b#cd'), [1, 2])
+        self.assertEqual(trie.values_matching('ivo://a/b#d'), [1])
+        self.assertEqual(trie.values_matching('ivo://a/'), [])
+        self.assertEqual(trie.values_matching(''), [])
+
+
+class TestTriggerRegistry(TestCase):
+    def test_registration_order(self):
+        registry = TriggerRegistry()
+        registry.register('ivo://a/b#c', 'specific')
+        registry.register(['ivo://a/b#', 'ivo://z/'], 'general')
+        registry.register('ivo://a/b#', 'specific')
+        self.assertEqual(registry.lookup('ivo://a/b#cd'),
+                         ['specific', 'general'])
+        self.assertEqual(registry.lookup('ivo://z/1'), ['general'])
+        self.assertEqual(registry.lookup('ivo://y/1'), [])
+
+    def test_alert_types(self):
+        packets = [
+            (datapaths.swift_bat_grb_pos_v2, swift.BatGrb),
+            (datapaths.asassn_alert_16ab, asassn.AsassnAlert),
+            (datapaths.gaia_alert_16ajo, gaia.GaiaAlert),
+        ]
+        for path, alert_class in packets:
+            with open(path, 'rb') as f:
+                v = voeventparse.load(f)
+            self.assertEqual(alert_types.matches(v), [alert_class])
+            self.assertTrue(alert_class.packet_type_matches(v))
+            self.assertFalse(is_test_trigger(v))
+
+    def test_handlers_match_alert_types(self):
+        from fourpisky.scripts.process_voevent import (alert_handlers,
+                                                       trigger_handlers)
+        self.assertEqual(set(alert_handlers), set(alert_classes))
+        for alert_class in alert_classes:
+            for prefix in alert_class.ivorn_prefixes:
+                ivorn = prefix + 'x'
+                self.assertEqual(alert_types.lookup(ivorn), [alert_class])
+                self.assertEqual(trigger_handlers.lookup(ivorn),
+                                 [alert_handlers[alert_class]])
@@ -1,7 +1,7 @@
 from __future__  import absolute_import
 from unittest import TestCase
 import voeventparse
-from fourpisky.utils import convert_voe_coords_to_eqposn
+from fourpisky.utils import convert_voe_coords_to_eqposn, sniff_voevent_header
 from fourpisky.tests.resources import datapaths
 from fourpisky.visibility import DEG_PER_RADIAN
 import ephem
@@ -19,3 +19,22 @@ class TestCoordConversion(TestCase):
         self.assertEqual(extracted_posn.dec, known_swift_grb_posn.dec)
 
 
+
+
+class TestSniffHeader(TestCase):
+    def test_sniffed_ivorn_matches_full_parse(self):
+        for path in (datapaths.swift_bat_grb_pos_v2,
+                     datapaths.asassn_alert_16ab,
+                     datapaths.gaia_alert_16ajo):
+            with open(path, 'rb') as f:
+                bytestring = f.read()
+            full = voeventparse.loads(bytestring)
+            for chunksize in (16, 1024):
+                header = sniff_voevent_header(bytestring, chunksize=chunksize)
+                self.assertEqual(header.attrib['ivorn'], full.attrib['ivorn'])
+                self.assertEqual(header.attrib['role'], full.attrib['role'])
+
+    def test_no_root_element(self):
+        self.assertIsNone(sniff_voevent_header(b''))
+        self.assertIsNone(
+            sniff_voevent_header(b'<?xml version="1.0" encoding="UTF-8"?>'))
@@ -1,14 +1,19 @@
 from __future__ import absolute_import
-import fourpisky.triggers.swift
-from fourpisky.voevent import ivorn_base, test_trigger_substream
+from fourpisky.triggers import asassn, gaia, swift
+from fourpisky.triggers.registry import TriggerRegistry
+from fourpisky.voevent import get_stream_ivorn_prefix, test_trigger_substream
 
+test_trigger_ivorn_prefix = get_stream_ivorn_prefix(test_trigger_substream)
 
+#: All the alert-types we know how to handle.
+alert_classes = (swift.BatGrb, asassn.AsassnAlert, gaia.GaiaAlert)
 
-def is_test_trigger(voevent):
-    ivorn  = voevent.attrib['ivorn']
-    if ivorn.startswith("ivo://"+ ivorn_base+'/'+test_trigger_substream+'#'):
-        return True
-    return False
-
+#: The same, indexed by IVORN prefix.
+alert_types = TriggerRegistry()
+for _alert_class in alert_classes:
+    alert_types.register_alert_type(_alert_class)
 
 
+def is_test_trigger(voevent):
+    ivorn = voevent.attrib['ivorn']
+    return ivorn.startswith(test_trigger_ivorn_prefix)
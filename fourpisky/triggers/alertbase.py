@@ -1,12 +1,51 @@
 import voeventparse
-from fourpisky.utils import convert_voe_coords_to_eqposn
+from fourpisky.utils import convert_voe_coords_to_eqposn, utcnow
 from collections import OrderedDict
-import datetime
-import pytz
 from fourpisky.requiredatts import RequiredAttributesMetaclass
 
+
+class cached_property(object):
+    """
+    Like ``property``, but computed once on first access, then memoised.
+
+    The value is stored in the instance attribute named after the property
+    with a leading underscore - declare this in the class ``__slots__``.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.slot = '_' + func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.func(obj)
+            setattr(obj, self.slot, value)
+            return value
+
+
+def get_param_value(voevent, group_name, param_name):
+    """
+    Fetch a single 'What' param value, without parsing the other params.
+
+    Returns None if the param is not present.
+    """
+    param = voevent.find(
+        "What/Group[@name='{}']/Param[@name='{}']".format(group_name,
+                                                         param_name))
+    if param is None:
+        return None
+    return param.attrib.get('value')
+
+
 class AlertBase(object):
     __metaclass__ = RequiredAttributesMetaclass
+    __slots__ = ('voevent', 'ivorn', 'alert_notification_period',
+                 '_isotime', '_position')
     _required_attributes = [
         'alert_notification_period',
         'id',
@@ -17,6 +56,14 @@ class AlertBase(object):
         'type_description',
     ]
 
+    #: IVORN prefixes of the packets this alert-type handles.
+    ivorn_prefixes = ()
+
+    @classmethod
+    def packet_type_matches(cls, voevent):
+        ivorn = voevent.attrib['ivorn']
+        return ivorn.startswith(tuple(cls.ivorn_prefixes))
+
     @property
     def full_name(self):
         name = self.id
@@ -24,11 +71,19 @@ class AlertBase(object):
             name+= ' / ' + self.inferred_name
         return name
 
+    @cached_property
+    def isotime(self):
+        return voeventparse.get_event_time_as_utc(self.voevent)
+
+    @cached_property
+    def position(self):
+        return convert_voe_coords_to_eqposn(
+            voeventparse.get_event_position(self.voevent))
 
     def is_recent(self):
         if not self.alert_notification_period:
             return True
-        now = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+        now = utcnow()
         if (now - self.isotime) < self.alert_notification_period:
             return True
-        return False
\ No newline at end of file
+        return False
@@ -2,9 +2,9 @@ import voeventparse
 from collections import OrderedDict
 import datetime
 import pytz
-from fourpisky.utils import convert_voe_coords_to_eqposn
 from fourpisky.feeds.asassn import AsassnFeed, AsassnKeys
-from fourpisky.triggers.alertbase import AlertBase
+from fourpisky.triggers.alertbase import (AlertBase, cached_property,
+                                         get_param_value)
 
 default_alert_notification_period = datetime.timedelta(days=4)
 
@@ -12,12 +12,9 @@ default_alert_notification_period = datetime.timedelta(days=4)
 class AsassnAlert(AlertBase):
     type_description = "ASASSN alert"
 
-    @staticmethod
-    def packet_type_matches(voevent):
-        ivorn = voevent.attrib['ivorn']
-        if ivorn.startswith(AsassnFeed.stream_ivorn_prefix):
-            return True
-        return False
+    ivorn_prefixes = (AsassnFeed.stream_ivorn_prefix,)
+    __slots__ = ('_group_params', '_text_params', '_url_params', '_id',
+                 '_inferred_name')
 
     def __init__(self, voevent,
                  alert_notification_period=None):
@@ -31,24 +28,35 @@ class AsassnAlert(AlertBase):
             raise ValueError(
                 "Cannot instantiate AsassnAlert; packet header mismatch.")
 
-        group_params = voeventparse.get_grouped_params(self.voevent)
+    @cached_property
+    def group_params(self):
+        return voeventparse.get_grouped_params(self.voevent)
 
-        text_params_grp = group_params[AsassnFeed.text_params_groupname]
-        self.text_params = OrderedDict(
+    @cached_property
+    def text_params(self):
+        text_params_grp = self.group_params[AsassnFeed.text_params_groupname]
+        return OrderedDict(
             (k, d['value']) for k, d in text_params_grp.items())
 
-        url_params_grp = group_params[AsassnFeed.url_params_groupname]
-        self.url_params = OrderedDict(
+    @cached_property
+    def url_params(self):
+        url_params_grp = self.group_params[AsassnFeed.url_params_groupname]
+        return OrderedDict(
             (k, d['value']) for k, d in url_params_grp.items())
 
-        self.id = self.text_params.get(AsassnKeys.id_asassn)
-        if self.id is None:
-            self.id = self.text_params.get(AsassnKeys.id_other)
-        # Assigned name according to the 'why' section of voevent packet:
-        self.inferred_name = 'ASASSN @ '+self.text_params.get(AsassnKeys.detection_timestamp)
-        self.isotime = voeventparse.get_event_time_as_utc(self.voevent)
-
-        self.position = convert_voe_coords_to_eqposn(
-            voeventparse.get_event_position(self.voevent))
+    @cached_property
+    def id(self):
+        alert_id = self._text_param_value(AsassnKeys.id_asassn)
+        if alert_id is None:
+            alert_id = self._text_param_value(AsassnKeys.id_other)
+        return alert_id
 
+    @cached_property
+    def inferred_name(self):
+        # Assigned name according to the 'why' section of voevent packet:
+        return 'ASASSN @ ' + self._text_param_value(
+            AsassnKeys.detection_timestamp)
 
+    def _text_param_value(self, name):
+        return get_param_value(self.voevent,
+                               AsassnFeed.text_params_groupname, name)
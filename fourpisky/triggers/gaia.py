@@ -1,9 +1,9 @@
 from collections import OrderedDict
 import datetime
 import voeventparse
-from fourpisky.utils import convert_voe_coords_to_eqposn
 from fourpisky.feeds.gaia import GaiaFeed
-from fourpisky.triggers.alertbase import AlertBase
+from fourpisky.triggers.alertbase import (AlertBase, cached_property,
+                                         get_param_value)
 
 
 default_alert_notification_period = datetime.timedelta(days=7)
@@ -11,12 +11,9 @@ default_alert_notification_period = datetime.timedelta(days=7)
 class GaiaAlert(AlertBase):
     type_description = "GAIA alert"
 
-    @staticmethod
-    def packet_type_matches(voevent):
-        ivorn = voevent.attrib['ivorn']
-        if ivorn.startswith(GaiaFeed.stream_ivorn_prefix):
-            return True
-        return False
+    ivorn_prefixes = (GaiaFeed.stream_ivorn_prefix,)
+    __slots__ = ('_text_params', '_id', '_url_params')
+    inferred_name = False
 
     def __init__(self, voevent,
                  alert_notification_period=None):
@@ -30,17 +27,18 @@ class GaiaAlert(AlertBase):
             raise ValueError(
                 "Cannot instantiate GaiaAlert; packet header mismatch.")
 
+    @cached_property
+    def text_params(self):
         group_params = voeventparse.get_grouped_params(self.voevent)
         text_params_grp = group_params[GaiaFeed.text_params_groupname]
-        self.text_params = OrderedDict(
+        return OrderedDict(
             (k, d['value']) for k, d in text_params_grp.items())
 
-        self.id = self.text_params.get('Name')
-        self.inferred_name = False
+    @cached_property
+    def id(self):
+        return get_param_value(self.voevent,
+                               GaiaFeed.text_params_groupname, 'Name')
 
-        self.isotime = voeventparse.get_event_time_as_utc(self.voevent)
-        self.position = convert_voe_coords_to_eqposn(
-            voeventparse.get_event_position(self.voevent))
-
-        self.url_params = {
-            'GSA':'http://gsaweb.ast.cam.ac.uk/alerts/alert/'+self.id}
+    @cached_property
+    def url_params(self):
+        return {'GSA': 'http://gsaweb.ast.cam.ac.uk/alerts/alert/' + self.id}
@@ -0,0 +1,175 @@
+"""
+Compact, array-backed alert records, for bulk analysis of archived alerts.
+
+The :class:`.AlertBase` classes hold the full (objectified) packet, which
+is fine for handling alerts one at a time but far too memory-hungry for
+months of archive. Here we extract just the fields used by the trigger
+logic, one packet at a time, into a NumPy structured array (see
+:data:`record_dtype`) - then the rejection checks run over the whole batch
+at once.
+"""
+from __future__ import absolute_import
+import datetime
+import logging
+
+import numpy as np
+import pytz
+import voeventparse
+from lxml import etree
+
+from fourpisky.filters import ami
+from fourpisky.triggers import alert_classes, alert_types
+from fourpisky.utils import sniff_voevent_header, utcnow
+
+logger = logging.getLogger(__name__)
+
+#: Boolean fields of :data:`record_dtype`, each filled from the alert method
+#: of the same name (False where an alert-type has no such method).
+flag_fields = ('startracker_lost',)
+
+#: Fields:
+#:
+#: - ``alert_type``: Index into :data:`fourpisky.triggers.alert_classes`.
+#: - ``isotime``: UTC event time.
+#: - ``ra``, ``dec``, ``err``: Event position and error-radius (degrees).
+#: - ``notification_period``: As for ``AlertBase.alert_notification_period``;
+#:   zero if alerts never go stale.
+#: - plus the :data:`flag_fields`.
+record_dtype = np.dtype([
+    ('ivorn', 'U128'),
+    ('id', 'U32'),
+    ('alert_type', 'i1'),
+    ('isotime', 'datetime64[us]'),
+    ('ra', 'f8'),
+    ('dec', 'f8'),
+    ('err', 'f8'),
+    ('notification_period', 'timedelta64[s]'),
+] + [(flag, '?') for flag in flag_fields])
+
+
+def _check_length(field, value):
+    # NumPy silently truncates over-long strings assigned to a 'U' field.
+    max_length = record_dtype[field].itemsize // np.dtype('U1').itemsize
+    if len(value) > max_length:
+        raise ValueError("{} too long for record field ({} > {} chars): "
+                         "{}".format(field, len(value), max_length, value))
+    return value
+
+
+def alert_record(alert):
+    """
+    Extract the record fields from an :class:`.AlertBase` instance.
+
+    Returns:
+        tuple: Field values, in :data:`record_dtype` order.
+    Raises:
+        ValueError: If the IVORN or ID are too long for their fields.
+    """
+    posn = voeventparse.get_event_position(alert.voevent)
+    period = alert.alert_notification_period or datetime.timedelta(0)
+    flags = []
+    for flag in flag_fields:
+        method = getattr(alert, flag, None)
+        flags.append(bool(method()) if method is not None else False)
+    return (_check_length('ivorn', alert.ivorn),
+            _check_length('id', alert.id),
+            alert_classes.index(type(alert)),
+            np.datetime64(alert.isotime.astimezone(pytz.utc)
+                          .replace(tzinfo=None), 'us'),
+            posn.ra,
+            posn.dec,
+            posn.err,
+            np.timedelta64(int(period.total_seconds()), 's'),
+            ) + tuple(flags)
+
+
+def iter_alert_records(packets):
+    """
+    Generate alert records from an iterable of raw VOEvent packets (bytes).
+
+    Packets which aren't a known alert-type are skipped (cheaply - only
+    the header is parsed), as are those which aren't well-formed, can't be
+    loaded, or whose record can't be extracted (logged). Each packet tree is discarded once
+    its record is extracted.
+    """
+    for packet in packets:
+        try:
+            header = sniff_voevent_header(packet)
+        except etree.XMLSyntaxError:
+            logger.warning("Skipping malformed packet: {!r}".format(
+                packet[:80]), exc_info=True)
+            continue
+        if header is None:
+            continue
+        classes = alert_types.lookup(header.attrib.get('ivorn', ''))
+        if not classes:
+            continue
+        try:
+            record = alert_record(classes[0](voeventparse.loads(packet)))
+        except Exception:
+            logger.exception("Could not extract record for {}".format(
+                header.attrib['ivorn']))
+            continue
+        yield record
+
+
+def load_alert_records(packets, chunksize=4096):
+    """
+    Build a record array (:data:`record_dtype`) from raw VOEvent packets.
+
+    Records are accumulated in fixed-size chunks, so only `chunksize`
+    records plus a single packet need be held in memory besides the
+    output array.
+    """
+    chunks = []
+    chunk = np.empty(chunksize, dtype=record_dtype)
+    n_filled = 0
+    for record in iter_alert_records(packets):
+        chunk[n_filled] = record
+        n_filled += 1
+        if n_filled == chunksize:
+            chunks.append(chunk)
+            chunk = np.empty(chunksize, dtype=record_dtype)
+            n_filled = 0
+    chunks.append(chunk[:n_filled])
+    return np.concatenate(chunks)
+
+
+def reject(records):
+    """
+    Vectorised ``AlertBase.reject``.
+
+    Returns:
+        numpy.ndarray: Boolean mask, True where an alert is rejected.
+    """
+    return records['startracker_lost'].copy()
+
+
+def is_recent(records, current_time=None):
+    """
+    Vectorised ``AlertBase.is_recent``.
+
+    Args:
+        current_time (datetime.datetime): Timezone-aware, default now.
+    Returns:
+        numpy.ndarray: Boolean mask, True where an alert is recent.
+    """
+    if current_time is None:
+        current_time = utcnow()
+    now = np.datetime64(current_time.astimezone(pytz.utc)
+                        .replace(tzinfo=None), 'us')
+    period = records['notification_period']
+    return (period == np.timedelta64(0, 's')) | (
+        (now - records['isotime']) < period)
+
+
+def ami_reject(records):
+    """
+    Vectorised ``filters.ami.reject``, evaluated at the time of each alert.
+
+    Returns:
+        numpy.ndarray: Boolean mask, True where an alert is rejected.
+    """
+    return ami.reject_many(np.radians(records['ra']),
+                           np.radians(records['dec']),
+                           records['isotime'])
@@ -0,0 +1,94 @@
+"""
+IVORN-prefix based dispatch of VOEvent packets to handlers.
+"""
+from __future__ import absolute_import
+
+_values_key = None  # Never a valid character, so can't clash with a child
+
+
+class PrefixTrie(object):
+    """
+    A character-trie mapping string-prefixes to values.
+
+    Looking up all the prefixes of a given string costs time proportional
+    to the length of the (longest) matching prefix, regardless of how many
+    prefixes are stored.
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix, value):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(_values_key, []).append(value)
+
+    def values_matching(self, string):
+        """
+        Returns a list of values for every stored prefix of `string`.
+        """
+        node = self._root
+        values = list(node.get(_values_key, ()))
+        for char in string:
+            node = node.get(char)
+            if node is None:
+                break
+            values.extend(node.get(_values_key, ()))
+        return values
+
+
+class TriggerRegistry(object):
+    """
+    Maps IVORN prefixes to handlers (functions, alert-classes, etc).
+
+    A packet is dispatched to every handler registered under a prefix of
+    its IVORN, in order of registration.
+    """
+
+    def __init__(self):
+        self._trie = PrefixTrie()
+        self._n_registered = 0
+
+    def register(self, prefixes, handler):
+        """
+        Args:
+            prefixes (str or list): IVORN prefix(es) to match.
+            handler: Value returned by lookups for matching IVORNs.
+        """
+        if isinstance(prefixes, str):
+            prefixes = [prefixes]
+        for prefix in prefixes:
+            self._trie.insert(prefix, (self._n_registered, handler))
+        self._n_registered += 1
+
+    def register_alert_type(self, alert_class, handler=None):
+        """
+        Register under the prefixes declared by an `AlertBase` subclass.
+
+        If no handler is given, the class itself is registered.
+        """
+        if handler is None:
+            handler = alert_class
+        self.register(alert_class.ivorn_prefixes, handler)
+
+    def lookup(self, ivorn):
+        """
+        Returns a list of the handlers matching `ivorn`.
+        """
+        matches = self._trie.values_matching(ivorn)
+        if len(matches) < 2:
+            return [handler for _, handler in matches]
+        # Restore registration order, and drop duplicates (a handler
+        # registered under nested prefixes):
+        handlers = []
+        for _, handler in sorted(matches, key=lambda m: m[0]):
+            if handler not in handlers:
+                handlers.append(handler)
+        return handlers
+
+    def matches(self, voevent):
+        """
+        Returns a list of the handlers matching `voevent`'s IVORN.
+        """
+        return self.lookup(voevent.attrib['ivorn'])
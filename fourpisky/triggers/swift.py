@@ -1,6 +1,6 @@
 import voeventparse
-from fourpisky.utils import convert_voe_coords_to_eqposn
-from fourpisky.triggers.alertbase import AlertBase
+from fourpisky.triggers.alertbase import (AlertBase, cached_property,
+                                         get_param_value)
 
 def _swift_bool(bstring):
     """
@@ -16,12 +16,8 @@ def _swift_bool(bstring):
 
 class BatGrb(AlertBase):
     type_description = "Swift BAT GRB - initial position"
-    @staticmethod
-    def packet_type_matches(voevent):
-        ivorn = voevent.attrib['ivorn']
-        if ivorn.startswith("ivo://nasa.gsfc.gcn/SWIFT#BAT_GRB_Pos"):
-            return True
-        return False
+    ivorn_prefixes = ("ivo://nasa.gsfc.gcn/SWIFT#BAT_GRB_Pos",)
+    __slots__ = ('_ids', '_inferred_name', '_group_params')
 
 
     def __init__(self, voevent):
@@ -29,23 +25,34 @@ class BatGrb(AlertBase):
         self.ivorn = self.voevent.attrib['ivorn']
         if not BatGrb.packet_type_matches(voevent):
             raise ValueError("Cannot instantiate AsassnAlert; packet header mismatch.")
+        self.alert_notification_period = False
 
+    @cached_property
+    def ids(self):
         id_long_short = self._pull_swift_bat_id()
-        self.id_long = 'SWIFT_' + id_long_short[0]
-        self.id = 'SWIFT_' + id_long_short[1]
+        return 'SWIFT_' + id_long_short[0], 'SWIFT_' + id_long_short[1]
+
+    @property
+    def id_long(self):
+        return self.ids[0]
+
+    @property
+    def id(self):
+        return self.ids[1]
+
+    @cached_property
+    def inferred_name(self):
         #Assigned name according to the 'why' section of voevent packet:
-        self.inferred_name = self.voevent.Why.Inference.Name
-        self.isotime = voeventparse.get_event_time_as_utc(self.voevent)
-        self.group_params = voeventparse.get_grouped_params(self.voevent)
-        self.position = convert_voe_coords_to_eqposn(
-                                       voeventparse.get_event_position(self.voevent))
-        self.alert_notification_period = False
+        return self.voevent.Why.Inference.Name
+
+    @cached_property
+    def group_params(self):
+        return voeventparse.get_grouped_params(self.voevent)
 
     def reject(self):
         """
         Returns None if all ok, otherwise returns 'reason for rejection' string.
         """
-        pars = self.group_params
         if self.startracker_lost():
             return "Alert occurred while Swift star-tracker had lost lock."
 
@@ -57,24 +64,24 @@ class BatGrb(AlertBase):
         #                 See packet for further details."""
         return None
 
-    def startracker_lost(self):
+    def _flag(self, group_name, param_name):
         return _swift_bool(
-                       self.group_params["Misc_Flags"]["ImTrig_during_ST_LoL"]['value'])
+            get_param_value(self.voevent, group_name, param_name))
+
+    def startracker_lost(self):
+        return self._flag("Misc_Flags", "ImTrig_during_ST_LoL")
 
 
     def grb_identified(self):
-        return _swift_bool(
-            self.group_params["Solution_Status"]['GRB_Identified']['value'])
+        return self._flag("Solution_Status", "GRB_Identified")
 
 
     def tgt_in_ground_cat(self):
-        return _swift_bool(
-            self.group_params["Solution_Status"]['Target_in_Gnd_Catalog']['value'])
+        return self._flag("Solution_Status", "Target_in_Gnd_Catalog")
 
 
     def tgt_in_flight_cat(self):
-        return _swift_bool(
-            self.group_params["Solution_Status"]['Target_in_Flt_Catalog']['value'])
+        return self._flag("Solution_Status", "Target_in_Flt_Catalog")
 
 
     def _pull_swift_bat_id(self):
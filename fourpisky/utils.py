@@ -1,16 +1,22 @@
 """
 Misc. convenience routines.
 """
+import contextlib
+import datetime
 import os
 import string
 from collections import Sequence
 from ephem import Equatorial, J2000
 from fourpisky.visibility import DEG_PER_RADIAN
 import voeventparse
+from lxml import etree
 import logging
+import pytz
 
 logger = logging.getLogger(__name__)
 
+_pinned_utcnow = None
+
 
 def listify(x):
     """
@@ -80,4 +86,56 @@ def archive_voevent_to_file(v, rootdir):
         voeventparse.dump(v, f)
     logger.debug("Wrote voevent {} to {}".format(
         v.attrib['ivorn'], fullpath
-    ))
\ No newline at end of file
+    ))
+
+
+def sniff_voevent_header(bytestring, chunksize=1024):
+    """
+    Cheaply extract the root element of a VOEvent packet.
+
+    Only the leading chunk(s) of the packet are parsed, up to the opening
+    tag of the root element - so the returned element has its attributes
+    (``ivorn``, ``role``, etc) but no children. This is enough for
+    ``packet_type_matches``-style checks, without the cost of loading the
+    full objectified tree.
+
+    Returns:
+        lxml.etree._Element: The (childless) root element, or None if no
+        start-tag was found.
+    Raises:
+        lxml.etree.XMLSyntaxError: If the header is not well-formed.
+    """
+    parser = etree.XMLPullParser(events=('start',))
+    for offset in range(0, len(bytestring), chunksize):
+        parser.feed(bytestring[offset:offset + chunksize])
+        for _, element in parser.read_events():
+            return element
+    return None
+
+
+def utcnow():
+    """
+    The current (timezone-aware) time, as seen by the trigger logic.
+
+    This is the wall-clock time, unless pinned by :func:`pinned_utcnow`.
+    """
+    if _pinned_utcnow is not None:
+        return _pinned_utcnow
+    return datetime.datetime.now(pytz.utc)
+
+
+@contextlib.contextmanager
+def pinned_utcnow(dtime):
+    """
+    Pin :func:`utcnow` to `dtime` (naive times are taken as UTC) for the
+    duration of the block - e.g. to process an archived packet as at its
+    author-time.
+    """
+    global _pinned_utcnow
+    if dtime.tzinfo is None:
+        dtime = pytz.utc.localize(dtime)
+    previous, _pinned_utcnow = _pinned_utcnow, dtime
+    try:
+        yield dtime
+    finally:
+        _pinned_utcnow = previous
@@ -0,0 +1,178 @@
+"""
+Vectorised target visibility, for many targets at many sites at once.
+
+A closed-form (hour-angle) counterpart to :func:`fourpisky.visibility.get_ephem`,
+for use when planning / bulk-reporting over many positions, where looping
+over the pyephem solvers is too slow. Positions are precessed from J2000 to
+the epoch of date and altitudes corrected for refraction, but nutation and
+aberration are neglected - results agree with pyephem to a few hundredths of
+a degree in position, and better than a minute in event times (except for
+targets which only just clear the horizon, where rise / set times are
+ill-conditioned).
+
+NB pyephem's circumpolar flag allows for ~34' of refraction regardless of
+the observer's horizon, so pyephem may classify targets which dip just
+below an elevated horizon as 'always' up; here they are 'sometimes'.
+"""
+from __future__ import absolute_import
+from collections import namedtuple
+import datetime
+import math
+
+import numpy as np
+import pytz
+
+from fourpisky.visibility import DEG_PER_RADIAN
+
+#: Sidereal days per solar day
+SIDEREAL_RATE = 1.00273790935
+SECONDS_PER_SIDEREAL_DAY = 86400. / SIDEREAL_RATE
+_radians_per_second = 2 * math.pi / SECONDS_PER_SIDEREAL_DAY
+_arcsec = math.pi / (180. * 3600.)
+_j2000 = datetime.datetime(2000, 1, 1, 12, tzinfo=pytz.utc)
+
+# Values of `SiteVisibility.type`, c.f. `TargetStatusKeys.type`:
+NEVER = 0
+SOMETIMES = 1
+ALWAYS = 2
+type_labels = ('never', 'sometimes', 'always')
+
+SiteVisibility = namedtuple('SiteVisibility', [
+    'lst',
+    'alt',
+    'az',
+    'type',
+    'visible_now',
+    'prev_transit',
+    'next_transit',
+    'next_rise',
+    'next_set',
+])
+SiteVisibility.__doc__ = """
+Visibility of an array of targets from a single site.
+
+Angles are in degrees. Event times are in seconds relative to the
+`current_time` passed to :func:`compute_visibility`, and are NaN for
+events which don't occur (rise / set of 'always' and 'never' targets,
+transits of 'never' targets).
+"""
+
+
+def _days_since_j2000(dtime):
+    return (dtime - _j2000).total_seconds() / 86400.
+
+
+def greenwich_mean_sidereal_time(dtime):
+    """
+    GMST (radians) at a timezone-aware datetime.
+    """
+    gmst_hours = 18.697374558 + 24.06570982441908 * _days_since_j2000(dtime)
+    return (gmst_hours % 24.) * math.pi / 12.
+
+
+def precess_from_j2000(ra, dec, dtime):
+    """
+    Precess J2000 positions (radians) to the mean equator of `dtime`.
+
+    Uses the IAU 1976 precession angles.
+    """
+    t = _days_since_j2000(dtime) / 36525.
+    zeta = (2306.2181 * t + 0.30188 * t ** 2 + 0.017998 * t ** 3) * _arcsec
+    z = (2306.2181 * t + 1.09468 * t ** 2 + 0.018203 * t ** 3) * _arcsec
+    theta = (2004.3109 * t - 0.42665 * t ** 2 - 0.041833 * t ** 3) * _arcsec
+    cos_dec = np.cos(dec)
+    a = cos_dec * np.sin(ra + zeta)
+    b = (math.cos(theta) * cos_dec * np.cos(ra + zeta)
+         - math.sin(theta) * np.sin(dec))
+    c = (math.sin(theta) * cos_dec * np.cos(ra + zeta)
+         + math.cos(theta) * np.sin(dec))
+    return (np.arctan2(a, b) + z) % (2 * math.pi), np.arcsin(c)
+
+
+def refraction(alt, pressure=1010., temp=15., apparent=False):
+    """
+    Atmospheric refraction (radians) at altitude `alt` (radians).
+
+    By default `alt` is the true (unrefracted) altitude, and we use
+    Saemundsson's formula. If `apparent` is True, `alt` is the apparent
+    altitude (e.g. a horizon), and we use Bennett's formula.
+    Scaled for pressure (mBar) / temperature (C); zero when ``pressure`` is
+    zero, as for pyephem. (Below the horizon we simply hold the value at
+    -1 degree; pyephem's extrapolation differs.)
+    """
+    alt_deg = np.maximum(np.asarray(alt) * DEG_PER_RADIAN, -1.)
+    if apparent:
+        arcmin = 1. / np.tan((alt_deg + 7.31 / (alt_deg + 4.4))
+                             / DEG_PER_RADIAN)
+    else:
+        arcmin = 1.02 / np.tan((alt_deg + 10.3 / (alt_deg + 5.11))
+                               / DEG_PER_RADIAN)
+    arcmin *= (pressure / 1010.) * (283. / (273. + temp))
+    return arcmin / (60. * DEG_PER_RADIAN)
+
+
+def compute_visibility(ra, dec, sites, current_time):
+    """
+    Get visibility of many targets from many sites.
+
+    Args:
+        ra, dec: J2000 positions (radians), array-like.
+        sites (list): :class:`ephem.Observer` instances. Only the location,
+            horizon, pressure and temperature are used.
+        current_time (datetime.datetime): Timezone-aware time of evaluation.
+    Returns:
+        list: A :class:`.SiteVisibility` for each site.
+    """
+    ra, dec = precess_from_j2000(np.asarray(ra, dtype=float),
+                                 np.asarray(dec, dtype=float), current_time)
+    gmst = greenwich_mean_sidereal_time(current_time)
+    return [_site_visibility(ra, dec, site, gmst) for site in sites]
+
+
+def _site_visibility(ra, dec, site, gmst):
+    lat = float(site.lat)
+    horizon = float(site.horizon)
+    lst = (gmst + float(site.lon)) % (2 * math.pi)
+    hour_angle = lst - ra
+
+    sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+    sin_dec, cos_dec = np.sin(dec), np.cos(dec)
+    true_alt = np.arcsin(sin_lat * sin_dec
+                         + cos_lat * cos_dec * np.cos(hour_angle))
+    alt = true_alt + refraction(true_alt, site.pressure, site.temp)
+    az = np.arctan2(-cos_dec * np.sin(hour_angle),
+                    sin_dec * cos_lat - cos_dec * np.cos(hour_angle) * sin_lat)
+
+    # Rise / set where the *refracted* altitude crosses the horizon:
+    horizon_true_alt = horizon - float(
+        refraction(horizon, site.pressure, site.temp, apparent=True))
+    max_alt = math.pi / 2 - np.abs(lat - dec)
+    min_alt = np.abs(lat + dec) - math.pi / 2
+    vis_type = np.full(dec.shape, SOMETIMES, dtype=int)
+    vis_type[min_alt > horizon_true_alt] = ALWAYS
+    vis_type[max_alt < horizon_true_alt] = NEVER
+
+    with np.errstate(invalid='ignore'):
+        cos_h0 = ((math.sin(horizon_true_alt) - sin_lat * sin_dec)
+                  / (cos_lat * cos_dec))
+        h0_secs = np.arccos(np.clip(cos_h0, -1., 1.)) / _radians_per_second
+    period = SECONDS_PER_SIDEREAL_DAY
+    next_transit = np.mod(-hour_angle / _radians_per_second, period)
+    next_rise = np.mod(next_transit - h0_secs, period)
+    next_set = np.mod(next_transit + h0_secs, period)
+
+    next_transit[vis_type == NEVER] = np.nan
+    next_rise[vis_type != SOMETIMES] = np.nan
+    next_set[vis_type != SOMETIMES] = np.nan
+
+    return SiteVisibility(
+        lst=lst * DEG_PER_RADIAN,
+        alt=alt * DEG_PER_RADIAN,
+        az=np.mod(az, 2 * math.pi) * DEG_PER_RADIAN,
+        type=vis_type,
+        visible_now=alt > horizon,
+        prev_transit=next_transit - period,
+        next_transit=next_transit,
+        next_rise=next_rise,
+        next_set=next_set,
+    )
@@ -2,9 +2,11 @@
 Commonly used routines for determining target ephemeris and visibilities.
 """
 from __future__ import absolute_import
+import datetime
 import ephem
 import math
 import pytz
+import threading
 from collections import OrderedDict
 DEG_PER_RADIAN = 180 / math.pi
 
@@ -25,20 +27,154 @@ class TargetStatusKeys():
     timeline = 'timeline'
 
 
-def get_ephem(eq_posn, observer, current_time):
+_event_types = ('rising', 'transit', 'setting')
+_epoch = datetime.datetime(2000, 1, 1, tzinfo=pytz.utc)
+
+
+class EphemCache(object):
+    """
+    LRU cache of solved rising / transit / setting times.
+
+    Entries are keyed by site, position (rounded to `position_decimals`
+    degrees) and a `time_bucket`-wide time interval. For each event-type we
+    store the last event before the bucket starts and the next two after,
+    which is enough to pick out the previous / next events for any time
+    within the bucket. Repeated or nearby alerts can then skip the
+    iterative solvers.
+
+    The default rounding of 0.01 degrees shifts event times by at most a
+    few seconds.
+    """
+
+    def __init__(self, maxsize=1024, time_bucket=datetime.timedelta(hours=1),
+                 position_decimals=2):
+        assert time_bucket < datetime.timedelta(hours=23)
+        self.maxsize = maxsize
+        self.time_bucket = time_bucket
+        self.position_decimals = position_decimals
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _bucket_start(self, current_time):
+        bucket_secs = self.time_bucket.total_seconds()
+        offset = (current_time - _epoch).total_seconds() % bucket_secs
+        return current_time - datetime.timedelta(seconds=offset)
+
+    def _key(self, fixedbody, observer, bucket_start):
+        site = (float(observer.lat), float(observer.lon),
+                observer.elevation, float(observer.horizon),
+                observer.pressure, observer.temp)
+        posn = (round(fixedbody._ra * DEG_PER_RADIAN, self.position_decimals),
+                round(fixedbody._dec * DEG_PER_RADIAN,
+                      self.position_decimals),
+                float(fixedbody._epoch))
+        return site, posn, fixedbody.circumpolar, bucket_start
+
+    def get_events(self, fixedbody, observer, current_time, event_types):
+        """
+        Returns the events bracketing `current_time`, as for
+        :func:`_select_events`.
+        """
+        bucket_start = self._bucket_start(current_time)
+        key = self._key(fixedbody, observer, bucket_start)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            entry = _solve_event_times(fixedbody, observer, bucket_start,
+                                       _event_types, n_next=2,
+                                       circumpolar=fixedbody.circumpolar)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return _select_events(entry, current_time, event_types)
+
+
+def _fixed_body(eq_posn):
+    fixedbody = ephem.FixedBody()
+    fixedbody._ra = eq_posn.ra
+    fixedbody._dec = eq_posn.dec
+    fixedbody._epoch = eq_posn.epoch
+    return fixedbody
+
+
+def _solve_event_times(fixedbody, observer, start, event_types, n_next,
+                       circumpolar):
+    """
+    For each event-type, find the last event before `start`, and the next
+    `n_next` events after it. (Also records the position at transit.)
+
+    NB uses ``observer``, and leaves its date modified.
+    """
+    times = {}
+    for event_type in event_types:
+        if circumpolar and event_type != 'transit':
+            continue
+        observer.date = start
+        event_times = [getattr(observer, 'previous_' + event_type)(fixedbody)]
+        for _ in range(n_next):
+            next_time = getattr(observer, 'next_' + event_type)(fixedbody)
+            event_times.append(next_time)
+            observer.date = next_time + ephem.minute
+        times[event_type] = [pytz.utc.localize(ephem.Date(t).datetime())
+                             for t in event_times]
+    # Altitude / azimuth at transit are the same each day:
+    observer.date = times['transit'][1]
+    fixedbody.compute(observer)
+    transit_pos = (fixedbody.alt * DEG_PER_RADIAN,
+                   fixedbody.az * DEG_PER_RADIAN)
+    return times, transit_pos
+
+
+def _select_events(entry, current_time, event_types):
+    """
+    Pick out the events immediately before / after `current_time`.
+
+    Returns:
+        tuple: (dict mapping e.g. 'next_transit' to datetime, transit_pos)
+    """
+    times, transit_pos = entry
+    events = {}
+    for event_type in event_types:
+        event_times = times[event_type]
+        events['previous_' + event_type] = max(
+            t for t in event_times if t <= current_time)
+        events['next_' + event_type] = min(
+            t for t in event_times if t > current_time)
+    return events, transit_pos
+
+
+ephem_cache = EphemCache()
+
+
+def get_ephem(eq_posn, observer, current_time, cache=ephem_cache):
     """Get basic information on target visibility for a given site.
 
     Returns a dict populated with relevant TargetStatusKeys.
+
+    Rise / transit / set times are looked up in `cache` (an
+    :class:`.EphemCache`) where possible; pass ``cache=None`` to always
+    solve for them afresh.
     """
     keys = TargetStatusKeys
     assert isinstance(observer, ephem.Observer)
     # Get times:
 
     observer.date = current_time
-    fixedbody = ephem.FixedBody()
-    fixedbody._ra = eq_posn.ra
-    fixedbody._dec = eq_posn.dec
-    fixedbody._epoch = eq_posn.epoch
+    fixedbody = _fixed_body(eq_posn)
     fixedbody.compute(observer)
 
     result = {}
@@ -51,41 +187,37 @@ def get_ephem(eq_posn, observer, current_time):
         result[keys.type] = 'never'
         return result
 
-    result[keys.next_transit_time] = pytz.utc.localize(
-        observer.next_transit(fixedbody).datetime())
-    result[keys.prev_transit_time] = pytz.utc.localize(
-        observer.previous_transit(fixedbody).datetime())
-
     if fixedbody.circumpolar:
         # Circumpolar
         result[keys.type] = 'always'
-        events = ['previous_transit','next_transit' ]
+        event_types = ['transit']
     else:
         # Regular rise and set
         result[keys.type] = 'sometimes'
-        events = [
-            'previous_rising', 'previous_transit', 'previous_setting',
-            'next_rising', 'next_transit', 'next_setting',
-        ]
-    # Returns timezone unaware ('naive') datetimes
+        event_types = _event_types
+
+    if cache is not None:
+        events, transit_pos = cache.get_events(fixedbody, observer,
+                                               current_time, event_types)
+    else:
+        entry = _solve_event_times(fixedbody, observer, current_time,
+                                   event_types, n_next=1,
+                                   circumpolar=fixedbody.circumpolar)
+        events, transit_pos = _select_events(entry, current_time,
+                                             event_types)
+    observer.date = current_time
+
+    result[keys.next_transit_time] = events['next_transit']
+    result[keys.prev_transit_time] = events['previous_transit']
+    result[keys.next_transit_pos] = transit_pos
+
     timeline = {}
-    for event_name in events:
-        observer_func =  getattr(observer, event_name)
-        event_date = pytz.utc.localize(observer_func(fixedbody).datetime())
-        timeline[event_date] = event_name.replace('_',' ').capitalize()
+    for event_name, event_date in events.items():
+        timeline[event_date] = event_name.replace('_', ' ').capitalize()
     timeline[current_time] = '(Trigger received)'
 
-    result[keys.timeline]=OrderedDict()
+    result[keys.timeline] = OrderedDict()
     for dtime in sorted(timeline):
         result[keys.timeline][dtime] = timeline[dtime]
 
-    transit_observer = ephem.Observer()
-    transit_observer.lon = observer.lon
-    transit_observer.lat = observer.lat
-    transit_observer.horizon = observer.horizon
-    transit_observer.date = result[keys.next_transit_time]
-    fixedbody.compute(transit_observer)
-    result[keys.next_transit_pos] = (fixedbody.alt * DEG_PER_RADIAN,
-                              fixedbody.az * DEG_PER_RADIAN)
-
     return result
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: time taken to render each type of report.
+"""
+import datetime
+import shutil
+import tempfile
+import timeit
+
+import pytz
+import voeventparse
+from jinja2 import FileSystemBytecodeCache
+
+from fourpisky.formatting import make_template_env
+from fourpisky.reports import (ReportRenderer, generate_report_text,
+                               generate_testresponse_text,
+                               get_report_renderer)
+from fourpisky.sites import AmiLA, Pt5m
+from fourpisky.tests.resources import datapaths
+from fourpisky.triggers import swift
+from fourpisky.visibility import ephem_cache
+
+
+def report(label, function, n_runs):
+    secs = timeit.timeit(function, number=n_runs) / n_runs
+    print("{:<40} {:8.3f} ms".format(label, secs * 1e3))
+
+
+def main(n_runs=200):
+    with open(datapaths.swift_bat_grb_pos_v2, 'rb') as f:
+        alert = swift.BatGrb(voeventparse.load(f))
+    now = datetime.datetime.now(pytz.utc)
+    sites = [AmiLA, Pt5m]
+    renderer = get_report_renderer()
+
+    # Start-up, each from a fresh Environment - i.e. with nothing loaded:
+    report("Renderer start-up, cold",
+           lambda: ReportRenderer(make_template_env()), 20)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        ReportRenderer(make_template_env(bytecode_cache))  # Fill the cache
+        report("Renderer start-up, bytecode cached",
+               lambda: ReportRenderer(make_template_env(bytecode_cache)), 20)
+    finally:
+        shutil.rmtree(cache_dir)
+    report("Test-response report",
+           lambda: generate_testresponse_text(now), n_runs)
+    report("GRB report, template only",
+           lambda: renderer.render('notify.j2', alert=alert,
+                                   report_timestamp=now, site_reports=[],
+                                   actions_taken=[]), n_runs)
+
+    # (Visibility is computed in threads of this process, so this clears
+    # the cache that's actually used.)
+    def grb_report_uncached():
+        ephem_cache.clear()
+        generate_report_text(alert, sites, [], now)
+
+    report("GRB report, visibility uncached", grb_report_uncached, n_runs)
+    report("GRB report, visibility cached",
+           lambda: generate_report_text(alert, sites, [], now), n_runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,6 @@ FPS_DUMMY_MODE=1 \
 FPS_VOEVENTDB_DBNAME="voeventcache" \
 celery -A fourpisky.taskqueue.tasks worker \
     --loglevel=info \
-    --concurrency=4 \
+    --concurrency=4
+#   Consumes from all queues by default; to run a dedicated
+#   priority-lane worker add e.g. `-Q fps_priority`
@@ -13,7 +13,7 @@ setup(
     packages=find_packages(),
     package_data={'fourpisky': [
         'templates/*', 'templates/includes/*',
-        'tests/resources/*.xml',
+        'tests/resources/*.xml', 'tests/resources/feed_voevents/*.xml',
     ]},
     include_package_data=True,
     description="Utility scripts for reacting to received VOEvent packets",
@@ -25,6 +25,7 @@ setup(
             [console_scripts]
             fps_inject_test_events=fourpisky.scripts.inject_test_events:cli
             fps_process_voevent=fourpisky.scripts.process_voevent:cli
+            fps_replay=fourpisky.scripts.replay_voevents:cli
             fps_scrape_feeds=fourpisky.scripts.scrape_feeds:cli
         ''',
 )